@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Check that run_batch keeps its stdout a clean JSON-lines stream.
+A small synthetic workspace is generated, every task of one iteration gets a
+context file, and run_batch runs them with an --exec command that prints to
+stdout. Every stdout line must parse as a JSON record, one per task, and the
+command output must show up on stderr instead. Exits non-zero otherwise.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from synthetic_tree import TreeSpec, generate
+
+NOISE = "NOISE-from-exec"
+
+
+def check(workspace, iteration, workers):
+    """Run the batch in workspace; returns a list of problems (empty if the output is clean)."""
+    iteration_dir = os.path.join(workspace, "aceflow", "iterations", iteration)
+    tasks = sorted(name for name in os.listdir(iteration_dir) if name.startswith("T-"))
+    for task_id in tasks:
+        with open(os.path.join(workspace, ".context", f"{task_id}.yaml"), "w", encoding="utf-8") as f:
+            f.write(f"task_id: {task_id}\nstage: S1\niteration: {iteration}\ndoc_owner: check\n")
+    command = [sys.executable, os.path.join("aceflow", "tools", "run_batch.py"), "--iteration", iteration,
+               "--stage", "S1", "--workers", str(workers), "--exec", f"echo {NOISE}; echo {NOISE} >&2"]
+    result = subprocess.run(command, cwd=workspace, capture_output=True, text=True)
+
+    problems = []
+    records = []
+    for line in result.stdout.splitlines():
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            problems.append(f"non-JSON line on stdout: {line!r}")
+    if len(records) != len(tasks):
+        problems.append(f"expected {len(tasks)} records, got {len(records)}")
+    # Tasks skipped for a lock (the generator locks some) never reach the execute phase
+    executed = sum(1 for record in records if any(p["name"] == "execute" for p in record.get("phases", [])))
+    if not executed:
+        problems.append("no task reached the execute phase")
+    if result.stderr.count(NOISE) != 2 * executed:
+        problems.append(f"expected {2 * executed} command output lines on stderr, got {result.stderr.count(NOISE)}")
+    return problems
+
+
+def main():
+    """Generate a workspace, run the batch and report whether stdout held only JSON lines."""
+    parser = argparse.ArgumentParser(description="Check that run_batch --exec output stays out of the JSON-lines stream.")
+    parser.add_argument("--documents", type=int, default=48, help="Documents in the generated workspace (default: 48).")
+    parser.add_argument("--workers", type=int, default=2, help="run_batch workers (default: 2).")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="aceflow-check-")
+    try:
+        workspace = os.path.join(root, "workspace")
+        # A new-layout iteration, so there are task directories to run
+        generate(workspace, TreeSpec(args.documents, iterations=1, layout="new"))
+        problems = check(workspace, "iteration-01", args.workers)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    for problem in problems:
+        print(f"[check] ❌ {problem}")
+    if problems:
+        sys.exit(1)
+    print("[check] ✅ run_batch stdout contains only JSON lines")
+
+if __name__ == "__main__":
+    main()
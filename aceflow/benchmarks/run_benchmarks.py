@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark runner for the aceflow tools on synthetic workspaces.
+For every scale (number of stage documents) a workspace is generated with
+synthetic_tree, then each tool runs as a subprocess, as a user would run it:
+once cold (tool caches, compiled schema and bytecode removed) and --repeat
+times warm (median reported). Each run records wall time, read/write syscalls
+and bytes from /proc/<pid>/io, peak RSS and the exit code. A run whose exit
+code is not one the tool is expected to return (a crash) marks the benchmark
+invalid, and the runner exits non-zero after writing the results. Results are
+written as JSON; --baseline compares them against an earlier result file and
+exits non-zero when a tool got slower than the threshold allows or its exit
+code changed.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import argparse
+import datetime
+import statistics
+import subprocess
+from pathlib import Path
+
+from synthetic_tree import TreeSpec, generate
+
+RESULTS_VERSION = 1
+DEFAULT_OUTPUT = os.path.join(Path(__file__).parent.parent, ".cache", "benchmarks", "latest.json")
+DEFAULT_SCALES = [10, 1000, 50000]
+NOISE_FLOOR = 0.005  # seconds; smaller wall-time differences are never reported as regressions
+
+# tool -> commands run from the workspace root ({task} is a task of the workspace)
+BENCHMARKS = {
+    "update_status": [["update_status.py", "--all"]],
+    "update_task_reminders": [["update_task_reminders.py", "--all"]],
+    "update_navigation": [["update_navigation.py", "--all"]],
+    "update_flowchart": [["update_flowchart.py", "--all"]],
+    "flow_sentinel": [["flow_sentinel.py", "--batch", "--all"]],
+    "state_lock": [["state_lock.py", "--status"],
+                   ["state_lock.py", "--lock", "--task", "{task}"],
+                   ["state_lock.py", "--unlock", "--task", "{task}"]],
+}
+# tool -> exit codes that mean the tool did its full work (default: only 0).
+# flow_sentinel exits 1 after checking every document when some are unfinished,
+# which the generated status mix always includes.
+EXPECTED_EXIT_CODES = {
+    "flow_sentinel": (0, 1),
+}
+
+
+def _proc_io(pid):
+    counters = {}
+    try:
+        with open(f"/proc/{pid}/io", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                counters[key.strip()] = int(value)
+    except OSError:
+        pass  # not Linux, or no permission: only wall time and RSS are recorded
+    return counters
+
+
+def measure(argv, cwd):
+    """Run one command; returns wall time, syscall and byte counters, peak RSS and exit code."""
+    started = time.perf_counter()
+    process = subprocess.Popen(argv, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    # Wait without reaping, so /proc/<pid>/io of the exited process can still be read
+    os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+    wall = time.perf_counter() - started
+    io = _proc_io(process.pid)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return {
+        "wall": wall,
+        "syscalls": io.get("syscr", 0) + io.get("syscw", 0),
+        "read_bytes": io.get("rchar", 0),
+        "write_bytes": io.get("wchar", 0),
+        "max_rss_kb": usage.ru_maxrss,
+        "exit_code": process.returncode,
+    }
+
+
+def measure_all(commands, cwd):
+    """Run a tool's commands in order and combine their measurements."""
+    runs = [measure(argv, cwd) for argv in commands]
+    return {
+        "wall": sum(r["wall"] for r in runs),
+        "syscalls": sum(r["syscalls"] for r in runs),
+        "read_bytes": sum(r["read_bytes"] for r in runs),
+        "write_bytes": sum(r["write_bytes"] for r in runs),
+        "max_rss_kb": max(r["max_rss_kb"] for r in runs),
+        "exit_code": next((r["exit_code"] for r in runs if r["exit_code"]), 0),
+    }
+
+
+def clear_caches(workspace):
+    """Remove everything the tools cache between runs, so the next run is cold."""
+    aceflow = os.path.join(workspace, "aceflow")
+    shutil.rmtree(os.path.join(aceflow, ".cache"), ignore_errors=True)
+    shutil.rmtree(os.path.join(aceflow, "tools", "__pycache__"), ignore_errors=True)
+    templates = os.path.join(aceflow, "templates")
+    for name in os.listdir(templates):
+        if name.startswith(".") and name.endswith(".compiled.json"):
+            os.remove(os.path.join(templates, name))
+
+
+def bench_tool(workspace, commands, repeat, expected_exit_codes=(0,)):
+    """
+    Cold run followed by `repeat` warm runs; warm figures are medians.
+    The entry is marked invalid when any run exited with an unexpected code.
+    """
+    clear_caches(workspace)
+    cold = measure_all(commands, workspace)
+    warm_runs = [measure_all(commands, workspace) for _ in range(max(1, repeat))]
+    warm = {key: statistics.median(r[key] for r in warm_runs) for key in warm_runs[0] if key != "exit_code"}
+    warm["exit_code"] = next((r["exit_code"] for r in warm_runs if r["exit_code"]), 0)
+    unexpected = sorted({r["exit_code"] for r in [cold] + warm_runs} - set(expected_exit_codes))
+    return {"cold": cold, "warm": warm, "valid": not unexpected, "unexpected_exit_codes": unexpected}
+
+
+def run_benchmarks(scales, tools, repeat, spec_options, workdir=None, keep=False):
+    """Generate a workspace per scale and benchmark the tools on it. Returns the results document."""
+    results = {}
+    root = workdir or tempfile.mkdtemp(prefix="aceflow-bench-")
+    try:
+        for documents in scales:
+            workspace = os.path.join(root, f"docs-{documents}")
+            if os.path.exists(workspace):
+                shutil.rmtree(workspace)
+            started = time.perf_counter()
+            summary = generate(workspace, TreeSpec(documents, **spec_options))
+            print(f"[bench] {documents} documents, {summary['tasks']} tasks generated "
+                  f"in {time.perf_counter() - started:.1f}s: {workspace}", file=sys.stderr)
+            for tool in tools:
+                commands = [[sys.executable, os.path.join("aceflow", "tools", argv[0])]
+                            + [arg.format(task=summary["bench_task"]) for arg in argv[1:]]
+                            for argv in BENCHMARKS[tool]]
+                expected = EXPECTED_EXIT_CODES.get(tool, (0,))
+                entry = dict(bench_tool(workspace, commands, repeat, expected), documents=documents, tool=tool)
+                results[f"{documents}/{tool}"] = entry
+                invalid = "" if entry["valid"] else f"  INVALID: exit code {entry['unexpected_exit_codes']}"
+                print(f"[bench] {documents:>6} {tool:<22} cold {entry['cold']['wall']:8.3f}s  "
+                      f"warm {entry['warm']['wall']:8.3f}s  rss {entry['cold']['max_rss_kb'] / 1024:6.1f} MB{invalid}",
+                      file=sys.stderr)
+    finally:
+        if not keep and not workdir:
+            shutil.rmtree(root, ignore_errors=True)
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": dict(spec_options, scales=scales, repeat=repeat),
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """
+    Compare wall times with a baseline results document.
+    Returns (rows, regressions); a regression is a run more than threshold
+    (a fraction) slower than its baseline and slower by more than the noise floor,
+    or a run whose exit code differs from the baseline's (its time measures
+    different work, so it is flagged rather than compared).
+    """
+    rows, regressions = [], []
+    for key, entry in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        for phase in ("cold", "warm"):
+            now, before = entry[phase]["wall"], base[phase]["wall"]
+            ratio = now / before if before else float("inf")
+            exit_now, exit_before = entry[phase].get("exit_code", 0), base[phase].get("exit_code", 0)
+            if exit_now != exit_before:
+                note = f"EXIT CODE {exit_before} -> {exit_now}"
+            elif ratio > 1 + threshold and now - before > NOISE_FLOOR:
+                note = "REGRESSION"
+            else:
+                note = ""
+            rows.append((key, phase, before, now, ratio, note))
+            if note:
+                regressions.append(f"{key} {phase}")
+    return rows, regressions
+
+
+def print_comparison(rows):
+    print(f"{'benchmark':<34} {'phase':<5} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    for key, phase, before, now, ratio, note in rows:
+        print(f"{key:<34} {phase:<5} {before:>9.3f}s {now:>9.3f}s {ratio:>6.2f}x{'  ' + note if note else ''}")
+
+
+def main():
+    """Benchmark the tools on synthetic workspaces and optionally compare with a baseline."""
+    parser = argparse.ArgumentParser(description="Benchmark the aceflow tools on synthetic iteration trees.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated document counts (default: 10,1000,50000).")
+    parser.add_argument("--tools", default=",".join(BENCHMARKS), help="Comma-separated tools to benchmark (default: all).")
+    parser.add_argument("--repeat", type=int, default=3, help="Warm runs per tool; the median is reported (default: 3).")
+    parser.add_argument("--iterations", type=int, default=4, help="Iterations per workspace (default: 4).")
+    parser.add_argument("--layout", choices=["old", "new", "mixed"], default="mixed", help="Iteration layout (default: mixed).")
+    parser.add_argument("--doc-size", type=int, default=1024, help="Approximate document body size in bytes (default: 1024).")
+    parser.add_argument("--seed", type=int, default=0, help="Generator seed (default: 0).")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help=f"Results JSON file (default: {DEFAULT_OUTPUT}).")
+    parser.add_argument("--baseline", help="Earlier results JSON file to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown against the baseline as a fraction (default: 0.2).")
+    parser.add_argument("--workdir", help="Generate workspaces here and keep them (default: a temporary directory).")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary workspaces.")
+    args = parser.parse_args()
+
+    tools = [tool.strip() for tool in args.tools.split(",") if tool.strip()]
+    unknown = [tool for tool in tools if tool not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown tools: {', '.join(unknown)} (available: {', '.join(BENCHMARKS)})")
+    scales = [int(scale) for scale in args.scales.split(",") if scale.strip()]
+    spec_options = {"iterations": args.iterations, "layout": args.layout, "doc_size": args.doc_size, "seed": args.seed}
+
+    current = run_benchmarks(scales, tools, args.repeat, spec_options, args.workdir, args.keep)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"[bench] results written to {args.output}", file=sys.stderr)
+    invalid = [key for key, entry in current["results"].items() if not entry["valid"]]
+    if invalid:
+        print(f"[bench] {len(invalid)} benchmark(s) exited with an unexpected code: {', '.join(invalid)}", file=sys.stderr)
+        sys.exit(2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows, regressions = compare(current, baseline, args.threshold)
+        print_comparison(rows)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%} or exit code change(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"\nNo regressions above {args.threshold:.0%}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Deterministic generator of synthetic aceflow workspaces for benchmarking.
+A workspace is a self-contained copy of the toolkit (aceflow/tools, templates,
+project.config.json) next to a generated iteration tree, so the tools resolve
+every path inside the workspace and never touch the real repository.
+Iterations use the old layout (stage files plus s3_testcases/ and
+s4_implementation/ directories), the new layout (one T-xxxx directory per task
+with one file per stage) or alternate between both. The same TreeSpec and seed
+always produce the same files, contents and mtimes.
+"""
+
+import os
+import json
+import math
+import random
+import shutil
+import argparse
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Dict
+
+ACEFLOW_DIR = Path(__file__).parent.parent
+STAGES = ["S1", "S2", "S3", "S4", "S5", "S6", "S7", "S8"]
+NEW_LAYOUT_FILES = ["s1_user_story.md", "s2_tasks.md", "s3_testcases.md", "s4_implementation.md",
+                    "s5_test_report.md", "s6_codereview.md", "s7_demo_feedback.md", "s8_progress_index.md"]
+OLD_LAYOUT_FILES = {"S1": "s1_user_story.md", "S2": "s2_tasks.md", "S5": "s5_test_report.md",
+                    "S6": "s6_codereview.md", "S7": "s7_demo_feedback.md", "S8": "s8_progress_index.md"}
+OLD_LAYOUT_DIRS = {"S3": ("s3_testcases", "tc"), "S4": ("s4_implementation", "impl")}
+OWNERS = ["alice", "bob", "carol", "dan", "erin"]
+WORDS = ["需求", "任务", "测试", "实现", "接口", "页面", "城市", "省份", "导航", "数据", "校验", "部署"]
+FIXED_MTIME = 1751328000  # 2025-07-01, so generated trees have identical stamps
+
+
+@dataclass
+class TreeSpec:
+    documents: int
+    iterations: int = 4
+    layout: str = "mixed"  # old, new or mixed
+    doc_size: int = 1024   # approximate body size in bytes
+    status_mix: Dict[str, float] = field(default_factory=lambda: {"已完成": 0.5, "进行中": 0.3, "待开始": 0.2})
+    lock_fraction: float = 0.1  # share of tasks with a lock file; every other one is expired
+    seed: int = 0
+
+    def iteration_layout(self, index):
+        if self.layout == "mixed":
+            return "old" if index % 2 == 0 else "new"
+        return self.layout
+
+
+def _body(rng, size):
+    parts, length, section = [], 0, 1
+    while length < size:
+        if length == 0 or rng.random() < 0.1:
+            line = f"\n## 章节 {section}\n\n"
+            section += 1
+        else:
+            line = " ".join(rng.choice(WORDS) for _ in range(12)) + "\n"
+        parts.append(line)
+        length += len(line.encode("utf-8"))
+    return "".join(parts)
+
+
+def _write_document(path, rng, spec, stage, iteration, task_id):
+    statuses, weights = zip(*spec.status_mix.items())
+    lines = ["---", f"stage: {stage}", f"iteration: {iteration}"]
+    if task_id:
+        lines.append(f"task_id: {task_id}")
+    lines += [f"doc_owner: {rng.choice(OWNERS)}", "created_at: 2025-07-01",
+              f"status: {rng.choices(statuses, weights)[0]}", "---", "", f"# {stage} {task_id or iteration}"]
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n" + _body(rng, spec.doc_size))
+    os.utime(path, (FIXED_MTIME, FIXED_MTIME))
+
+
+def _generate_new(iteration_dir, rng, spec, iteration, count, task_offset):
+    tasks = []
+    for t in range(math.ceil(count / len(STAGES))):
+        task_id = f"T-{task_offset + t + 1:04d}"
+        task_dir = os.path.join(iteration_dir, task_id)
+        os.makedirs(task_dir)
+        for stage, name in list(zip(STAGES, NEW_LAYOUT_FILES))[:min(len(STAGES), count - t * len(STAGES))]:
+            _write_document(os.path.join(task_dir, name), rng, spec, stage, iteration, task_id)
+        tasks.append(task_id)
+    return tasks
+
+
+def _generate_old(iteration_dir, rng, spec, iteration, count):
+    singles = list(OLD_LAYOUT_FILES.items())[:count]
+    for stage, name in singles:
+        _write_document(os.path.join(iteration_dir, name), rng, spec, stage, iteration, None)
+    grouped = count - len(singles)
+    for i, (stage, (directory, prefix)) in enumerate(OLD_LAYOUT_DIRS.items()):
+        share = grouped // 2 + (grouped % 2 if i == 0 else 0)
+        if not share:
+            continue
+        os.makedirs(os.path.join(iteration_dir, directory))
+        for n in range(share):
+            _write_document(os.path.join(iteration_dir, directory, f"{prefix}{n + 1:05d}.md"),
+                            rng, spec, stage, iteration, None)
+
+
+def _copy_toolkit(root):
+    aceflow = os.path.join(root, "aceflow")
+    shutil.copytree(ACEFLOW_DIR / "tools", os.path.join(aceflow, "tools"),
+                    ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    shutil.copytree(ACEFLOW_DIR / "templates", os.path.join(aceflow, "templates"),
+                    ignore=shutil.ignore_patterns(".*.compiled.json"))
+    shutil.copy2(ACEFLOW_DIR / "project.config.json", os.path.join(aceflow, "project.config.json"))
+
+
+def _write_lock(root, task_id, iteration, expired):
+    expires_at = "2000-01-01T00:00:00" if expired else "2999-01-01T00:00:00"
+    meta = {"task_id": task_id, "status": "locked", "timestamp": "2025-07-01T00:00:00", "expires_at": expires_at,
+            "iteration": iteration, "stage": "S4", "doc_owner": "bench", "token": f"bench-{task_id}"}
+    with open(os.path.join(root, "aceflow", "locks", f"{task_id}.lock"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+def generate(root, spec):
+    """Create a fresh workspace for spec under root (which must not exist). Returns a summary dict."""
+    rng = random.Random(spec.seed)
+    os.makedirs(root)
+    _copy_toolkit(root)
+    iterations_dir = os.path.join(root, "aceflow", "iterations")
+    os.makedirs(iterations_dir)
+    os.makedirs(os.path.join(root, "aceflow", "locks"))
+    os.makedirs(os.path.join(root, ".context"))
+
+    names, tasks = [], []
+    per_iteration, remainder = divmod(spec.documents, spec.iterations)
+    for index in range(spec.iterations):
+        iteration = f"iteration-{index + 1:02d}"
+        iteration_dir = os.path.join(iterations_dir, iteration)
+        os.makedirs(iteration_dir)
+        count = per_iteration + (1 if index < remainder else 0)
+        if spec.iteration_layout(index) == "new":
+            for task_id in _generate_new(iteration_dir, rng, spec, iteration, count, len(tasks)):
+                tasks.append((task_id, iteration))
+        else:
+            _generate_old(iteration_dir, rng, spec, iteration, count)
+        names.append(iteration)
+
+    for n, (task_id, iteration) in enumerate(tasks[:math.ceil(len(tasks) * spec.lock_fraction)]):
+        _write_lock(root, task_id, iteration, expired=n % 2 == 1)
+    bench_task = tasks[-1][0] if tasks else "T-9999"
+    with open(os.path.join(root, ".context", f"{bench_task}.yaml"), "w", encoding="utf-8") as f:
+        f.write(f"task_id: {bench_task}\nstage: S4\niteration: {tasks[-1][1] if tasks else names[0]}\ndoc_owner: bench\n")
+
+    # Output files the update tools expect to exist, with one section per iteration
+    status = "# 项目状态\n\n" + "".join(f"## 📅 {name} 状态\n\n| 阶段 | 状态 |\n|---|---|\n\n---\n\n" for name in names)
+    result_dir = os.path.join(root, "aceflow_result")
+    os.makedirs(result_dir)
+    os.symlink(os.path.join("..", "aceflow", "iterations"), os.path.join(result_dir, "iterations"))
+    for path, content in ((os.path.join(result_dir, "status.md"), status),
+                          (os.path.join(root, "aceflow", "status.md"), status),
+                          (os.path.join(root, "aceflow", "index.md"), "# AceFlow\n"),
+                          (os.path.join(root, "aceflow", "task_reminders.md"), "# 任务提醒\n")):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+    return {"spec": asdict(spec), "iterations": names, "tasks": len(tasks), "bench_task": bench_task}
+
+
+def main():
+    """Generate one synthetic workspace."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic aceflow workspace for benchmarks.")
+    parser.add_argument("root", help="Workspace directory to create (must not exist).")
+    parser.add_argument("--documents", type=int, default=1000, help="Total number of stage documents (default: 1000).")
+    parser.add_argument("--iterations", type=int, default=4, help="Number of iterations (default: 4).")
+    parser.add_argument("--layout", choices=["old", "new", "mixed"], default="mixed", help="Iteration layout (default: mixed).")
+    parser.add_argument("--doc-size", type=int, default=1024, help="Approximate document body size in bytes (default: 1024).")
+    parser.add_argument("--status-mix", help='Status weights as JSON, e.g. \'{"已完成": 0.7, "进行中": 0.3}\'.')
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args()
+    spec = TreeSpec(args.documents, args.iterations, args.layout, args.doc_size, seed=args.seed)
+    if args.status_mix:
+        spec.status_mix = json.loads(args.status_mix)
+    summary = generate(args.root, spec)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
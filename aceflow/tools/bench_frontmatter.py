@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Conformance check and benchmark for the flat Front-matter fast path.
+The conformance corpus asserts that frontmatter.load_yaml_mapping returns
+exactly what yaml.safe_load returns (values and types), whether the block
+takes the fast path or falls back to PyYAML. The benchmark times both parsers
+on the Front-matter of real stage documents.
+"""
+
+import os
+import sys
+import time
+import argparse
+from pathlib import Path
+
+import yaml
+
+import frontmatter
+from frontmatter import load_yaml_mapping, read_frontmatter_block
+from profiling import add_profile_argument, enable_from_args
+
+# (description, Front-matter block); every block must parse identically with both parsers
+CORPUS = [
+    ("typical stage document", "stage: S1\niteration: iteration-01\ntask_id: T-001\ndoc_owner: alice\ncreated_at: 2025-07-01\nstatus: 已完成\n"),
+    ("empty block", ""),
+    ("comments and blank lines", "# comment\n\nstage: S2\n\n# another\nstatus: 进行中\n"),
+    ("null values", "a:\nb: ~\nc: null\nd: Null\ne: NULL\n"),
+    ("yaml 1.1 booleans", "a: yes\nb: No\nc: TRUE\nd: off\ne: On\nf: false\n"),
+    ("not booleans", "a: y\nb: n\nc: yes!\nd: truth\n"),
+    ("integers", "a: 0\nb: 42\nc: -7\nd: +3\n"),
+    ("number-like values", "a: 007\nb: 0x1F\nc: 1_000\nd: 1.5\ne: 1e3\nf: .inf\ng: -.5\nh: 1:20\ni: 100%\n"),
+    ("dates and timestamps", "a: 2025-07-01\nb: 2025-07-01 10:00:00\nc: 2025-07-01T10:00:00Z\nd: 2025-7-1\ne: 2025-07-01 10:00\n"),
+    ("simple quoted strings", "a: 'S1'\nb: \"进行中\"\nc: ''\nd: \"\"\ne: 'a # b'\nf: \"2025-07-01\"\n"),
+    ("quoted strings with escapes", "a: 'it''s'\nb: \"tab\\tescape\"\n"),
+    ("plain strings", "a: it's\nb: C#\nc: a b c\nd: x-y_z\ne: 测试 任务\n"),
+    ("inline comments", "status: 已完成 # done\nowner: bob#not-a-comment\n"),
+    ("colons in values", "a: http://example.com\nb: a: b\nc: key:value\n"),
+    ("flow collections", "tags: [a, b]\nmeta: {x: 1}\n"),
+    ("block sequence", "tags:\n  - a\n  - b\n"),
+    ("nested mapping", "meta:\n  owner: alice\n  reviewers: 2\n"),
+    ("block scalars", "desc: |\n  line one\n  line two\nfolded: >\n  a\n  b\n"),
+    ("anchors and aliases", "a: &x S1\nb: *x\n"),
+    ("tags", "a: !!str 123\nb: !!int '5'\n"),
+    ("boolean-like and null-like keys", "yes: 1\nnull: 2\non: 3\n"),
+    ("keys with dashes and digits", "related-story: US-01\nfield_2: v\n"),
+    ("duplicate keys", "status: 待开始\nstatus: 已完成\n"),
+    ("trailing whitespace", "stage: S1   \nstatus:    已完成\n"),
+    ("windows line endings", "stage: S1\r\nstatus: 已完成\r\n"),
+    ("special first characters", "a: -x\nb: ?x\nc: .x\nd: =\ne: <x\n"),
+]
+
+
+def _same(a, b):
+    """Equal values of the same types, recursively (so True != 1 and a date != its string)."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def _safe_load(block):
+    try:
+        data = yaml.safe_load(block)
+    except yaml.YAMLError:
+        return ValueError
+    return {} if data is None else data
+
+
+def _fast_load(block):
+    try:
+        return load_yaml_mapping(block)
+    except ValueError:
+        return ValueError
+
+
+def check_conformance(corpus=CORPUS):
+    """Compare both parsers on every corpus block. Returns the number of mismatches."""
+    mismatches = 0
+    for description, block in corpus:
+        expected, actual = _safe_load(block), _fast_load(block)
+        try:
+            frontmatter._parse_flat(block)
+            path = "fast"
+        except frontmatter._NotFlat:
+            path = "fallback"
+        ok = expected is actual if ValueError in (expected, actual) else _same(expected, actual)
+        mismatches += not ok
+        print(f"  {'ok' if ok else 'MISMATCH':<8} {path:<8} {description}")
+        if not ok:
+            print(f"           yaml.safe_load: {expected!r}\n           fast path:      {actual!r}")
+    return mismatches
+
+
+def collect_blocks(roots):
+    """Front-matter blocks of every Markdown file under the roots."""
+    blocks = []
+    for root in roots:
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name.endswith(".md"):
+                    block = read_frontmatter_block(os.path.join(dirpath, name))
+                    if block is not None:
+                        blocks.append(block)
+    return blocks
+
+
+def parseable(blocks):
+    """The blocks every parser accepts; invalid YAML (part of the corpus on purpose) would abort the timing loop."""
+    return [block for block in blocks if _safe_load(block) is not ValueError and _fast_load(block) is not ValueError]
+
+
+def benchmark(blocks, repeat):
+    """Time each parser over the blocks; returns {parser: documents per second}."""
+    parsers = {
+        "yaml.safe_load": yaml.safe_load,
+        "yaml CSafeLoader": (lambda b: yaml.load(b, Loader=yaml.CSafeLoader)) if hasattr(yaml, "CSafeLoader") else None,
+        "fast path": load_yaml_mapping,
+    }
+    rates = {}
+    for name, parse in parsers.items():
+        if parse is None:
+            continue
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for block in blocks:
+                parse(block)
+        rates[name] = len(blocks) * repeat / (time.perf_counter() - started)
+    return rates
+
+
+def main():
+    """Run the conformance corpus, then benchmark the parsers on real stage documents."""
+    parser = argparse.ArgumentParser(description="Conformance check and benchmark for the Front-matter fast path.")
+    parser.add_argument("roots", nargs="*", help="Directories with stage documents (default: aceflow/iterations).")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the documents per parser (default: 200).")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
+    print("Conformance corpus:")
+    mismatches = check_conformance()
+    print(f"  {len(CORPUS) - mismatches}/{len(CORPUS)} blocks parse identically\n")
+
+    roots = args.roots or [os.path.join(Path(__file__).parent.parent, "iterations")]
+    blocks = collect_blocks(roots)
+    if not blocks:
+        print(f"No stage documents with Front-matter found under {', '.join(roots)}; using the corpus instead.")
+        blocks = [block for _, block in CORPUS]
+    valid = parseable(blocks)
+    if len(valid) < len(blocks):
+        print(f"Skipping {len(blocks) - len(valid)} blocks that are not valid YAML mappings.")
+    blocks = valid
+    print(f"Benchmark: {len(blocks)} Front-matter blocks x {args.repeat}")
+    rates = benchmark(blocks, args.repeat)
+    baseline = rates["yaml.safe_load"]
+    for name, rate in rates.items():
+        print(f"  {name:<18} {rate:>12,.0f} docs/s  {rate / baseline:>6.1f}x")
+    if mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
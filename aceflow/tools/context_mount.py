@@ -8,25 +8,44 @@ It also dynamically loads attention mechanism prompt templates based on the task
 """
 
 import os
-import argparse
-import yaml
 import sys
-import subprocess
-from pathlib import Path
+import json
+import shlex
+import argparse
+import tempfile
+import contextlib
+
+from frontmatter import load_yaml_mapping
+from load_attention_prompts import normalize_stage, load_attention_prompt as load_template
+from profiling import add_profile_argument, enable_from_args, traced
 
 CONTEXT_DIR = ".context"
+VAR_PREFIX = "CTX_"
+TASK_VAR = "ACEFLOW_TASK"
+ATTENTION_VAR = "CTX_ATTENTION_PROMPT"
+HANDOFF_VARS_VAR = "ACEFLOW_HANDOFF_VARS"    # comma-separated names whose value was handed off
+HANDOFF_FILES_VAR = "ACEFLOW_HANDOFF_FILES"  # temp files the consumer of --export json/nul must remove
+# Values above this size are handed off through a file or descriptor instead of the environment
+INLINE_LIMIT = int(os.environ.get("ACEFLOW_CTX_INLINE_LIMIT", 4096))
+HANDOFF_FD_BASE = 9
+EXPORT_FORMATS = ["sh", "nul", "json"]
 
-def load_context(task_id: str, dry_run=False):
-    """Load context information for the specified task and inject into environment variables."""
+def read_context(task_id: str):
+    """Read the task's context YAML, exiting if it does not exist."""
     context_path = os.path.join(CONTEXT_DIR, f"{task_id}.yaml")
     if not os.path.exists(context_path):
         print(f"[context_mount] 未找到上下文文件: {context_path}")
         sys.exit(1)
 
     with open(context_path, "r", encoding="utf-8") as f:
-        context = yaml.safe_load(f) or {}
+        context = load_yaml_mapping(f.read())
 
     print(f"[context_mount] 挂载上下文: {context_path}")
+    return context
+
+def load_context(task_id: str, dry_run=False):
+    """Load context information for the specified task and inject into environment variables."""
+    context = read_context(task_id)
     for key, value in context.items():
         var_name = f"CTX_{key.upper()}"
         if dry_run:
@@ -39,47 +58,156 @@ def load_context(task_id: str, dry_run=False):
     stage = context.get('stage', 'S1')  # 从上下文中获取阶段，默认值为 S1
     attention_prompt = load_attention_prompt(stage, dry_run)
     if attention_prompt and not dry_run:
-        os.environ['CTX_ATTENTION_PROMPT'] = attention_prompt
-        print(f"    └─ 注入变量: CTX_ATTENTION_PROMPT = [注意力机制模板内容]")
+        os.environ[ATTENTION_VAR] = attention_prompt
+        print(f"    └─ 注入变量: {ATTENTION_VAR} = [注意力机制模板内容]")
 
     return context
 
 def load_attention_prompt(stage: str, dry_run=False):
-    """调用 load_attention_prompts.py 工具加载注意力机制模板"""
-    base_dir = Path(__file__).parent
-    tool_path = os.path.join(base_dir, "load_attention_prompts.py")
-    if not os.path.exists(tool_path):
-        print(f"[context_mount] 未找到注意力机制加载工具: {tool_path}")
+    """通过 load_attention_prompts 的进程内缓存加载注意力机制模板"""
+    stage_name = normalize_stage(stage)
+    if stage_name is None:
+        print(f"[context_mount] 无效的阶段名称: {stage}，应为 S1 到 S8")
         return None
-
-    try:
-        cmd = ['python', tool_path, '--stage', stage]
-        if dry_run:
-            print(f"[context_mount] 模拟加载注意力机制模板: {' '.join(cmd)}")
-            return None
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            # 从输出中提取模板内容
-            start_marker = "=== 注意力机制提示词内容 ==="
-            end_marker = "=== 内容结束 ==="
-            start_idx = result.stdout.find(start_marker) + len(start_marker)
-            end_idx = result.stdout.find(end_marker)
-            if start_idx > len(start_marker) and end_idx > start_idx:
-                content = result.stdout[start_idx:end_idx].strip()
-                print(f"[context_mount] 成功加载注意力机制模板 for {stage}")
-                return content
-        print(f"[context_mount] 加载注意力机制模板失败: {result.stderr}")
+    if dry_run:
+        print(f"[context_mount] 模拟加载注意力机制模板: {stage_name}")
         return None
-    except Exception as e:
-        print(f"[context_mount] 加载注意力机制模板时出错: {e}")
+    content = load_template(stage_name)
+    if content:
+        print(f"[context_mount] 成功加载注意力机制模板 for {stage_name}")
+        return content.strip()
+    print(f"[context_mount] 加载注意力机制模板失败: {stage_name}")
+    return None
+
+def context_variables(task_id: str, context, attention_prompt=None):
+    """The variables a mounted context exports: ACEFLOW_TASK, one CTX_* per key and the attention prompt."""
+    variables = {TASK_VAR: task_id}
+    for key, value in context.items():
+        variables[f"{VAR_PREFIX}{str(key).upper()}"] = str(value)
+    if attention_prompt:
+        variables[ATTENTION_VAR] = attention_prompt
+    return variables
+
+def _write_handoff_file(name, value):
+    fd, path = tempfile.mkstemp(prefix=f"aceflow-{name.lower()}-", suffix=".txt")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(value)
+    return path
+
+def split_exports(variables, handoff="file", inline_limit=INLINE_LIMIT):
+    """
+    Split variables into what is exported directly and what is handed off.
+    Returns (exports, shell_setup, handoff_files): large values become NAME_FILE
+    (a temp file the caller owns) or, with handoff="fd", NAME_FD plus the shell
+    lines that open the file on that descriptor and remove it. The handed-off
+    names are listed in ACEFLOW_HANDOFF_VARS so read_handoff users can find them.
+    """
+    exports, shell_setup, handoff_files = {}, [], []
+    next_fd = HANDOFF_FD_BASE
+    for name, value in variables.items():
+        if len(value.encode("utf-8")) <= inline_limit:
+            exports[name] = value
+            continue
+        path = _write_handoff_file(name, value)
+        if handoff == "fd":
+            shell_setup.append(f"exec {next_fd}<{shlex.quote(path)} && rm -f {shlex.quote(path)}")
+            exports[f"{name}_FD"] = str(next_fd)
+            next_fd += 1
+        else:
+            exports[f"{name}_FILE"] = path
+            handoff_files.append(path)
+    handed_off = [name for name in variables if name not in exports]
+    if handed_off:
+        exports[HANDOFF_VARS_VAR] = ",".join(handed_off)
+    return exports, shell_setup, handoff_files
+
+@traced(cat="context")
+def export_context(task_id: str, fmt="sh", handoff="file", inline_limit=INLINE_LIMIT, out=None):
+    """
+    Write the task's context variables to out as an export stream: eval-able
+    shell, NUL-delimited NAME=value pairs, or a JSON object. Values larger than
+    inline_limit bytes are written to a private temp file and exported as
+    NAME_FILE; with handoff="fd" (shell only) the shell opens the file on an
+    inherited descriptor, deletes it, and NAME_FD names the descriptor.
+    Temp files are never left to chance: the shell stream installs an EXIT trap
+    that removes them (replacing any EXIT trap of the evaluating shell), and
+    json/nul streams list them in ACEFLOW_HANDOFF_FILES for the caller to remove.
+    """
+    out = out or sys.stdout
+    # Human-readable progress goes to stderr so stdout stays machine-consumable
+    with contextlib.redirect_stdout(sys.stderr):
+        context = read_context(task_id)
+        attention_prompt = load_attention_prompt(context.get('stage', 'S1'))
+    variables = context_variables(task_id, context, attention_prompt)
+    exports, shell_setup, handoff_files = split_exports(variables, handoff if fmt == "sh" else "file", inline_limit)
+    if handoff_files:
+        if fmt == "sh":
+            shell_setup.append(f"trap {shlex.quote('rm -f ' + ' '.join(map(shlex.quote, handoff_files)))} EXIT")
+        else:
+            exports[HANDOFF_FILES_VAR] = os.pathsep.join(handoff_files)
+
+    if fmt == "json":
+        out.write(json.dumps(exports, ensure_ascii=False) + "\n")
+    elif fmt == "nul":
+        for name, value in exports.items():
+            out.write(f"{name}={value}\0")
+    else:
+        for line in shell_setup:
+            out.write(line + "\n")
+        for name, value in exports.items():
+            out.write(f"export {name}={shlex.quote(value)}\n")
+    out.flush()
+    return exports
+
+def read_handoff(name, environ=None):
+    """Read a variable exported by export_context, wherever it was handed off (inline, _FILE or _FD)."""
+    environ = os.environ if environ is None else environ
+    if name in environ:
+        return environ[name]
+    if environ.get(f"{name}_FILE"):
+        with open(environ[f"{name}_FILE"], "r", encoding="utf-8") as f:
+            return f.read()
+    if environ.get(f"{name}_FD"):
+        fd = int(environ[f"{name}_FD"])
+        # pread leaves the shared file offset alone, so every step can read the descriptor
+        size = os.fstat(fd).st_size
+        return os.pread(fd, size, 0).decode("utf-8")
+    return None
+
+def mounted_context(task_id: str, environ=None):
+    """Return the context mounted for task_id in the environment, or None if another (or no) task is mounted."""
+    environ = os.environ if environ is None else environ
+    if environ.get(TASK_VAR) != task_id:
         return None
+    handed_off = [name for name in environ.get(HANDOFF_VARS_VAR, "").split(",") if name]
+    handoff_names = {f"{name}{suffix}" for name in handed_off for suffix in ("_FILE", "_FD")}
+    context = {
+        name[len(VAR_PREFIX):].lower(): value
+        for name, value in environ.items()
+        if name.startswith(VAR_PREFIX) and not name.startswith(ATTENTION_VAR) and name not in handoff_names
+    }
+    # Large values were exported as NAME_FILE / NAME_FD; read them back
+    for name in handed_off:
+        if name.startswith(VAR_PREFIX) and name != ATTENTION_VAR:
+            value = read_handoff(name, environ)
+            if value is not None:
+                context[name[len(VAR_PREFIX):].lower()] = value
+    return context
 
 def main():
     parser = argparse.ArgumentParser(description="ACEFLOW v2.5 上下文挂载器")
     parser.add_argument("--task", required=True, help="任务 ID，例如 T-001")
     parser.add_argument("--print", action="store_true", help="仅打印变量，不注入环境")
+    parser.add_argument("--export", choices=EXPORT_FORMATS, help="输出可供调用方使用的变量流：sh（可 eval）、nul（NUL 分隔）或 json")
+    parser.add_argument("--handoff", choices=["file", "fd"], default="file", help="大变量的传递方式：临时文件或继承的文件描述符（仅 sh），默认 file")
+    parser.add_argument("--inline-limit", type=int, default=INLINE_LIMIT, help=f"超过该字节数的变量不直接放入环境（默认 {INLINE_LIMIT}）")
+    add_profile_argument(parser)
     args = parser.parse_args()
+    enable_from_args(args)
 
+    if args.export:
+        export_context(args.task, args.export, args.handoff, args.inline_limit)
+        return
     load_context(args.task, dry_run=args.print)
 
 if __name__ == "__main__":
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SQLite-backed index of aceflow stage documents.
+`refresh` stores the Front-matter of every stage document (stage, iteration,
+task_id, doc_owner, status, created_at, updated_at, tags) in
+aceflow/.cache/doc_index.sqlite, re-reading only files whose mtime, size or
+inode changed. `query` filters, groups and prints the index as a table, JSON or
+CSV. update_status and update_task_reminders can render from the index with
+--from-index instead of walking the filesystem.
+"""
+
+import os
+import sys
+import csv
+import json
+import sqlite3
+import argparse
+from pathlib import Path
+
+import update_status
+from iteration_scanner import IterationSnapshot, StageDocument, scan_iteration, list_iterations
+from frontmatter_cache import file_stamp, get_frontmatter, disable_cache
+from profiling import add_profile_argument, enable_from_args, traced
+
+INDEX_FILE = os.path.join(Path(__file__).parent.parent, ".cache", "doc_index.sqlite")
+# Front-matter fields from templates/frontmatter_schema.yaml that get their own indexed column
+INDEXED_FIELDS = ["fm_stage", "fm_iteration", "task_id", "doc_owner", "status", "created_at", "updated_at"]
+QUERY_FIELDS = ["iteration", "task", "stage", "path", "rel_path"] + INDEXED_FIELDS + ["tags"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS iterations (
+    iteration_dir TEXT PRIMARY KEY,
+    iteration TEXT NOT NULL,
+    layout TEXT NOT NULL,
+    tasks TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    iteration_dir TEXT NOT NULL,
+    iteration TEXT NOT NULL,
+    task TEXT,
+    stage TEXT NOT NULL,
+    grouped INTEGER NOT NULL,
+    rel_path TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    mtime_ns INTEGER,
+    size INTEGER,
+    inode INTEGER,
+    fm_stage TEXT,
+    fm_iteration TEXT,
+    task_id TEXT,
+    doc_owner TEXT,
+    status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    tags TEXT,
+    frontmatter TEXT,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS document_tags (
+    path TEXT NOT NULL,
+    tag TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_iteration ON documents (iteration_dir, position);
+CREATE INDEX IF NOT EXISTS idx_documents_stage ON documents (stage);
+CREATE INDEX IF NOT EXISTS idx_documents_status ON documents (status);
+CREATE INDEX IF NOT EXISTS idx_documents_owner ON documents (doc_owner);
+CREATE INDEX IF NOT EXISTS idx_documents_task ON documents (task_id);
+CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at);
+CREATE INDEX IF NOT EXISTS idx_documents_updated ON documents (updated_at);
+CREATE INDEX IF NOT EXISTS idx_document_tags ON document_tags (tag, path);
+CREATE INDEX IF NOT EXISTS idx_document_tags_path ON document_tags (path);
+"""
+
+
+def connect(index_file=INDEX_FILE):
+    """Open (and create if needed) the document index."""
+    os.makedirs(os.path.dirname(index_file), exist_ok=True)
+    conn = sqlite3.connect(index_file)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def default_roots():
+    """The configured iterationRoot and aceflow/iterations, as used by the update tools."""
+    roots = [update_status.get_iterations_dir(), os.path.join(Path(__file__).parent.parent, "iterations")]
+    unique = []
+    for root in roots:
+        root = os.path.realpath(root)
+        if os.path.isdir(root) and root not in unique:
+            unique.append(root)
+    return unique
+
+
+def _text(value):
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value).strip()
+
+
+def _tags(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(tag).strip() for tag in value if tag is not None]
+    return [tag.strip() for tag in str(value).split(",") if tag.strip()]
+
+
+def _document_row(doc, iteration_dir, iteration, position, stamp):
+    try:
+        frontmatter, error = get_frontmatter(doc.path) or {}, None
+    except (OSError, ValueError) as e:
+        frontmatter, error = {}, str(e)
+    tags = _tags(frontmatter.get("tags"))
+    row = {
+        "path": doc.path,
+        "iteration_dir": iteration_dir,
+        "iteration": iteration,
+        "task": doc.task,
+        "stage": doc.stage,
+        "grouped": int(doc.grouped),
+        "rel_path": doc.rel_path,
+        "position": position,
+        "mtime_ns": stamp[0],
+        "size": stamp[1],
+        "inode": stamp[2],
+        "fm_stage": _text(frontmatter.get("stage")),
+        "fm_iteration": _text(frontmatter.get("iteration")),
+        "task_id": _text(frontmatter.get("task_id")),
+        "doc_owner": _text(frontmatter.get("doc_owner")),
+        "status": _text(frontmatter.get("status")),
+        "created_at": _text(frontmatter.get("created_at")),
+        "updated_at": _text(frontmatter.get("updated_at")),
+        "tags": json.dumps(tags, ensure_ascii=False),
+        "frontmatter": json.dumps(frontmatter, ensure_ascii=False, default=str),
+        "error": error,
+    }
+    return row, tags
+
+
+@traced(cat="index")
+def refresh_iteration(conn, iteration_dir, iteration=None):
+    """
+    Bring one iteration up to date. Returns (documents re-read, documents removed).
+    Only documents whose stamp changed are re-read; a document that merely moved
+    (another one was added before it) gets its position and layout columns updated in place.
+    """
+    iteration_dir = os.path.realpath(iteration_dir)
+    layout = scan_iteration(iteration_dir, iteration, with_frontmatter=False)
+    known = {row["path"]: ((row["mtime_ns"], row["size"], row["inode"]),
+                           (row["position"], row["task"], row["stage"], row["grouped"], row["rel_path"]))
+             for row in conn.execute("SELECT path, mtime_ns, size, inode, position, task, stage, grouped, rel_path "
+                                     "FROM documents WHERE iteration_dir = ?", (iteration_dir,))}
+    updated = 0
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO iterations (iteration_dir, iteration, layout, tasks) VALUES (?, ?, ?, ?)",
+                     (iteration_dir, layout.iteration, layout.layout, json.dumps(layout.tasks, ensure_ascii=False)))
+        for position, doc in enumerate(layout.documents):
+            try:
+                stamp = file_stamp(os.stat(doc.path))
+            except OSError:
+                continue
+            if doc.path in known and known[doc.path][0] == tuple(stamp):
+                placement = (position, doc.task, doc.stage, int(doc.grouped), doc.rel_path)
+                if known[doc.path][1] != placement:
+                    conn.execute("UPDATE documents SET position = ?, task = ?, stage = ?, grouped = ?, rel_path = ? "
+                                 "WHERE path = ?", placement + (doc.path,))
+                continue
+            row, tags = _document_row(doc, iteration_dir, layout.iteration, position, stamp)
+            columns = ", ".join(row)
+            placeholders = ", ".join("?" for _ in row)
+            conn.execute(f"INSERT OR REPLACE INTO documents ({columns}) VALUES ({placeholders})", list(row.values()))
+            conn.execute("DELETE FROM document_tags WHERE path = ?", (doc.path,))
+            conn.executemany("INSERT INTO document_tags (path, tag) VALUES (?, ?)", [(doc.path, tag) for tag in tags])
+            updated += 1
+        current = {doc.path for doc in layout.documents}
+        removed = [path for path in known if path not in current]
+        conn.executemany("DELETE FROM documents WHERE path = ?", [(path,) for path in removed])
+        conn.executemany("DELETE FROM document_tags WHERE path = ?", [(path,) for path in removed])
+    return updated, len(removed)
+
+
+def refresh(conn, roots=None, iterations=None):
+    """Refresh every iteration (or only the named ones) under the roots and drop vanished iterations."""
+    roots = roots or default_roots()
+    seen = set()
+    total_updated = total_removed = 0
+    for root in roots:
+        for iteration in iterations or list_iterations(root):
+            iteration_dir = os.path.realpath(os.path.join(root, iteration))
+            if not os.path.isdir(iteration_dir) or iteration_dir in seen:
+                continue
+            seen.add(iteration_dir)
+            updated, removed = refresh_iteration(conn, iteration_dir, iteration)
+            total_updated += updated
+            total_removed += removed
+    if not iterations:
+        stale = [row["iteration_dir"] for row in conn.execute("SELECT iteration_dir FROM iterations")
+                 if row["iteration_dir"] not in seen]
+        with conn:
+            for iteration_dir in stale:
+                conn.execute("DELETE FROM document_tags WHERE path IN (SELECT path FROM documents WHERE iteration_dir = ?)",
+                             (iteration_dir,))
+                conn.execute("DELETE FROM documents WHERE iteration_dir = ?", (iteration_dir,))
+                conn.execute("DELETE FROM iterations WHERE iteration_dir = ?", (iteration_dir,))
+    print(f"[doc_index] {len(seen)} iterations indexed, {total_updated} documents updated, {total_removed} removed")
+    return total_updated, total_removed
+
+
+def load_snapshot(conn, iteration_dir, iteration=None):
+    """Rebuild an IterationSnapshot from the index, or None if the iteration is not indexed."""
+    iteration_dir = os.path.realpath(iteration_dir)
+    meta = conn.execute("SELECT * FROM iterations WHERE iteration_dir = ?", (iteration_dir,)).fetchone()
+    if meta is None:
+        return None
+    snapshot = IterationSnapshot(
+        iteration=iteration or meta["iteration"],
+        iteration_dir=iteration_dir,
+        layout=meta["layout"],
+        tasks=json.loads(meta["tasks"]),
+    )
+    for row in conn.execute("SELECT * FROM documents WHERE iteration_dir = ? ORDER BY position", (iteration_dir,)):
+        frontmatter = {key: row[key] for key in ("status", "doc_owner", "task_id") if row[key] is not None}
+        snapshot.documents.append(StageDocument(
+            stage=row["stage"],
+            path=row["path"],
+            rel_path=row["rel_path"],
+            task=row["task"],
+            grouped=bool(row["grouped"]),
+            frontmatter=frontmatter,
+        ))
+    return snapshot
+
+
+def load_snapshots(targets, index_file=INDEX_FILE):
+    """Snapshots for (iteration, iteration_dir) pairs from the index; iterations not indexed are skipped."""
+    conn = connect(index_file)
+    try:
+        snapshots = []
+        for iteration, iteration_dir in targets:
+            snapshot = load_snapshot(conn, iteration_dir, iteration)
+            if snapshot is None:
+                print(f"[doc_index] {iteration} is not indexed, run doc_index.py refresh first.")
+                continue
+            snapshots.append(snapshot)
+        return snapshots
+    finally:
+        conn.close()
+
+
+@traced(cat="index")
+def query(conn, filters=None, tags=None, group_by=None, fields=None):
+    """
+    Return matching documents as dicts. filters maps a column to a list of
+    accepted values; tags requires all listed tags. With group_by, returns one
+    row per group with a count instead.
+    """
+    clauses, params = [], []
+    for column, values in (filters or {}).items():
+        if column not in QUERY_FIELDS:
+            raise ValueError(f"Unknown field: {column}")
+        if values:
+            clauses.append(f"{column} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+    for tag in tags or []:
+        clauses.append("path IN (SELECT path FROM document_tags WHERE tag = ?)")
+        params.append(tag)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    if group_by:
+        unknown = [column for column in group_by if column not in QUERY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown group-by fields: {unknown}")
+        columns = ", ".join(group_by)
+        sql = f"SELECT {columns}, COUNT(*) AS count FROM documents{where} GROUP BY {columns} ORDER BY {columns}"
+    else:
+        fields = fields or ["iteration", "task", "stage", "status", "doc_owner", "rel_path"]
+        unknown = [column for column in fields if column not in QUERY_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}")
+        sql = f"SELECT {', '.join(fields)} FROM documents{where} ORDER BY iteration, position"
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def print_rows(rows, output_format):
+    """Print query results as a table, JSON or CSV."""
+    if output_format == "json":
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    if not rows:
+        if output_format == "table":
+            print("[doc_index] 没有匹配的文档")
+        return
+    columns = list(rows[0])
+    if output_format == "csv":
+        writer = csv.DictWriter(sys.stdout, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+        return
+    print("| " + " | ".join(columns) + " |")
+    print("|" + "|".join("---" for _ in columns) + "|")
+    for row in rows:
+        print("| " + " | ".join("" if row[column] is None else str(row[column]) for column in columns) + " |")
+
+
+def main():
+    """Main function for the document index CLI."""
+    parser = argparse.ArgumentParser(description="SQLite index of aceflow stage documents.")
+    parser.add_argument("--index-file", default=INDEX_FILE, help="Path of the SQLite index.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = subparsers.add_parser("refresh", help="Incrementally update the index from the iteration directories.")
+    refresh_parser.add_argument("--iteration", action="append", help="Only refresh this iteration (repeatable).")
+    refresh_parser.add_argument("--root", action="append", help="Iteration root to index (repeatable, default: configured roots).")
+    refresh_parser.add_argument("--no-cache", action="store_true", help="Read every changed document instead of using the frontmatter cache.")
+
+    query_parser = subparsers.add_parser("query", help="Query indexed documents.")
+    query_parser.add_argument("--iteration", action="append", help="Filter by iteration (repeatable).")
+    query_parser.add_argument("--stage", action="append", help="Filter by stage, e.g. S5 (repeatable).")
+    query_parser.add_argument("--task", action="append", help="Filter by task_id (repeatable).")
+    query_parser.add_argument("--owner", action="append", help="Filter by doc_owner (repeatable).")
+    query_parser.add_argument("--status", action="append", help="Filter by status, e.g. 进行中 (repeatable).")
+    query_parser.add_argument("--tag", action="append", help="Require a tag (repeatable).")
+    query_parser.add_argument("--group-by", help="Comma-separated fields to group and count by, e.g. doc_owner,status.")
+    query_parser.add_argument("--fields", help=f"Comma-separated output fields ({', '.join(QUERY_FIELDS)}).")
+    query_parser.add_argument("--format", choices=["table", "json", "csv"], default="table", help="Output format (default: table).")
+    query_parser.add_argument("--refresh", action="store_true", help="Refresh the index before querying.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+
+    conn = connect(args.index_file)
+    try:
+        if args.command == "refresh":
+            if args.no_cache:
+                disable_cache()
+            refresh(conn, args.root, args.iteration)
+            return
+        if args.refresh:
+            refresh(conn)
+        filters = {"iteration": args.iteration, "stage": args.stage, "task_id": args.task,
+                   "doc_owner": args.owner, "status": args.status}
+        group_by = [f.strip() for f in args.group_by.split(",")] if args.group_by else None
+        fields = [f.strip() for f in args.fields.split(",")] if args.fields else None
+        try:
+            rows = query(conn, filters, args.tag, group_by, fields)
+        except ValueError as e:
+            print(f"[doc_index] ❌ {e}")
+            sys.exit(1)
+        print_rows(rows, args.format)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared Front-matter reader for aceflow stage documents.
+It streams a Markdown file only up to the closing '---' delimiter, never
+reading the document body, and gives up once a configurable byte cap is
+exceeded. All requested keys are extracted from a single parse of the block.
+Flat 'key: value' blocks are parsed by a fast path that yields the same types
+as yaml.safe_load; anything else is handed to PyYAML (libyaml when available).
+"""
+
+import os
+import re
+import datetime
+
+from profiling import count, span
+
+DELIMITER = "---"
+# Upper bound on the bytes read while looking for the closing delimiter
+DEFAULT_MAX_BYTES = int(os.environ.get("ACEFLOW_FRONTMATTER_MAX_BYTES", 64 * 1024))
+
+
+def read_frontmatter_block(file_path, max_bytes=None):
+    """
+    Return the raw text between the opening and closing '---' lines of a file,
+    or None if the file has no Front-matter within max_bytes.
+    Raises OSError if the file cannot be read.
+    """
+    limit = DEFAULT_MAX_BYTES if max_bytes is None else max_bytes
+    consumed = 0
+    lines = []
+    count("files_read")
+    try:
+        with open(file_path, 'rb') as f:
+            first = f.readline(limit + 1)
+            consumed += len(first)
+            if first.lstrip(b'\xef\xbb\xbf').strip() != DELIMITER.encode():
+                return None
+            while consumed <= limit:
+                line = f.readline(limit - consumed + 1)
+                if not line:
+                    return None
+                consumed += len(line)
+                if line.strip() == DELIMITER.encode():
+                    return b''.join(lines).decode('utf-8')
+                lines.append(line)
+        return None
+    finally:
+        count("bytes_read", consumed)
+
+
+# Plain scalars the fast path resolves exactly as PyYAML's YAML 1.1 resolver does
+_NULLS = {"", "~", "null", "Null", "NULL"}
+_BOOLS = {
+    "yes": True, "Yes": True, "YES": True, "true": True, "True": True, "TRUE": True, "on": True, "On": True, "ON": True,
+    "no": False, "No": False, "NO": False, "false": False, "False": False, "FALSE": False, "off": False, "Off": False, "OFF": False,
+}
+_KEY = re.compile(r"[A-Za-z_][A-Za-z0-9_\-]*\Z")
+_INT = re.compile(r"[-+]?(?:0|[1-9][0-9]*)\Z")
+_DATE = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})\Z")
+# A plain scalar starting with one of these is an indicator, a number-like or a special value
+_SPECIAL_START = set("-?:,[]{}#&*!|>%@`=<.+0123456789")
+
+
+class _NotFlat(Exception):
+    """The block uses YAML beyond flat plain scalars; parse it with PyYAML."""
+
+
+def _flat_scalar(text):
+    if text in _NULLS:
+        return None
+    if text in _BOOLS:
+        return _BOOLS[text]
+    if _INT.match(text):
+        return int(text)
+    match = _DATE.match(text)
+    if match:
+        try:
+            return datetime.date(*map(int, match.groups()))
+        except ValueError:
+            raise _NotFlat
+    quote = text[0]
+    if quote in ("'", '"'):
+        inner = text[1:-1]
+        if len(text) < 2 or text[-1] != quote or quote in inner or "\\" in inner:
+            raise _NotFlat
+        return inner
+    if text[0] in _SPECIAL_START or ": " in text or " #" in text or text.endswith(":"):
+        raise _NotFlat
+    return text
+
+
+def _parse_flat(block):
+    """Parse a block of flat 'key: plain scalar' lines, or raise _NotFlat."""
+    data = {}
+    for line in block.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        if line[0] in " \t" or "\t" in line or not line.isprintable():
+            raise _NotFlat
+        key, sep, value = line.partition(":")
+        if not sep or (value and value[0] != " ") or not _KEY.match(key) or key in _BOOLS or key in _NULLS:
+            raise _NotFlat
+        data[key] = _flat_scalar(value.strip())
+    return data
+
+
+def _yaml_load(text):
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)
+
+
+def load_yaml_mapping(text):
+    """
+    Parse YAML text that is expected to be a mapping (Front-matter, task contexts).
+    Returns {} for empty text; raises ValueError if it is not a mapping.
+    """
+    try:
+        data = _parse_flat(text)
+        count("yaml_fast_path")
+        return data
+    except _NotFlat:
+        pass
+    count("yaml_fallback")
+    try:
+        with span("yaml_fallback", cat="parse"):
+            data = _yaml_load(text)
+    except Exception as e:
+        raise ValueError(f"Invalid YAML: {e}") from e
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"Front-matter is not a mapping: {type(data).__name__}")
+    return data
+
+
+def parse_frontmatter_block(block):
+    """Parse the text of a Front-matter block into a dict. Raises ValueError if it is not a mapping."""
+    return load_yaml_mapping(block)
+
+
+def read_frontmatter(file_path, keys=None, max_bytes=None):
+    """
+    Read and parse the Front-matter of a file in one pass.
+    Returns only the requested keys (all keys if keys is None), or None if the
+    file has no Front-matter.
+    """
+    block = read_frontmatter_block(file_path, max_bytes)
+    if block is None:
+        return None
+    data = parse_frontmatter_block(block)
+    if keys is None:
+        return data
+    return {key: data[key] for key in keys if key in data}
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Persistent Front-matter cache for aceflow stage documents.
+Parsed Front-matter is stored in aceflow/.cache/frontmatter_cache.json keyed by
+absolute path and validated against (mtime_ns, size, inode), so documents that
+did not change since the previous run are never opened again. Entries whose
+files no longer exist are evicted when a cache that changed is saved, or when
+a caller that scanned every iteration asks for it (request_prune); evicting
+stats every cached path, so a run that read a few documents does not pay it.
+Single-document CLIs skip the cache entirely (disable_cache): reading one file
+is cheaper than loading the cache of the whole repository.
+"""
+
+import os
+import json
+import atexit
+import datetime
+import tempfile
+import threading
+from pathlib import Path
+
+from frontmatter import read_frontmatter
+from profiling import count, span
+
+CACHE_VERSION = 1
+CACHE_FILE = os.path.join(Path(__file__).parent.parent, ".cache", "frontmatter_cache.json")
+
+
+def _encode(value):
+    """Make parsed YAML values JSON-serializable, tagging dates so they round-trip."""
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, dict):
+        return {str(k): _encode(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _decode(obj):
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj and len(obj) == 1:
+        return datetime.date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def file_stamp(stat_result):
+    """The cache key components of a file: (mtime_ns, size, inode)."""
+    return [stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino]
+
+
+class FrontmatterCache:
+    """
+    Thread-safe mtime-keyed cache of parsed Front-matter.
+    get() returns the parsed dict (None if the file has no Front-matter) and
+    raises ValueError if the cached Front-matter could not be parsed.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, enabled=True):
+        self.cache_file = cache_file
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._seen = set()
+        self._updated = {}
+        self._dirty = False
+        self._prune = False
+
+    def _load(self):
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with span("load_frontmatter_cache", cat="cache"), open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f, object_hook=_decode)
+            if data.get("version") == CACHE_VERSION:
+                self._entries = data.get("entries", {})
+        except (OSError, ValueError) as e:
+            print(f"[frontmatter_cache] ⚠️ 缓存文件无法读取，已忽略: {e}")
+
+    @staticmethod
+    def _result(entry):
+        if entry.get("error"):
+            raise ValueError(entry["error"])
+        return entry["frontmatter"]
+
+    def lookup(self, file_path, stamp):
+        """Return the cached entry for a path if its stamp still matches, else None."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            self._load()
+            self._seen.add(path)
+            entry = self._entries.get(path)
+            if entry is not None and entry["stamp"] == list(stamp):
+                self.hits += 1
+                count("frontmatter_cache_hits")
+                return entry
+        return None
+
+    def store(self, file_path, entry):
+        """Record an entry of the form {"stamp", "frontmatter", "error"} for a path."""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            self._load()
+            self._seen.add(path)
+            self._entries[path] = entry
+            self._updated[path] = entry
+            self._dirty = True
+
+    def drain_updates(self):
+        """Return and forget the entries stored since the last call, for handing back to a parent process."""
+        with self._lock:
+            updates, self._updated = self._updated, {}
+        return updates
+
+    def merge(self, updates):
+        """Adopt entries produced by another process (see drain_updates)."""
+        for path, entry in updates.items():
+            self.store(path, entry)
+
+    def get(self, file_path, max_bytes=None):
+        """Return the parsed Front-matter of a file, reading it only if it changed."""
+        stamp = file_stamp(os.stat(file_path))
+        if self.enabled:
+            entry = self.lookup(file_path, stamp)
+            if entry is not None:
+                return self._result(entry)
+        try:
+            with span("read_frontmatter", cat="io"):
+                entry = {"stamp": stamp, "frontmatter": read_frontmatter(file_path, max_bytes=max_bytes), "error": None}
+        except (ValueError, UnicodeDecodeError) as e:
+            entry = {"stamp": stamp, "frontmatter": None, "error": str(e)}
+        count("frontmatter_cache_misses")
+        with self._lock:
+            self.misses += 1
+        if self.enabled:
+            self.store(file_path, entry)
+        return self._result(entry)
+
+    def request_prune(self):
+        """Evict entries for deleted files on save even if nothing else changed; for full scans."""
+        self._prune = True
+
+    def save(self):
+        """Evict entries for deleted files and write the cache atomically if it changed (or pruning was requested)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._entries is None or not (self._dirty or self._prune):
+                return
+            for path in [p for p in self._entries if p not in self._seen]:
+                if not os.path.exists(path):
+                    del self._entries[path]
+                    self._dirty = True
+            if not self._dirty:
+                return
+            payload = {"version": CACHE_VERSION, "entries": _encode(self._entries)}
+            self._dirty = False
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".frontmatter_cache.", dir=cache_dir)
+            with span("save_frontmatter_cache", cat="cache"), os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"[frontmatter_cache] ⚠️ 缓存文件写入失败: {e}")
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Return the process-wide cache, saved automatically when the process exits."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = FrontmatterCache()
+            atexit.register(_default_cache.save)
+        return _default_cache
+
+
+def disable_cache():
+    """Escape hatch for --no-cache: always read documents and never touch the cache file."""
+    get_cache().enabled = False
+
+
+def get_frontmatter(file_path, max_bytes=None):
+    """Return the parsed Front-matter of a file through the process-wide cache."""
+    return get_cache().get(file_path, max_bytes)
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Shared single-pass scanner for aceflow iteration directories.
+It walks an iteration once with os.scandir, reads the Front-matter of every
+stage document exactly once, and returns an IterationSnapshot that the
+update_status, update_task_reminders and update_navigation tools consume.
+Supports both old and new directory structures.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from frontmatter_cache import get_cache, get_frontmatter
+from profiling import count, span
+
+# (stage, old structure entry, new structure file name)
+STAGES = [
+    ('S1', 's1_user_story.md', 's1_user_story.md'),
+    ('S2', 's2_tasks.md', 's2_tasks.md'),
+    ('S3', 's3_testcases', 's3_testcases.md'),
+    ('S4', 's4_implementation', 's4_implementation.md'),
+    ('S5', 's5_test_report.md', 's5_test_report.md'),
+    ('S6', 's6_codereview.md', 's6_codereview.md'),
+    ('S7', 's7_demo_feedback.md', 's7_demo_feedback.md'),
+    ('S8', 's8_progress_index.md', 's8_progress_index.md'),
+]
+STAGE_NAMES = [stage for stage, _, _ in STAGES]
+
+FRONTMATTER_KEYS = ("status", "doc_owner", "task_id")
+UNKNOWN = "未知"
+
+
+@dataclass
+class StageDocument:
+    """A single stage document found in an iteration."""
+    stage: str
+    path: str
+    rel_path: str
+    task: Optional[str] = None
+    grouped: bool = False  # True for documents inside an old-structure stage directory
+    frontmatter: Dict[str, str] = field(default_factory=dict)
+
+    def get(self, key, default=UNKNOWN):
+        return self.frontmatter.get(key, default)
+
+    @property
+    def status(self):
+        return self.get("status")
+
+    @property
+    def name(self):
+        return os.path.basename(self.path).split('.')[0]
+
+
+@dataclass
+class IterationSnapshot:
+    """Everything the update tools need to know about one iteration."""
+    iteration: str
+    iteration_dir: str
+    layout: str  # "old" or "new"
+    tasks: List[str] = field(default_factory=list)
+    documents: List[StageDocument] = field(default_factory=list)
+
+    def stage_documents(self, stage):
+        return [doc for doc in self.documents if doc.stage == stage]
+
+    def task_documents(self, task):
+        return [doc for doc in self.documents if doc.task == task]
+
+
+def read_stage_frontmatter(file_path):
+    """Read the Front-matter keys used by the update tools from a stage document, as strings."""
+    try:
+        data = get_frontmatter(file_path) or {}
+    except Exception as e:
+        print(f"Error reading {file_path}: {e}")
+        return {}
+    return {key: str(data[key]).strip() for key in FRONTMATTER_KEYS if data.get(key) is not None}
+
+
+def _list_entries(directory):
+    """Return {name: DirEntry} for a directory, or an empty dict if it cannot be listed."""
+    count("dirs_listed")
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name: entry for entry in it}
+    except OSError:
+        return {}
+
+
+def _is_dir(entry):
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _is_file(entry):
+    try:
+        return entry.is_file()
+    except OSError:
+        return False
+
+
+def _make_document(snapshot, stage, path, task=None, grouped=False, with_frontmatter=True):
+    return StageDocument(
+        stage=stage,
+        path=path,
+        rel_path=os.path.relpath(path, snapshot.iteration_dir),
+        task=task,
+        grouped=grouped,
+        frontmatter=read_stage_frontmatter(path) if with_frontmatter else {},
+    )
+
+
+def _scan_old_structure(snapshot, entries, with_frontmatter):
+    for stage, entry_name, _ in STAGES:
+        entry = entries.get(entry_name)
+        if entry is None:
+            continue
+        if _is_dir(entry):
+            # For directories like s3_testcases, every .md inside is a stage document
+            items = _list_entries(entry.path)
+            for name in sorted(items):
+                if name.endswith('.md') and _is_file(items[name]):
+                    snapshot.documents.append(_make_document(
+                        snapshot, stage, items[name].path, grouped=True, with_frontmatter=with_frontmatter))
+        elif _is_file(entry):
+            snapshot.documents.append(_make_document(
+                snapshot, stage, entry.path, with_frontmatter=with_frontmatter))
+
+
+def _scan_new_structure(snapshot, entries, with_frontmatter):
+    for task in snapshot.tasks:
+        task_entries = _list_entries(entries[task].path)
+        for stage, _, file_name in STAGES:
+            entry = task_entries.get(file_name)
+            if entry is not None and _is_file(entry):
+                snapshot.documents.append(_make_document(
+                    snapshot, stage, entry.path, task=task, with_frontmatter=with_frontmatter))
+
+
+def scan_iteration(iteration_dir, iteration=None, with_frontmatter=True):
+    """
+    Walk an iteration directory once and return its IterationSnapshot.
+    Pass with_frontmatter=False when only the document layout is needed.
+    """
+    with span("scan_iteration", cat="scan", iteration=iteration or os.path.basename(iteration_dir)) as s:
+        snapshot = _scan_iteration(os.path.abspath(iteration_dir), iteration, with_frontmatter)
+        s.set(layout=snapshot.layout, documents=len(snapshot.documents))
+    return snapshot
+
+
+def _scan_iteration(iteration_dir, iteration, with_frontmatter):
+    entries = _list_entries(iteration_dir)
+    subdirs = sorted(name for name, entry in entries.items() if _is_dir(entry))
+    # The directory contains task subdirectories (new structure) if any of them is a T-* task
+    layout = "new" if any(name.startswith('T-') for name in subdirs) else "old"
+    snapshot = IterationSnapshot(
+        iteration=iteration or os.path.basename(iteration_dir),
+        iteration_dir=iteration_dir,
+        layout=layout,
+        tasks=subdirs if layout == "new" else [],
+    )
+    if layout == "new":
+        _scan_new_structure(snapshot, entries, with_frontmatter)
+    else:
+        _scan_old_structure(snapshot, entries, with_frontmatter)
+    return snapshot
+
+
+_STAGE_BY_OLD_ENTRY = {entry: stage for stage, entry, _ in STAGES}
+_STAGE_BY_NEW_FILE = {file_name: stage for stage, _, file_name in STAGES}
+_STAGE_ORDER = {stage: index for index, stage in enumerate(STAGE_NAMES)}
+
+
+def _locate(snapshot, rel_parts):
+    """Map a path inside an iteration to its (stage, task, grouped) document slot, or None."""
+    if snapshot.layout == "new":
+        if len(rel_parts) == 2 and rel_parts[0] in snapshot.tasks and rel_parts[1] in _STAGE_BY_NEW_FILE:
+            return _STAGE_BY_NEW_FILE[rel_parts[1]], rel_parts[0], False
+        return None
+    stage = _STAGE_BY_OLD_ENTRY.get(rel_parts[0])
+    if stage is None:
+        return None
+    if len(rel_parts) == 1 and rel_parts[0].endswith('.md'):
+        return stage, None, False
+    if len(rel_parts) == 2 and not rel_parts[0].endswith('.md') and rel_parts[1].endswith('.md'):
+        return stage, None, True
+    return None
+
+
+def _is_structural(snapshot, rel_parts, path):
+    """True if a change at this path can alter the iteration layout or its task list."""
+    if len(rel_parts) != 1:
+        return False
+    name = rel_parts[0]
+    if name.startswith('T-') or name in snapshot.tasks or os.path.isdir(path):
+        return True
+    # Old-structure stage directories such as s3_testcases
+    return snapshot.layout == "old" and name in _STAGE_BY_OLD_ENTRY and not name.endswith('.md')
+
+
+def _document_order(snapshot):
+    task_order = {task: index for index, task in enumerate(snapshot.tasks)}
+    if snapshot.layout == "new":
+        return lambda doc: (task_order.get(doc.task, len(task_order)), _STAGE_ORDER[doc.stage])
+    return lambda doc: (_STAGE_ORDER[doc.stage], doc.grouped, doc.path)
+
+
+def refresh_paths(snapshot, paths):
+    """
+    Re-evaluate only the stage documents at the given paths inside the iteration.
+    Changed documents are re-read (through the frontmatter cache), deleted ones
+    dropped and new ones added. Returns the updated snapshot: the same object when
+    every path maps to a stage document slot, or a full rescan when the layout or
+    task list may have changed. Paths that are not stage documents are ignored.
+    """
+    updates = {}
+    for path in paths:
+        path = os.path.abspath(path)
+        rel_parts = os.path.relpath(path, snapshot.iteration_dir).split(os.sep)
+        if rel_parts[0] in (os.curdir, os.pardir):
+            continue
+        if _is_structural(snapshot, rel_parts, path):
+            return scan_iteration(snapshot.iteration_dir, snapshot.iteration)
+        slot = _locate(snapshot, rel_parts)
+        if slot is not None:
+            updates[path] = slot
+
+    if updates:
+        documents = [doc for doc in snapshot.documents if doc.path not in updates]
+        for path, (stage, task, grouped) in updates.items():
+            if os.path.isfile(path):
+                documents.append(_make_document(snapshot, stage, path, task=task, grouped=grouped))
+        documents.sort(key=_document_order(snapshot))
+        snapshot.documents = documents
+    return snapshot
+
+
+def list_iterations(iterations_dir):
+    """Get a sorted list of all iteration directories in the given iterations folder."""
+    entries = _list_entries(iterations_dir)
+    return sorted(name for name, entry in entries.items() if _is_dir(entry))
+
+
+def _scan_in_worker(iteration_dir, iteration, with_frontmatter, use_cache):
+    """Process pool entry point: scan one iteration and hand new cache entries back to the parent."""
+    cache = get_cache()
+    cache.enabled = use_cache
+    snapshot = scan_iteration(iteration_dir, iteration, with_frontmatter)
+    return snapshot, cache.drain_updates()
+
+
+def scan_iterations(targets, jobs=1, with_frontmatter=True):
+    """
+    Scan several iterations, given as (iteration, iteration_dir) pairs, and return
+    their snapshots in the same order. With jobs > 1 the iterations are fanned out
+    across a process pool; the frontmatter parsed by the workers is merged back
+    into this process's cache so it is persisted once by the parent.
+    """
+    if jobs <= 1 or len(targets) <= 1:
+        return [scan_iteration(iteration_dir, iteration, with_frontmatter) for iteration, iteration_dir in targets]
+    with span("scan_iterations", cat="scan", iterations=len(targets), jobs=jobs):
+        return _scan_in_pool(targets, jobs, with_frontmatter)
+
+
+def _scan_in_pool(targets, jobs, with_frontmatter):
+    cache = get_cache()
+    snapshots = []
+    # Callers such as update_all scan from worker threads, where forking is unsafe
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    with ProcessPoolExecutor(max_workers=min(jobs, len(targets)), mp_context=context) as pool:
+        futures = [pool.submit(_scan_in_worker, iteration_dir, iteration, with_frontmatter, cache.enabled)
+                   for iteration, iteration_dir in targets]
+        for future in futures:
+            snapshot, updates = future.result()
+            cache.merge(updates)
+            snapshots.append(snapshot)
+    return snapshots
+
+
+class SnapshotCache:
+    """
+    Thread-safe memo of iteration snapshots keyed by directory, so that tools
+    running in the same process (see update_all) walk each iteration only once.
+    """
+
+    def __init__(self, jobs=1):
+        self.jobs = jobs
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._snapshots = {}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, iteration_dir, iteration=None):
+        return self.get_many([(iteration, iteration_dir)])[0]
+
+    def get_many(self, targets):
+        """Return snapshots for (iteration, iteration_dir) pairs, scanning the missing ones together."""
+        keys = [os.path.realpath(iteration_dir) for _, iteration_dir in targets]
+        # Take the per-directory locks in a fixed order so concurrent callers cannot deadlock
+        key_locks = [self._key_lock(key) for key in sorted(set(keys))]
+        for key_lock in key_locks:
+            key_lock.acquire()
+        try:
+            missing = {}
+            for key, target in zip(keys, targets):
+                if key not in self._snapshots:
+                    missing.setdefault(key, target)
+            scanned = scan_iterations(list(missing.values()), self.jobs)
+            self._snapshots.update(zip(missing, scanned))
+            return [self._snapshots[key] for key in keys]
+        finally:
+            for key_lock in reversed(key_locks):
+                key_lock.release()
+
+
+def get_snapshots(targets, snapshots=None, jobs=1, with_frontmatter=True):
+    """
+    Return the snapshots of (iteration, iteration_dir) pairs in order, from the
+    shared cache when one is given.
+    """
+    if snapshots is not None:
+        return snapshots.get_many(targets)
+    return scan_iterations(targets, jobs, with_frontmatter)
@@ -5,48 +5,160 @@
 Script to dynamically load attention mechanism prompt templates for AceFlow stages.
 This script scans the attention prompt templates directory and loads the appropriate
 template based on the specified stage.
+Other tools load templates in-process through load_attention_prompt(), which is
+memoized and invalidated by template mtime. --build-bundle precompiles all S1–S8
+templates into a single bundle file, so a lookup costs one file read.
 """
 
 import os
+import json
+import tempfile
+import threading
 import argparse
 from pathlib import Path
 
+from profiling import add_profile_argument, enable_from_args, count, span
+
+STAGES = [f"S{i}" for i in range(1, 9)]
+TEMPLATE_DIR = os.path.join(Path(__file__).parent.parent, "templates")
+BUNDLE_FILE = os.path.join(Path(__file__).parent.parent, ".cache", "attention_prompts.json")
+BUNDLE_VERSION = 1
+
+def normalize_stage(stage):
+    """Return the stage as S1..S8, or None if it is not a valid stage name."""
+    stage = str(stage).strip().upper()
+    return stage if stage in STAGES else None
+
+def template_path(stage):
+    return os.path.join(TEMPLATE_DIR, f"prompt_snippet_attention_s{stage.lower()[1]}.md")
+
+def _stamp(path):
+    """(mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+class TemplateCache:
+    """
+    Memoized attention prompt templates. An entry is reused while the template's
+    (mtime_ns, size) is unchanged; a bundle entry is used when its recorded stamp
+    still matches the template, or when the template file is not installed.
+    """
+
+    def __init__(self, bundle_file=BUNDLE_FILE):
+        self.bundle_file = bundle_file
+        self._lock = threading.Lock()
+        self._memo = {}
+        self._bundle = None
+        self._bundle_stamp = None
+
+    def _load_bundle(self):
+        stamp = _stamp(self.bundle_file)
+        if stamp == self._bundle_stamp and self._bundle is not None:
+            return self._bundle
+        self._bundle, self._bundle_stamp = {}, stamp
+        if stamp is None:
+            return self._bundle
+        try:
+            with open(self.bundle_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == BUNDLE_VERSION:
+                self._bundle = data.get("templates", {})
+        except (OSError, ValueError) as e:
+            print(f"[Attention Loader] 模板包无法读取，已忽略: {e}")
+        return self._bundle
+
+    def get(self, stage):
+        """Return (content, source) for a stage, or (None, path) if no template exists."""
+        path = template_path(stage)
+        stamp = _stamp(path)
+        with self._lock:
+            memo = self._memo.get(stage)
+            if memo is not None and memo[0] == stamp:
+                count("template_cache_hits")
+                return memo[1], memo[2]
+            count("template_cache_misses")
+            entry = self._load_bundle().get(stage)
+            if entry is not None and (stamp is None or entry["stamp"] == stamp):
+                content, source = entry["content"], self.bundle_file
+            elif stamp is None:
+                return None, path
+            else:
+                with span("read_template", cat="io", stage=stage), open(path, 'r', encoding='utf-8') as f:
+                    content, source = f.read(), path
+                count("files_read")
+            self._memo[stage] = (stamp, content, source)
+            return content, source
+
+    def clear(self):
+        with self._lock:
+            self._memo.clear()
+            self._bundle = self._bundle_stamp = None
+
+_cache = TemplateCache()
+
 def load_attention_prompt(stage):
     """Load the attention prompt template for the specified stage."""
-    base_dir = Path(__file__).parent.parent
-    template_dir = os.path.join(base_dir, "templates")
-    template_file = f"prompt_snippet_attention_s{stage.lower()[1]}.md"
-    template_path = os.path.join(template_dir, template_file)
-    
-    if not os.path.exists(template_path):
-        print(f"[Attention Loader] 注意力机制模板文件不存在: {template_path}")
-        return None
-    
     try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        print(f"[Attention Loader] 成功加载注意力机制模板: {template_file}")
-        return content
+        content, source = _cache.get(stage)
     except Exception as e:
         print(f"[Attention Loader] 加载模板时出错: {e}")
         return None
+    if content is None:
+        print(f"[Attention Loader] 注意力机制模板文件不存在: {source}")
+        return None
+    print(f"[Attention Loader] 成功加载注意力机制模板: {os.path.basename(source)}")
+    return content
 
-def main():
-    """Main function to load attention prompt template for a specific stage."""
-    parser = argparse.ArgumentParser(description="加载指定阶段的注意力机制提示词模板")
-    parser.add_argument("--stage", required=True, help="阶段名称，如 S1")
-    args = parser.parse_args()
-    
-    stage = args.stage.upper()
-    if not stage.startswith('S') or len(stage) != 2 or not stage[1].isdigit() or int(stage[1]) not in range(1, 9):
-        print(f"[Attention Loader] 无效的阶段名称: {stage}，应为 S1 到 S8")
-        return
-    
-    prompt_content = load_attention_prompt(stage)
+def build_bundle(bundle_file=BUNDLE_FILE):
+    """Precompile every installed S1–S8 template into one bundle file. Returns the bundled stages."""
+    templates = {}
+    for stage in STAGES:
+        path = template_path(stage)
+        stamp = _stamp(path)
+        if stamp is None:
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            templates[stage] = {"stamp": stamp, "content": f.read()}
+    os.makedirs(os.path.dirname(bundle_file), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".attention_prompts.", dir=os.path.dirname(bundle_file))
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({"version": BUNDLE_VERSION, "templates": templates}, f, ensure_ascii=False)
+    os.replace(tmp_path, bundle_file)
+    _cache.clear()
+    print(f"[Attention Loader] 已生成模板包 {bundle_file}，包含 {len(templates)} 个模板")
+    return list(templates)
+
+def run(stage):
+    """Load and print the attention prompt template for a stage. Returns True on success."""
+    stage_name = normalize_stage(stage)
+    if stage_name is None:
+        print(f"[Attention Loader] 无效的阶段名称: {stage.upper()}，应为 S1 到 S8")
+        return False
+
+    prompt_content = load_attention_prompt(stage_name)
     if prompt_content:
         print("\n=== 注意力机制提示词内容 ===")
         print(prompt_content)
         print("=== 内容结束 ===")
+    return True
+
+def main():
+    """Main function to load attention prompt template for a specific stage."""
+    parser = argparse.ArgumentParser(description="加载指定阶段的注意力机制提示词模板")
+    parser.add_argument("--stage", help="阶段名称，如 S1")
+    parser.add_argument("--build-bundle", action="store_true", help="将 S1–S8 模板预编译为单个模板包文件")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.build_bundle:
+        build_bundle()
+    if args.stage:
+        run(args.stage)
+    elif not args.build_bundle:
+        parser.error("请通过 --stage 指定阶段，或使用 --build-bundle")
 
 if __name__ == "__main__":
     main()
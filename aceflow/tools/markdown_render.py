@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Buffered Markdown rendering shared by the update tools: tables, link lists
+and Mermaid blocks are collected as a list of lines and joined once.
+Writes go through write_if_changed, which compares a content digest that
+ignores timestamp fields (the "更新时间" columns the tools stamp on every
+refresh) and leaves the file, and its mtime, alone when nothing else changed.
+"""
+
+from markdown_sections import content_digest, same_content, write_if_changed  # noqa: F401 (re-exported)
+
+
+class MarkdownBuilder:
+    """Accumulates lines of Markdown; text() joins them once."""
+
+    def __init__(self):
+        self._lines = []
+
+    def line(self, text=""):
+        self._lines.append(text)
+        return self
+
+    def lines(self, texts):
+        self._lines.extend(texts)
+        return self
+
+    def table(self, header, rows, separator=None):
+        """
+        A pipe table. header is a list of cells, or a preformatted header line;
+        separator defaults to one '---' per column.
+        """
+        if isinstance(header, str):
+            self._lines.append(header)
+            columns = header.strip().strip("|").count("|") + 1
+        else:
+            self._lines.append(table_row(header))
+            columns = len(header)
+        self._lines.append(separator or table_row(["---"] * columns))
+        self._lines.extend(row if isinstance(row, str) else table_row(row) for row in rows)
+        return self
+
+    def link_list(self, groups):
+        """Bold group titles, each followed by an indented list of (title, target) links."""
+        for title, links in groups:
+            self._lines.append(f"- **{title}**")
+            self._lines.extend(f"  - [{text}]({target})" for text, target in links)
+        return self
+
+    def mermaid(self, graph_lines, direction="graph LR"):
+        """A fenced Mermaid block; graph_lines are indented by four spaces."""
+        self._lines.append("```mermaid")
+        self._lines.append(direction)
+        self._lines.extend(f"    {line}" for line in graph_lines)
+        self._lines.append("```")
+        return self
+
+    def text(self):
+        """The rendered Markdown, ending with a newline."""
+        return "\n".join(self._lines) + "\n" if self._lines else ""
+
+
+def table_row(cells):
+    return "| " + " | ".join(str(cell) for cell in cells) + " |"
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Section-aware document model for aceflow Markdown outputs (status.md, index.md).
+A file is parsed once into its preamble and an ordered map of '## ' sections.
+Tools apply all of their section updates in memory and the file is written
+exactly once, atomically (temporary file plus rename), so a concurrent reader
+never sees a half-written document. A document whose only change is a
+refreshed timestamp is not written at all, so its mtime stays put.
+"""
+
+import os
+import re
+import hashlib
+import shutil
+import tempfile
+import threading
+
+from profiling import count, span
+
+HEADING_PREFIX = "## "
+FENCE = "```"
+# "2025-07-01 12:30", "2025-07-01T12:30:05", ...; plain dates are content and stay significant
+TIMESTAMP = re.compile(r"\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?")
+
+
+def _trailing_blank(text):
+    """The run of trailing newlines that separates a section from the next one."""
+    return text[len(text.rstrip("\n")):]
+
+
+class SectionDocument:
+    """A Markdown file as a preamble followed by an ordered map of '## ' sections."""
+
+    def __init__(self, path, text=""):
+        self.path = path
+        self.original = text
+        self.preamble = ""
+        self._headings = []  # raw heading lines, including their line ending
+        self._bodies = {}    # heading text -> body text up to the next section
+        self._lock = threading.RLock()
+        self._parse(text)
+
+    @classmethod
+    def load(cls, path):
+        with span("load_markdown", cat="io", path=os.path.basename(path)):
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+                count("files_read")
+                count("bytes_read", f.tell())
+            return cls(path, text)
+
+    def _parse(self, text):
+        current = None
+        chunks = []
+        in_fence = False
+        for line in text.splitlines(keepends=True):
+            if line.lstrip().startswith(FENCE):
+                in_fence = not in_fence
+            if not in_fence and line.startswith(HEADING_PREFIX):
+                self._flush(current, chunks)
+                current, chunks = line, []
+            else:
+                chunks.append(line)
+        self._flush(current, chunks)
+
+    def _flush(self, heading_line, chunks):
+        body = "".join(chunks)
+        if heading_line is None:
+            self.preamble = body
+            return
+        key = heading_line.rstrip("\r\n")
+        if key in self._bodies:
+            # Keep duplicate headings verbatim as part of the previous section
+            last = self._headings[-1].rstrip("\r\n")
+            self._bodies[last] += heading_line + body
+            return
+        self._headings.append(heading_line)
+        self._bodies[key] = body
+
+    def headings(self):
+        return [line.rstrip("\r\n") for line in self._headings]
+
+    def get(self, heading):
+        """Return the body of a section, or None if the section does not exist."""
+        with self._lock:
+            return self._bodies.get(heading)
+
+    def set(self, heading, body):
+        """
+        Replace the body of a section, keeping the blank lines that separated it
+        from the next section. A missing section is appended to the end of the file.
+        """
+        with self._lock:
+            old = self._bodies.get(heading)
+            if old is None:
+                self._append(heading, body)
+                return
+            separator = _trailing_blank(old)
+            self._bodies[heading] = body.rstrip("\n") + (separator or "\n")
+
+    def update(self, heading, transform):
+        """Atomically replace a section body with transform(old_body); old_body is None if missing."""
+        with self._lock:
+            new_body = transform(self._bodies.get(heading))
+            if new_body is not None:
+                self.set(heading, new_body)
+            return new_body
+
+    def _append(self, heading, body):
+        if self._headings:
+            last = self._headings[-1].rstrip("\r\n")
+            self._bodies[last] += "\n\n"
+        else:
+            self.preamble += "\n\n"
+        self._headings.append(heading + "\n")
+        self._bodies[heading] = body
+
+    def render(self):
+        with self._lock:
+            parts = [self.preamble]
+            for line in self._headings:
+                parts.append(line)
+                parts.append(self._bodies[line.rstrip("\r\n")])
+            return "".join(parts)
+
+    @property
+    def changed(self):
+        return not same_content(self.render(), self.original)
+
+    def save(self):
+        """Write the document atomically if it changed beyond its timestamps. Returns True if the file was written."""
+        with self._lock:
+            content = self.render()
+            if same_content(content, self.original):
+                return False
+            write_atomic(self.path, content)
+            self.original = content
+            return True
+
+
+def write_atomic(path, content):
+    """Write a text file through a temporary file in the same directory and rename it into place."""
+    count("files_written")
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+            count("bytes_written", f.tell())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def content_digest(text):
+    """Digest of text with timestamp fields masked, so a refresh that only moves the clock compares equal."""
+    return hashlib.blake2b(TIMESTAMP.sub("<time>", text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def same_content(a, b):
+    return a == b or content_digest(a) == content_digest(b)
+
+
+def write_if_changed(path, content):
+    """Write content atomically unless the file already holds it up to timestamps. Returns True if written."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if same_content(f.read(), content):
+                return False
+    except (OSError, UnicodeDecodeError):
+        pass  # missing or unreadable: write it
+    write_atomic(path, content)
+    return True
+
+
+class DocumentSet:
+    """
+    Shared registry of open SectionDocuments. Every tool that edits the same file
+    in one run gets the same in-memory document; commit() writes each file once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = {}
+
+    def open(self, path):
+        key = os.path.abspath(path)
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = SectionDocument.load(path)
+            return self._documents[key]
+
+    def commit(self):
+        """Save every changed document. Returns the paths that were written."""
+        with self._lock:
+            documents = list(self._documents.values())
+        written = []
+        for document in documents:
+            try:
+                with span("save_markdown", cat="io", path=os.path.basename(document.path)):
+                    saved = document.save()
+                if saved:
+                    written.append(document.path)
+                    print(f"Successfully wrote {document.path}")
+            except OSError as e:
+                print(f"Error writing {document.path}: {e}")
+        return written
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in instrumentation shared by the aceflow tools: nested timing spans and
+counters (files read, bytes read, cache hits, subprocesses spawned, ...).
+Profiling is switched on by --profile [PATH] on any tool or by the
+ACEFLOW_PROFILE environment variable (a trace path, or 1 for the default).
+When it is off, span() hands back one shared no-op context manager and
+count() returns at once, so the instrumentation stays in place at near-zero
+cost. When it is on, the run ends by writing a Chrome trace-event JSON (open it
+in chrome://tracing or Perfetto) and printing a summary table to stderr.
+Python child processes (process pools, tools started by other tools) inherit
+the setting through the environment and hand their events to the top-level
+process, so a single trace covers the whole run. Spans nest by thread; work
+handed to another thread passes span(..., parent=current_span()) and is tied
+to its parent with flow events, drawn as arrows from the parent slice.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+import functools
+import itertools
+from collections import Counter
+from pathlib import Path
+
+ENV_VAR = "ACEFLOW_PROFILE"
+PARTS_VAR = "ACEFLOW_PROFILE_PARTS"  # set for child processes: where to leave their events
+DEFAULT_TRACE = os.path.join(Path(__file__).parent.parent, ".cache", "trace.json")
+SUMMARY_ROWS = 20
+
+
+class _NullSpan:
+    """What span() returns while profiling is off."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+_flow_ids = itertools.count(1)
+_local = threading.local()
+
+
+def _open_spans():
+    stack = getattr(_local, "spans", None)
+    if stack is None:
+        stack = _local.spans = []
+    return stack
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "cat", "args", "start", "tid", "parent")
+
+    def __init__(self, profiler, name, cat, args, parent=None):
+        self.profiler = profiler
+        self.name = name
+        self.cat = cat
+        self.args = args
+        self.parent = parent if isinstance(parent, _Span) else None
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        self.tid = threading.get_native_id()
+        if self.parent is not None:
+            self.args["parent"] = self.parent.name
+            if self.parent.tid != self.tid:
+                self.profiler.add_flow(self.parent, self, self.start)
+        _open_spans().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        stack = _open_spans()
+        if stack and stack[-1] is self:
+            stack.pop()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.profiler.add_event(self.name, self.cat, self.start, time.perf_counter_ns(), self.args)
+        return False
+
+    def set(self, **args):
+        """Attach arguments known only inside the span (sizes, counts, results)."""
+        self.args.update(args)
+
+
+class Profiler:
+    """
+    Collects complete ("X") trace events and counters of one process.
+    The top-level process writes the trace; child processes leave their events
+    in the parts directory for it to merge.
+    """
+
+    def __init__(self, trace_path=None, parts_dir=None):
+        self.trace_path = trace_path
+        self.parts_dir = parts_dir
+        self.events = []
+        self.counters = Counter()
+        self.thread_names = {}
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    @property
+    def is_child(self):
+        return self.trace_path is None
+
+    def span(self, name, cat, args, parent=None):
+        return _Span(self, name, cat, args, parent)
+
+    def add_flow(self, parent, child, ts_ns):
+        """An arrow from the (still open) parent slice to the start of child on another thread."""
+        flow_id = next(_flow_ids)
+        common = {"name": child.name, "cat": "flow", "id": flow_id, "ts": ts_ns / 1000, "pid": self.pid}
+        with self._lock:
+            self.events.append(dict(common, ph="s", tid=parent.tid))
+            self.events.append(dict(common, ph="f", bp="e", tid=child.tid))
+
+    def add_event(self, name, cat, start_ns, end_ns, args):
+        tid = threading.get_native_id()
+        event = {"name": name, "cat": cat, "ph": "X", "ts": start_ns / 1000, "dur": (end_ns - start_ns) / 1000,
+                 "pid": self.pid, "tid": tid}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            if tid not in self.thread_names:
+                self.thread_names[tid] = threading.current_thread().name
+
+    def count(self, name, n):
+        with self._lock:
+            self.counters[name] += n
+
+    def reset_after_fork(self):
+        """A forked child starts with an empty buffer of its own."""
+        self.events, self.counters, self.thread_names = [], Counter(), {}
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._finished = False
+
+    def _metadata_events(self, process_name):
+        events = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": process_name}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in self.thread_names.items()]
+        return events
+
+    def finish(self):
+        """Write this process's events: to the parts directory (child) or as the merged trace (top level)."""
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        process_name = f"{os.path.basename(sys.argv[0]) or 'python'} ({self.pid})"
+        events = self._metadata_events(process_name) + self.events
+        if self.is_child:
+            if self.events or self.counters:
+                part = os.path.join(self.parts_dir, f"{self.pid}.json")
+                try:
+                    with open(part, "w", encoding="utf-8") as f:
+                        json.dump({"events": events, "counters": self.counters}, f)
+                except OSError:
+                    pass  # the parent is gone or cleaned up; nothing to report to
+            return
+
+        counters = Counter(self.counters)
+        for name in sorted(os.listdir(self.parts_dir)) if os.path.isdir(self.parts_dir) else []:
+            try:
+                with open(os.path.join(self.parts_dir, name), "r", encoding="utf-8") as f:
+                    part = json.load(f)
+            except (OSError, ValueError):
+                continue
+            events.extend(part["events"])
+            counters.update(part["counters"])
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+        end = max((e["ts"] + e.get("dur", 0) for e in events if "ts" in e), default=0)
+        events += [{"name": name, "ph": "C", "ts": end, "pid": self.pid, "tid": 0, "args": {"value": value}}
+                   for name, value in sorted(counters.items())]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+            with open(self.trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"counters": counters}},
+                          f, ensure_ascii=False)
+        except OSError as e:
+            print(f"[profiling] ⚠️ 无法写入 trace 文件 {self.trace_path}: {e}", file=sys.stderr)
+        print_summary([e for e in events if e.get("ph") == "X"], counters, self.trace_path)
+
+
+def print_summary(events, counters, trace_path, out=None):
+    """One screen: the spans with the most total time, then every counter."""
+    out = out or sys.stderr
+    totals = {}
+    for event in events:
+        total = totals.setdefault(event["name"], [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += event["dur"]
+        total[2] = max(total[2], event["dur"])
+    print(f"\n[profiling] {len(events)} spans, trace: {trace_path}", file=out)
+    print(f"  {'span':<36} {'calls':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9}", file=out)
+    for name, (calls, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1])[:SUMMARY_ROWS]:
+        print(f"  {name[:36]:<36} {calls:>7} {total / 1000:>10.2f} {total / calls / 1000:>9.3f} {longest / 1000:>9.2f}",
+              file=out)
+    if counters:
+        print(f"  {'counter':<36} {'value':>7}", file=out)
+        for name, value in sorted(counters.items()):
+            print(f"  {name[:36]:<36} {value:>7}", file=out)
+
+
+_profiler = None
+
+
+def enable(trace_path=None):
+    """Turn profiling on for this process (and the Python processes it starts)."""
+    global _profiler
+    if _profiler is not None:
+        if trace_path and not _profiler.is_child:
+            _profiler.trace_path = trace_path
+        return _profiler
+    parts_dir = os.environ.get(PARTS_VAR)
+    if parts_dir:
+        _profiler = Profiler(parts_dir=parts_dir)
+        # Pool workers leave through os._exit, which skips atexit, but multiprocessing
+        # still runs its finalizers; it clears them when a worker starts, so register again then
+        from multiprocessing import util
+        util.Finalize(None, _profiler.finish, exitpriority=0)
+        util.register_after_fork(_profiler, lambda profiler: util.Finalize(None, profiler.finish, exitpriority=0))
+    else:
+        parts_dir = tempfile.mkdtemp(prefix="aceflow-profile-")
+        _profiler = Profiler(trace_path or DEFAULT_TRACE, parts_dir)
+        os.environ[PARTS_VAR] = parts_dir
+        os.environ.setdefault(ENV_VAR, _profiler.trace_path)
+    os.register_at_fork(after_in_child=_profiler.reset_after_fork)
+    atexit.register(_profiler.finish)
+    return _profiler
+
+
+def enabled():
+    return _profiler is not None
+
+
+def span(name, cat="aceflow", parent=None, **args):
+    """
+    Time a block: `with span("scan_iteration", iteration=name):`. A no-op while profiling is off.
+    parent is a span from another thread (see current_span) the block belongs to.
+    """
+    if _profiler is None:
+        return _NULL_SPAN
+    return _profiler.span(name, cat, args, parent)
+
+
+def current_span():
+    """The innermost open span of this thread, to hand to work running on other threads; None if there is none."""
+    stack = _open_spans() if _profiler is not None else None
+    return stack[-1] if stack else None
+
+
+def traced(name=None, cat="aceflow"):
+    """Decorator form of span() for whole functions; the span is named after the function by default."""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _profiler is None:
+                return func(*args, **kwargs)
+            with _profiler.span(span_name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def count(name, n=1):
+    """Add n to a named counter. A no-op while profiling is off."""
+    if _profiler is not None:
+        _profiler.count(name, n)
+
+
+def add_profile_argument(parser):
+    """The --profile option every tool accepts."""
+    parser.add_argument("--profile", nargs="?", const=DEFAULT_TRACE, metavar="TRACE",
+                        help=f"Record spans and counters and write a Chrome trace (default: {DEFAULT_TRACE}); "
+                             f"also enabled by {ENV_VAR}=<path|1>.")
+
+
+def enable_from_args(args):
+    """Enable profiling if the tool was given --profile (see add_profile_argument)."""
+    if getattr(args, "profile", None):
+        enable(args.profile)
+
+
+if os.environ.get(PARTS_VAR) or os.environ.get(ENV_VAR, "").strip() not in ("", "0"):
+    value = os.environ.get(ENV_VAR, "").strip()
+    enable(None if value in ("", "1") else value)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch executor for the AceFlow task pipeline.
+Runs many (task, phase) pairs through run_task on a bounded process pool and
+streams one JSON line per finished task to stdout. Tasks locked by another
+agent are skipped or requeued, and two phases of the same task never run at
+the same time. --emit-workflows writes the .cline workflow files of every
+pair in one pass instead of running them.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import state_lock
+from run_task import run_task
+from iteration_scanner import scan_iteration
+from frontmatter_cache import get_cache, disable_cache
+from profiling import add_profile_argument, enable_from_args, count
+
+ITERATIONS_DIR = os.path.join("aceflow", "iterations")
+WORKFLOW_DIR = ".cline"
+
+
+def parse_pair(text):
+    """Parse 'T-001:S2' (or 'T-001 S2') into ('T-001', 'S2')."""
+    for separator in (":", " ", "\t", ","):
+        if separator in text.strip():
+            task_id, stage = text.strip().split(separator, 1)
+            return task_id.strip(), stage.strip().upper()
+    raise ValueError(f"无法解析任务/阶段: {text!r}，应为 T-001:S2")
+
+
+def iteration_pairs(iteration, stage):
+    """All (task, stage) pairs for the task directories of an iteration."""
+    iteration_dir = os.path.join(ITERATIONS_DIR, iteration)
+    if not os.path.isdir(iteration_dir):
+        print(f"[run_batch] ❌ 迭代目录不存在: {iteration_dir}", file=sys.stderr)
+        return []
+    snapshot = scan_iteration(iteration_dir, iteration, with_frontmatter=False)
+    return [(task_id, stage.upper()) for task_id in snapshot.tasks]
+
+
+def workflow_document(task_id, stage):
+    """The workflow definition gen_workflow.sh writes for one task and phase."""
+    return {
+        "name": "ACEFLOW CLI Agent",
+        "description": f"Auto-generated workflow for {task_id} / {stage}",
+        "entry": "bash aceflow/scripts/cli_run.sh",
+        "arguments": [task_id, stage],
+        "pre_hooks": [],
+        "post_hooks": [],
+    }
+
+
+def emit_workflows(pairs, workflow_dir=WORKFLOW_DIR):
+    """Write one workflow file per pair; returns the written paths."""
+    os.makedirs(workflow_dir, exist_ok=True)
+    paths = []
+    for task_id, stage in pairs:
+        path = os.path.join(workflow_dir, f"aceflow.{task_id}.{stage}.workflow.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(workflow_document(task_id, stage), f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        paths.append(path)
+    return paths
+
+
+def _init_worker():
+    """
+    Process pool initializer. stdout carries the JSON lines of the parent, so a
+    worker's file descriptor 1 is pointed at stderr: the pipeline's progress and
+    the output of --exec commands (which inherit the descriptor) both go there.
+    """
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), 1)
+
+
+def _run_in_worker(task_id, stage, command, strict, ttl, use_cache):
+    """Process pool entry point: run one task and hand new frontmatter cache entries back."""
+    cache = get_cache()
+    cache.enabled = use_cache
+    run = run_task(task_id, stage, command, strict=strict, ttl=ttl)
+    return dict(run.to_dict(), failure=run.is_failure(strict)), cache.drain_updates()
+
+
+def is_locked(task_id):
+    """True if another agent currently holds a live lock on the task."""
+    meta = state_lock.read_lock(state_lock.lock_path(task_id))
+    return meta is not None and not state_lock.is_stale(meta)
+
+
+def emit(record):
+    sys.stdout.write(json.dumps(record, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def run_batch(pairs, workers=4, command=None, strict=False, ttl=state_lock.DEFAULT_TTL,
+              on_locked="skip", requeue_delay=5.0, max_requeues=10):
+    """
+    Run the pairs on a pool of workers, emitting a JSON line per pair as it
+    finishes. on_locked is "skip" or "requeue" for tasks locked by someone else.
+    Returns the list of emitted records.
+    """
+    cache = get_cache()
+    pending = deque((task_id, stage, 0, 0.0) for task_id, stage in pairs)
+    running = {}
+    active_tasks = set()
+    records = []
+
+    def finish(record):
+        records.append(record)
+        emit(record)
+
+    def defer(task_id, stage, attempts):
+        if on_locked == "requeue" and attempts < max_requeues:
+            pending.append((task_id, stage, attempts + 1, time.monotonic() + requeue_delay))
+        else:
+            finish({"task": task_id, "stage": stage, "status": "skipped", "reason": "locked", "attempts": attempts + 1})
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+    with ProcessPoolExecutor(max_workers=max(1, workers), mp_context=context, initializer=_init_worker) as pool:
+        while pending or running:
+            # Dispatch whatever is ready, in order, up to the pool size
+            now = time.monotonic()
+            for _ in range(len(pending)):
+                if len(running) >= workers:
+                    break
+                task_id, stage, attempts, not_before = pending.popleft()
+                if task_id in active_tasks or not_before > now:
+                    pending.append((task_id, stage, attempts, not_before))
+                    continue
+                if is_locked(task_id):
+                    defer(task_id, stage, attempts)
+                    continue
+                future = pool.submit(_run_in_worker, task_id, stage, command, strict, ttl, cache.enabled)
+                count("tasks_dispatched")
+                running[future] = (task_id, stage, attempts)
+                active_tasks.add(task_id)
+
+            if not running:
+                # Only requeued tasks are left: sleep until the earliest becomes due
+                if pending:
+                    time.sleep(max(0.0, min(item[3] for item in pending) - time.monotonic()))
+                continue
+
+            done, _ = wait(running, timeout=0.5 if pending else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id, stage, attempts = running.pop(future)
+                active_tasks.discard(task_id)
+                try:
+                    result, updates = future.result()
+                except Exception as e:
+                    finish({"task": task_id, "stage": stage, "status": "error", "reason": f"{type(e).__name__}: {e}",
+                            "attempts": attempts + 1})
+                    continue
+                cache.merge(updates)
+                lock_phase = result["phases"][0] if result["phases"] else None
+                if lock_phase and not lock_phase["success"] and lock_phase["detail"] == "任务已被锁定":
+                    # Lost the race for the lock after the pre-check
+                    defer(task_id, stage, attempts)
+                    continue
+                if result.pop("failure"):
+                    status = "failed"
+                else:
+                    status = "ok" if result["success"] else "warning"
+                finish(dict(result, status=status, attempts=attempts + 1))
+    return records
+
+
+def read_pairs(args):
+    pairs = [parse_pair(text) for text in args.pair or []]
+    if args.pairs_file:
+        source = sys.stdin if args.pairs_file == "-" else open(args.pairs_file, "r", encoding="utf-8")
+        with source:
+            pairs.extend(parse_pair(line) for line in source if line.strip() and not line.startswith("#"))
+    if args.iteration:
+        if not args.stage:
+            raise ValueError("--iteration 需要同时指定 --stage")
+        pairs.extend(iteration_pairs(args.iteration, args.stage))
+    return pairs
+
+
+def main():
+    """Main function to run or emit workflows for many task/phase pairs."""
+    parser = argparse.ArgumentParser(description="ACEFLOW 批量任务执行器")
+    parser.add_argument("--pair", action="append", help="任务与阶段，如 T-001:S2（可重复）")
+    parser.add_argument("--pairs-file", help="每行一个 '任务 阶段' 的文件，'-' 表示标准输入")
+    parser.add_argument("--iteration", help="运行该迭代下的所有任务（需配合 --stage）")
+    parser.add_argument("--stage", help="与 --iteration 一起使用的阶段，如 S4")
+    parser.add_argument("--workers", type=int, default=4, help="并发执行的任务数（默认 4）")
+    parser.add_argument("--exec", dest="command", help="每个任务执行阶段运行的命令")
+    parser.add_argument("--strict", action="store_true", help="校验未通过时不执行")
+    parser.add_argument("--ttl", type=int, default=state_lock.DEFAULT_TTL, help=f"锁的租期（秒，默认 {state_lock.DEFAULT_TTL}）")
+    parser.add_argument("--on-locked", choices=["skip", "requeue"], default="skip", help="任务已被锁定时跳过或稍后重试（默认 skip）")
+    parser.add_argument("--requeue-delay", type=float, default=5.0, help="重试前等待的秒数（默认 5）")
+    parser.add_argument("--max-requeues", type=int, default=10, help="每个任务最多重试次数（默认 10）")
+    parser.add_argument("--emit-workflows", action="store_true", help="只为每个任务生成 .cline 工作流文件，不执行")
+    parser.add_argument("--workflow-dir", default=WORKFLOW_DIR, help=f"工作流文件目录（默认 {WORKFLOW_DIR}）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 frontmatter 缓存，直接读取文档")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.no_cache:
+        disable_cache()
+
+    try:
+        pairs = read_pairs(args)
+    except (OSError, ValueError) as e:
+        print(f"[run_batch] ❌ {e}", file=sys.stderr)
+        sys.exit(1)
+    if not pairs:
+        print("[run_batch] ⚠️ 没有需要处理的任务", file=sys.stderr)
+        return
+
+    if args.emit_workflows:
+        paths = emit_workflows(pairs, args.workflow_dir)
+        print(f"[run_batch] ✅ 已生成 {len(paths)} 个工作流文件于 {args.workflow_dir}", file=sys.stderr)
+        return
+
+    records = run_batch(pairs, args.workers, args.command, args.strict, args.ttl,
+                        args.on_locked, args.requeue_delay, args.max_requeues)
+    counts = {}
+    for record in records:
+        counts[record["status"]] = counts.get(record["status"], 0) + 1
+    summary = ", ".join(f"{status} {count}" for status, count in sorted(counts.items()))
+    print(f"[run_batch] 完成 {len(records)} 个任务：{summary}", file=sys.stderr)
+    if any(record["status"] in ("failed", "error") for record in records):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
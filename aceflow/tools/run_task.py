@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Single-process task pipeline for the AceFlow CLI agent.
+Runs lock → mount → validate → sentinel → execute → unlock for one task and
+phase in one interpreter. The task context is loaded once and the stage
+document's Front-matter parsed once, the unlock is guaranteed by a finally
+block, and the elapsed time of every phase is reported.
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+from dataclasses import dataclass, field
+from contextlib import contextmanager
+
+import state_lock
+import context_mount
+import phase_validator
+import flow_sentinel
+from frontmatter_cache import disable_cache
+from profiling import add_profile_argument, enable_from_args, count, span, traced
+
+# Without --strict, only these phases make a run fail; validation problems are warnings
+FATAL_PHASES = ("lock", "mount", "execute", "unlock")
+
+
+@dataclass
+class PhaseResult:
+    name: str
+    success: bool = True
+    elapsed: float = 0.0
+    detail: str = ""
+
+    def fail(self, detail):
+        self.success = False
+        self.detail = detail
+
+
+@dataclass
+class TaskRun:
+    task_id: str
+    stage: str
+    phases: list = field(default_factory=list)
+
+    @property
+    def success(self):
+        return all(phase.success for phase in self.phases)
+
+    @property
+    def elapsed(self):
+        return sum(phase.elapsed for phase in self.phases)
+
+    def failed_phase(self):
+        return next((phase for phase in self.phases if not phase.success), None)
+
+    def is_failure(self, strict=False):
+        failed = self.failed_phase()
+        return failed is not None and (strict or failed.name in FATAL_PHASES)
+
+    def to_dict(self):
+        return {
+            "task": self.task_id,
+            "stage": self.stage,
+            "success": self.success,
+            "elapsed": round(self.elapsed, 6),
+            "phases": [{"name": p.name, "success": p.success, "elapsed": round(p.elapsed, 6), "detail": p.detail}
+                       for p in self.phases],
+        }
+
+
+@contextmanager
+def _phase(run, name):
+    result = PhaseResult(name)
+    started = time.perf_counter()
+    try:
+        with span(name, cat="phase", task=run.task_id):
+            yield result
+    except Exception as e:
+        result.fail(f"{type(e).__name__}: {e}")
+    finally:
+        result.elapsed = time.perf_counter() - started
+        run.phases.append(result)
+
+
+@traced(cat="task")
+def run_task(task_id, stage=None, command=None, iteration=None, strict=False, ttl=state_lock.DEFAULT_TTL, wait=0):
+    """
+    Run the task pipeline and return a TaskRun. Without strict, validation and
+    sentinel failures are reported but the task is still executed, as cli_run.sh
+    did. Once the lock is held it is always released.
+    """
+    run = TaskRun(task_id, (stage or "").upper())
+    task_lock = None
+    handoff_files = []
+    try:
+        with _phase(run, "lock") as phase:
+            context = state_lock.load_context(task_id)
+            if not context:
+                phase.fail("未找到上下文文件")
+            else:
+                task_lock = state_lock.acquire(task_id, context, ttl, wait)
+                if task_lock is None:
+                    phase.fail("任务已被锁定")
+                else:
+                    print(f"[run_task] ✅ 已锁定任务：{task_id}")
+        if task_lock is None:
+            return run
+
+        with _phase(run, "mount") as phase:
+            run.stage = (stage or str(context.get("stage", "S1"))).upper()
+            attention_prompt = context_mount.load_attention_prompt(run.stage)
+            variables = context_mount.context_variables(task_id, context, attention_prompt)
+            exports, _, handoff_files = context_mount.split_exports(variables)
+            env = dict(os.environ, ACEFLOW_PHASE=run.stage, **exports)
+            print(f"[run_task] 挂载上下文: {len(exports)} 个变量")
+        if not run.phases[-1].success:
+            return run
+
+        fm_data = None
+        with _phase(run, "validate") as phase:
+            iteration = iteration or context.get("iteration")
+            md_file = flow_sentinel.stage_document_path(str(iteration), task_id, run.stage) if iteration else None
+            if not iteration:
+                phase.fail("上下文缺少 iteration 字段")
+            elif not md_file:
+                phase.fail(f"未知阶段：{run.stage}")
+            else:
+                # Parsed once, shared by the validator and the sentinel
+                fm_data = phase_validator.parse_frontmatter(md_file)
+                expected = {"stage": run.stage, "iteration": str(iteration), "task_id": task_id}
+                if fm_data is None:
+                    phase.fail(f"阶段产物缺失或格式错误：{md_file}")
+                elif not phase_validator.validate(fm_data, task_id, expected):
+                    phase.fail("frontmatter 校验未通过")
+
+        with _phase(run, "sentinel") as phase:
+            if fm_data is None:
+                phase.fail("无可校验的阶段产物")
+            elif not flow_sentinel.check_document(fm_data, run.stage, task_id, expected):
+                phase.fail("阶段产物状态校验未通过")
+
+        if strict and not run.success:
+            print(f"[run_task] 🚫 严格模式：校验未通过，跳过执行")
+            return run
+
+        with _phase(run, "execute") as phase:
+            if command:
+                count("subprocesses")
+                result = subprocess.run(command, shell=True, env=env)
+                if result.returncode != 0:
+                    phase.fail(f"命令退出码 {result.returncode}")
+            else:
+                print(f"🚀 执行 cline run --task {task_id} --phase {run.stage}")
+        return run
+    finally:
+        if task_lock is not None:
+            with _phase(run, "unlock") as phase:
+                if task_lock.release():
+                    print(f"[run_task] 🔓 已解锁任务：{task_id}")
+                else:
+                    phase.fail("锁已不属于当前进程")
+        for path in handoff_files:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+
+def print_timing_report(run):
+    """Print a per-phase timing report."""
+    print("\nPhase timing report:")
+    print(f"  {'phase':<12} {'result':<8} {'elapsed':>9}")
+    for phase in run.phases:
+        outcome = "ok" if phase.success else "FAILED"
+        detail = f"  {phase.detail}" if phase.detail else ""
+        print(f"  {phase.name:<12} {outcome:<8} {phase.elapsed * 1000:>7.2f}ms{detail}")
+    print(f"  {'total':<12} {'':<8} {run.elapsed * 1000:>7.2f}ms")
+
+
+def main():
+    """Main function to run one task phase through the whole pipeline."""
+    parser = argparse.ArgumentParser(description="ACEFLOW 任务流水线：锁定 → 挂载 → 校验 → 守护 → 执行 → 解锁")
+    parser.add_argument("--task", required=True, help="任务 ID，例如 T-001")
+    parser.add_argument("--phase", "--stage", dest="stage", help="阶段名称，如 S1（默认取上下文中的 stage）")
+    parser.add_argument("--iteration", help="迭代名称（默认取上下文中的 iteration）")
+    parser.add_argument("--exec", dest="command", help="执行阶段运行的命令，上下文变量通过环境传入")
+    parser.add_argument("--strict", action="store_true", help="校验未通过时不执行并返回非零码")
+    parser.add_argument("--ttl", type=int, default=state_lock.DEFAULT_TTL, help=f"锁的租期（秒，默认 {state_lock.DEFAULT_TTL}）")
+    parser.add_argument("--wait", type=float, default=0, help="任务被锁定时最多等待的秒数（默认不等待）")
+    parser.add_argument("--no-cache", action="store_true", help="不使用 frontmatter 缓存（单任务运行始终直接读取文档，保留以兼容旧用法）")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    # One task reads one document, which is cheaper than loading the cache of every document
+    disable_cache()
+
+    run = run_task(args.task, args.stage, args.command, args.iteration, args.strict, args.ttl, args.wait)
+    print_timing_report(run)
+    if run.is_failure(args.strict):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
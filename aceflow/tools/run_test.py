@@ -2,73 +2,384 @@
 import subprocess
 import os
 import sys
-import datetime
+import time
+import shutil
+import tempfile
+import re
+import fnmatch
 import argparse
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, asdict
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional
 
-def run_maven_test(test_class, project_dir):
-    """执行 Maven 测试命令"""
-    # 构建 Maven 命令
-    maven_cmd = ["mvn", "clean", "test", f"-Dtest={test_class}"]
-    
-    # 切换到项目目录执行命令
+from test_history import DurationHistory, plan_shards, simple_name
+from test_result_cache import ProjectDigest, TestResultCache
+from profiling import add_profile_argument, enable_from_args, count, span
+
+SUREFIRE_DIR = os.path.join("target", "surefire-reports")
+SHARD_ROOT = os.path.join(Path(__file__).parent.parent, ".cache", "test_shards")
+SYNC_EXCLUDE = {"target", ".git"}
+LOG_DIR = os.path.join(Path(__file__).parent.parent, ".cache", "test_logs")
+ERROR_BUFFER = 50  # error lines kept in memory per Maven process
+# Lines worth showing in the error summary: Maven errors, failed tests and the heads of stack traces
+ERROR_LINE = re.compile(r"ERROR|Failed|FAILURE|^\s*Caused by:|^(Exception in thread|[\w$]+(\.[\w$]+)+(Exception|Error)\b)")
+
+
+@dataclass
+class TestCaseResult:
+    classname: str
+    name: str
+    time: float
+    outcome: str  # passed / failed / error / skipped
+    message: str = ""
+
+
+@dataclass
+class SuiteResult:
+    name: str
+    time: float
+    cases: List[TestCaseResult] = field(default_factory=list)
+    cached: bool = False
+
+    def count(self, outcome):
+        return sum(1 for case in self.cases if case.outcome == outcome)
+
+    @property
+    def passed(self):
+        return not any(case.outcome in ("failed", "error") for case in self.cases)
+
+
+@dataclass
+class MavenRun:
+    patterns: List[str]
+    command: List[str]
+    returncode: Optional[int]
+    elapsed: float
+    suites: List[SuiteResult] = field(default_factory=list)
+    error_lines: List[str] = field(default_factory=list)
+    log_files: List[str] = field(default_factory=list)
+
+    @property
+    def status(self):
+        if self.returncode is None:
+            return "错误"
+        if self.returncode == 0 and self.suites and all(suite.passed for suite in self.suites):
+            return "通过"
+        return "失败"
+
+
+def _case_outcome(element):
+    for tag, outcome in (("failure", "failed"), ("error", "error"), ("skipped", "skipped")):
+        child = element.find(tag)
+        if child is not None:
+            return outcome, (child.get("message") or child.get("type") or "").strip()
+    return "passed", ""
+
+
+def parse_surefire_report(path):
+    """Parse one surefire TEST-*.xml file into a SuiteResult."""
+    root = ET.parse(path).getroot()
+    suite = SuiteResult(root.get("name", ""), float(root.get("time") or 0))
+    for element in root.iter("testcase"):
+        outcome, message = _case_outcome(element)
+        suite.cases.append(TestCaseResult(element.get("classname") or suite.name, element.get("name", ""),
+                                          float(element.get("time") or 0), outcome, message))
+    return suite
+
+
+def report_stamps(reports_dir):
+    """(mtime_ns, size) of every surefire report currently in reports_dir."""
+    stamps = {}
     try:
-        print(f"执行测试: {test_class}")
-        print(f"命令: {' '.join(maven_cmd)}")
-        print(f"项目目录: {project_dir}")
-        
-        # 执行命令并捕获输出
-        process = subprocess.run(
-            maven_cmd,
+        names = os.listdir(reports_dir)
+    except FileNotFoundError:
+        return stamps
+    for name in names:
+        if name.startswith("TEST-") and name.endswith(".xml"):
+            try:
+                st = os.stat(os.path.join(reports_dir, name))
+            except FileNotFoundError:
+                continue
+            stamps[name] = (st.st_mtime_ns, st.st_size)
+    return stamps
+
+
+def parse_surefire_reports(reports_dir, before=None):
+    """
+    Parse every TEST-*.xml under reports_dir. Without `clean` the directory
+    still holds reports of earlier runs, so before (report_stamps taken when
+    the build started) keeps only the reports this build wrote or rewrote.
+    """
+    suites = []
+    for name, stamp in sorted(report_stamps(reports_dir).items()):
+        if before is not None and before.get(name) == stamp:
+            continue
+        path = os.path.join(reports_dir, name)
+        try:
+            suites.append(parse_surefire_report(path))
+        except (OSError, ET.ParseError) as e:
+            print(f"⚠️ 无法解析测试报告 {path}: {e}")
+    return suites
+
+
+def maven_command(patterns, threads=None, clean=False, extra_args=None):
+    """One `mvn test` invocation for all test classes or patterns."""
+    cmd = ["mvn"]
+    if threads:
+        cmd += ["-T", str(threads)]
+    cmd += ["clean", "test"] if clean else ["test"]
+    cmd.append(f"-Dtest={','.join(patterns)}")
+    # A pattern that matches nothing must not fail the whole batch
+    cmd.append("-Dsurefire.failIfNoSpecifiedTests=false")
+    return cmd + list(extra_args or [])
+
+
+def stream_output(process, log, prefix="", quiet=False, errors=None):
+    """
+    Copy the process output line by line to the log file and, unless quiet, to
+    stdout, collecting error lines into the bounded deque errors as they pass.
+    Memory use does not grow with the size of the build log.
+    """
+    for line in process.stdout:
+        log.write(line)
+        text = line.rstrip("\n")
+        if not quiet:
+            print(prefix + text, flush=True)
+        if errors is not None and ERROR_LINE.search(text):
+            errors.append(text)
+    return process.wait()
+
+
+def run_maven_tests(patterns, project_dir, threads=None, clean=False, extra_args=None, label="",
+                    quiet=False, log_dir=LOG_DIR):
+    """执行一次 Maven 构建，运行所有测试类，并从 surefire 报告读取结果"""
+    cmd = maven_command(patterns, threads, clean, extra_args)
+    prefix = f"[{label}] " if label else ""
+    print(f"{prefix}执行测试: {len(patterns)} 个测试类/模式")
+    print(f"{prefix}命令: {' '.join(cmd)}")
+    print(f"{prefix}项目目录: {project_dir}")
+
+    reports_dir = os.path.join(project_dir, SUREFIRE_DIR)
+    before = report_stamps(reports_dir)
+    errors = deque(maxlen=ERROR_BUFFER)
+    started = time.perf_counter()
+    try:
+        # One log per run and shard, so concurrent or sharded runs never share a file
+        os.makedirs(log_dir, exist_ok=True)
+        run_name = time.strftime("%Y%m%d-%H%M%S") + (f"-{label.replace(' ', '-')}" if label else "")
+        fd, log_file = tempfile.mkstemp(prefix=f"maven-{run_name}-", suffix=".log", dir=log_dir)
+        print(f"{prefix}完整日志: {log_file}")
+        with os.fdopen(fd, 'w', encoding='utf-8') as log, subprocess.Popen(
+            cmd,
             cwd=project_dir,
             stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
+            errors="replace",
             shell=False
-        )
-        output = process.stdout + process.stderr
-        
-        # 检查测试是否成功
-        if "BUILD SUCCESS" in output:
-            status = "通过"
-        else:
-            status = "失败"
-            
-        print(f"测试状态: {status}")
-        return status, output
-        
+        ) as process:
+            count("subprocesses")
+            with span("maven", cat="test", shard=label or None, patterns=len(patterns)):
+                returncode = stream_output(process, log, prefix, quiet, errors)
     except Exception as e:
-        error_msg = f"测试执行过程中发生错误: {str(e)}\n"
-        print(error_msg)
-        return "错误", error_msg
+        error_msg = f"测试执行过程中发生错误: {str(e)}"
+        print(prefix + error_msg)
+        return MavenRun(list(patterns), cmd, None, time.perf_counter() - started, error_lines=[error_msg])
+
+    suites = parse_surefire_reports(reports_dir, before)
+    run = MavenRun(list(patterns), cmd, returncode, time.perf_counter() - started, suites, list(errors), [log_file])
+    print(f"{prefix}测试状态: {run.status}（{run.elapsed:.1f}s）")
+    return run
+
+
+def sync_tree(src, dst, exclude=SYNC_EXCLUDE):
+    """
+    Mirror src into dst, copying only files whose size or mtime differ and
+    deleting files that no longer exist in src. Top-level entries in exclude
+    (the build output) are left alone so every copy keeps its incremental build.
+    """
+    os.makedirs(dst, exist_ok=True)
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        if rel == ".":
+            dirnames[:] = [d for d in dirnames if d not in exclude]
+            filenames = [f for f in filenames if f not in exclude]
+        target_dir = os.path.normpath(os.path.join(dst, rel))
+        os.makedirs(target_dir, exist_ok=True)
+        wanted = set(dirnames) | set(filenames)
+        for name in os.listdir(target_dir):
+            if name in wanted or (rel == "." and name in exclude):
+                continue
+            stale = os.path.join(target_dir, name)
+            if os.path.isdir(stale) and not os.path.islink(stale):
+                shutil.rmtree(stale)
+            else:
+                os.remove(stale)
+        for name in filenames:
+            source, target = os.path.join(dirpath, name), os.path.join(target_dir, name)
+            st = os.stat(source)
+            try:
+                tt = os.stat(target)
+                if tt.st_size == st.st_size and tt.st_mtime_ns == st.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            shutil.copy2(source, target)
+
+
+def merge_runs(runs, elapsed):
+    """Combine the MavenRuns of all shards into one."""
+    codes = [run.returncode for run in runs]
+    returncode = None if None in codes else next((code for code in codes if code), 0)
+    return MavenRun([p for run in runs for p in run.patterns], [], returncode, elapsed,
+                    [suite for run in runs for suite in run.suites],
+                    [f"[shard {i + 1}] {line}" for i, run in enumerate(runs) for line in run.error_lines],
+                    [log for run in runs for log in run.log_files])
+
+
+def run_sharded(patterns, project_dir, shards, history, threads=None, clean=False, default_weight=None,
+                shard_root=SHARD_ROOT, quiet=False, log_dir=LOG_DIR):
+    """
+    Split the patterns into duration-balanced shards and run each as its own
+    Maven process in a private copy of the project (so target/ is never
+    shared), then merge the results.
+    """
+    plan = plan_shards(patterns, shards, history, default_weight)
+    if len(plan) == 1:
+        return run_maven_tests(patterns, project_dir, threads, clean, quiet=quiet, log_dir=log_dir)
+
+    for i, (expected, members) in enumerate(plan):
+        print(f"[shard {i + 1}] 预计 {expected:.1f}s: {', '.join(members)}")
+    started = time.perf_counter()
+    workdirs = [os.path.join(shard_root, f"shard-{i + 1}") for i in range(len(plan))]
+    with ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        with span("sync_shards", cat="io", shards=len(workdirs)):
+            list(pool.map(lambda workdir: sync_tree(project_dir, workdir), workdirs))
+        futures = [pool.submit(run_maven_tests, members, workdir, threads, clean, None, f"shard {i + 1}",
+                               quiet, log_dir)
+                   for i, ((_, members), workdir) in enumerate(zip(plan, workdirs))]
+        runs = [future.result() for future in futures]
+    return merge_runs(runs, time.perf_counter() - started)
+
+
+def suites_for(pattern, suites):
+    """The suites a -Dtest class or pattern selected."""
+    name = simple_name(pattern)
+    return [suite for suite in suites if fnmatch.fnmatchcase(simple_name(suite.name), name)]
+
+
+def run_cached(patterns, project_dir, execute, force=False, cache=None):
+    """
+    Report patterns whose inputs are unchanged since their last pass straight
+    from the result cache and hand the rest to execute(patterns) -> MavenRun.
+    New passes are stored; --force (force=True) skips the lookup but still stores.
+    """
+    cache = cache or TestResultCache()
+    with span("project_digest", cat="cache"):
+        digest = ProjectDigest(project_dir)
+    keys = {pattern: digest.key(pattern) for pattern in patterns}
+    cached, remaining = [], []
+    for pattern in patterns:
+        entry = None if force or keys[pattern] is None else cache.get(keys[pattern])
+        if entry is None:
+            remaining.append(pattern)
+            continue
+        count("test_cache_hits")
+        print(f"[cached] {pattern}: 源码未变化，沿用上次通过的结果")
+        cached.extend(SuiteResult(s["name"], s["time"], [TestCaseResult(**c) for c in s["cases"]], cached=True)
+                      for s in entry["suites"])
+
+    if not remaining:
+        return MavenRun([], [], 0, 0.0, cached)
+    run = execute(remaining)
+    for pattern in remaining:
+        suites = suites_for(pattern, run.suites)
+        if keys[pattern] is not None and suites and all(suite.passed for suite in suites):
+            try:
+                cache.put(keys[pattern], pattern, [dict(asdict(suite), cached=False) for suite in suites])
+            except OSError as e:
+                print(f"⚠️ 无法写入测试结果缓存 {cache.cache_dir}: {e}")
+    run.suites = cached + run.suites
+    return run
+
+
+def run_maven_test(test_class, project_dir):
+    """执行 Maven 测试命令（单个测试类）"""
+    run = run_maven_tests([test_class], project_dir)
+    return run.status, "\n".join(run.error_lines)
+
+
+def print_summary(run):
+    """Per-class results from the surefire reports, followed by the failing tests."""
+    print("\n测试结果摘要:")
+    if run.suites:
+        print(f"{'测试类':<60} {'用例':>5} {'失败':>5} {'错误':>5} {'跳过':>5} {'耗时(s)':>9}")
+        for suite in sorted(run.suites, key=lambda s: s.name):
+            print(f"{suite.name:<60} {len(suite.cases):>5} {suite.count('failed'):>5} "
+                  f"{suite.count('error'):>5} {suite.count('skipped'):>5} {suite.time:>9.2f}"
+                  f"{'  (cached)' if suite.cached else ''}")
+    total = sum(len(suite.cases) for suite in run.suites)
+    failed = [case for suite in run.suites for case in suite.cases if case.outcome in ("failed", "error")]
+    cached = sum(1 for suite in run.suites if suite.cached)
+    print(f"测试类: {len(run.suites)}（缓存 {cached}），用例: {total}，失败: {len(failed)}，耗时: {run.elapsed:.1f}s")
+    print(f"状态: {run.status}")
+
+    # 如果测试失败，输出错误信息摘要
+    if run.status != "通过":
+        print("\n错误摘要:")
+        if failed:
+            for case in failed[:20]:
+                print(f"{case.classname}.{case.name}: {case.message}")
+        elif run.error_lines:
+            print("\n".join(run.error_lines[-20:]))  # 最多显示最后20行错误信息
+        else:
+            print("未找到详细错误信息，请查看完整输出。")
+        if run.log_files:
+            print(f"完整日志: {', '.join(run.log_files)}")
+
 
 def main():
-    parser = argparse.ArgumentParser(description="运行单个 Maven 测试类")
-    parser.add_argument("test_class", help="要测试的类名，例如: UserControllerIntegrationTest")
+    parser = argparse.ArgumentParser(description="在一次 Maven 构建中运行一个或多个测试类")
+    parser.add_argument("test_classes", nargs="+", help="测试类名或模式，例如: UserControllerIntegrationTest '*ServiceTest'")
     parser.add_argument("--project-dir", default="src/backend", help="Maven 项目目录")
-    
+    parser.add_argument("-T", "--threads", help="透传给 Maven 的并行构建参数，例如 4 或 1C")
+    parser.add_argument("--clean", action="store_true", help="测试前先执行 mvn clean（默认增量构建）")
+    parser.add_argument("--shards", type=int, default=1, help="按历史耗时拆分为 N 个并行 Maven 进程（默认 1）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="不实时输出 Maven 日志，只输出摘要")
+    parser.add_argument("--log-dir", default=LOG_DIR, help="Maven 完整日志目录")
+    parser.add_argument("--force", action="store_true", help="忽略测试结果缓存，重新运行所有测试类")
+    parser.add_argument("--default-weight", type=float, help="无历史记录的测试类的预计耗时（秒，默认取历史中位数）")
+
+    add_profile_argument(parser)
     args = parser.parse_args()
-    
-    # 获取当前迭代和任务信息（假设脚本在 aceflow/tools 目录下运行）
+    enable_from_args(args)
+
+    # --project-dir 相对于 aceflow 目录解析
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
-    iteration_task_dir = os.path.basename(os.path.dirname(base_dir))
-    iteration_dir = os.path.basename(os.path.dirname(os.path.dirname(base_dir)))
-    
+
     # 执行测试
-    status, output = run_maven_test(args.test_class, os.path.join(base_dir, args.project_dir))
-    
+    patterns = [p.strip() for arg in args.test_classes for p in arg.split(",") if p.strip()]
+    project_dir = os.path.join(base_dir, args.project_dir)
+    history = DurationHistory()
+    run = run_cached(patterns, project_dir, force=args.force,
+                     execute=lambda remaining: run_sharded(remaining, project_dir, args.shards, history,
+                                                           args.threads, args.clean, args.default_weight,
+                                                           quiet=args.quiet, log_dir=args.log_dir))
+    measured = [suite for suite in run.suites if not suite.cached]
+    if measured:
+        history.record(measured)
+        try:
+            history.save()
+        except OSError as e:
+            print(f"⚠️ 无法保存测试耗时记录 {history.history_file}: {e}")
+
     # 输出结果摘要
-    print("\n测试结果摘要:")
-    print(f"测试类: {args.test_class}")
-    print(f"状态: {status}")
-    
-    # 如果测试失败，输出错误信息摘要
-    if status != "通过":
-        print("\n错误摘要:")
-        error_lines = [line for line in output.splitlines() if "ERROR" in line or "Failed" in line]
-        if error_lines:
-            print("\n".join(error_lines[:5]))  # 最多显示前5行错误信息
-        else:
-            print("未找到详细错误信息，请查看完整输出。")
+    print_summary(run)
+    if run.status != "通过":
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
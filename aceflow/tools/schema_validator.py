@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compiled Front-matter validator driven by templates/frontmatter_schema.yaml.
+The schema is loaded once and compiled into a checking plan (required keys,
+allowed values, date formats and patterns) that is cached as JSON next to the
+schema, so later runs neither import nor run the YAML parser. Validation
+returns one FieldError per violated rule and is the single engine behind
+flow_sentinel, phase_validator and their batch mode.
+"""
+
+import os
+import re
+import json
+import datetime
+import tempfile
+import threading
+import argparse
+from dataclasses import dataclass
+from pathlib import Path
+
+from profiling import add_profile_argument, enable_from_args, traced
+
+SCHEMA_FILE = os.path.join(Path(__file__).parent.parent, "templates", "frontmatter_schema.yaml")
+PLAN_VERSION = 2
+
+
+@dataclass(frozen=True)
+class FieldError:
+    field: str
+    message: str
+
+    def __str__(self):
+        return f"{self.field}: {self.message}"
+
+
+def _plan_file(schema_file):
+    directory, name = os.path.split(schema_file)
+    return os.path.join(directory, f".{os.path.splitext(name)[0]}.compiled.json")
+
+
+def _stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def compile_plan(schema):
+    """Turn the parsed schema into a JSON-serializable checking plan."""
+    rules = []
+    for field_name, rule in (schema.get("field_rules") or {}).items():
+        rule = rule or {}
+        if "pattern" in rule:
+            re.compile(rule["pattern"])  # fail on a bad pattern at compile time, not per document
+            rules.append([field_name, "pattern", rule["pattern"]])
+        if "allowed" in rule:
+            rules.append([field_name, "allowed", [str(v) for v in rule["allowed"]]])
+        if rule.get("format") == "date":
+            rules.append([field_name, "date", None])
+    statuses = [str(v) for v in schema.get("statuses") or []]
+    status_sets = {name: [str(v) for v in schema.get(name) or []] for name in ("completed_statuses", "closed_statuses")}
+    if statuses:
+        for name, values in status_sets.items():
+            unknown = [v for v in values if v not in statuses]
+            if unknown:
+                raise ValueError(f"{name} 包含未在 statuses 中定义的状态: {unknown}")
+    return dict({
+        "required": list(schema.get("required_fields") or []),
+        "task_required": list(schema.get("task_required_fields") or []),
+        "rules": rules,
+        "statuses": statuses,
+    }, **status_sets)
+
+
+def _is_date(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return True
+    try:
+        datetime.datetime.fromisoformat(str(value).strip())
+        return True
+    except ValueError:
+        return False
+
+
+class CompiledSchema:
+    """A checking plan with its regular expressions and value sets prepared once."""
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.required = tuple(plan["required"])
+        self.task_required = tuple(f for f in plan["task_required"] if f not in self.required)
+        self.statuses = tuple(plan["statuses"])
+        self.completed_statuses = frozenset(plan["completed_statuses"])
+        self.closed_statuses = frozenset(plan["closed_statuses"])
+        self._checks = []
+        for field_name, kind, arg in plan["rules"]:
+            if kind == "pattern":
+                regex = re.compile(arg)
+                self._checks.append((field_name, lambda v, r=regex: r.search(v) is not None,
+                                     f"不匹配格式 {arg}"))
+            elif kind == "allowed":
+                allowed = frozenset(arg)
+                self._checks.append((field_name, lambda v, a=allowed: v in a, f"取值应为 {arg} 之一"))
+            elif kind == "date":
+                self._checks.append((field_name, None, "日期格式无效，应为 YYYY-MM-DD 或 ISO 时间"))
+
+    def validate(self, fm_data, task=None, expected=None, require_completed=False):
+        """
+        Check parsed Front-matter. task marks a document inside a task directory
+        (task-only fields become required); expected maps fields to the values
+        implied by the document's location; require_completed also demands one
+        of the completed statuses. Returns a list of FieldError.
+        """
+        errors = []
+        required = self.required + self.task_required if task else self.required
+        for field_name in required:
+            if field_name not in fm_data:
+                errors.append(FieldError(field_name, "缺失必填字段"))
+        for field_name, check, message in self._checks:
+            value = fm_data.get(field_name)
+            if value is None:
+                continue
+            ok = _is_date(value) if check is None else check(str(value).strip())
+            if not ok:
+                errors.append(FieldError(field_name, f"'{value}' {message}"))
+        for field_name, value in (expected or {}).items():
+            actual = fm_data.get(field_name)
+            if actual is not None and value is not None and str(actual).strip() != str(value):
+                errors.append(FieldError(field_name, f"'{actual}' 与文档位置不一致，应为 '{value}'"))
+        if require_completed and "status" in fm_data and not any(e.field == "status" for e in errors):
+            status = str(fm_data.get("status") or "").strip()
+            if status not in self.completed_statuses:
+                errors.append(FieldError("status", f"'{status}' 尚未完成，应为 {sorted(self.completed_statuses)} 之一"))
+        return errors
+
+
+@traced("load_schema_plan", cat="parse")
+def _load_plan(schema_file):
+    stamp = _stamp(schema_file)
+    plan_file = _plan_file(schema_file)
+    try:
+        with open(plan_file, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached.get("version") == PLAN_VERSION and cached.get("schema_stamp") == stamp:
+            return cached["plan"], stamp
+    except (OSError, ValueError, KeyError):
+        pass
+
+    import yaml
+    with open(schema_file, 'r', encoding='utf-8') as f:
+        plan = compile_plan(yaml.safe_load(f) or {})
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=".frontmatter_schema.", dir=os.path.dirname(plan_file))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": PLAN_VERSION, "schema_stamp": stamp, "plan": plan}, f, ensure_ascii=False)
+        os.replace(tmp_path, plan_file)
+    except OSError as e:
+        print(f"[schema_validator] ⚠️ 无法写入编译缓存 {plan_file}: {e}")
+    return plan, stamp
+
+
+_schemas = {}
+_schemas_lock = threading.Lock()
+
+
+def load_schema(schema_file=SCHEMA_FILE, refresh=False):
+    """
+    Return the CompiledSchema for a schema file. The file is checked once per
+    process (the cached plan is recompiled only when it changed); refresh checks
+    it again, for long-running callers.
+    """
+    key = os.path.abspath(schema_file)
+    with _schemas_lock:
+        memo = _schemas.get(key)
+        if memo is not None and (not refresh or memo[0] == _stamp(key)):
+            return memo[1]
+        plan, stamp = _load_plan(key)
+        schema = CompiledSchema(plan)
+        _schemas[key] = (stamp, schema)
+        return schema
+
+
+def main():
+    """Compile the schema (refreshing the cached plan) and print it."""
+    parser = argparse.ArgumentParser(description="编译 frontmatter_schema.yaml 并输出校验计划")
+    parser.add_argument("--schema", default=SCHEMA_FILE, help="schema 文件路径")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    schema = load_schema(args.schema)
+    print(json.dumps(schema.plan, ensure_ascii=False, indent=2))
+    print(f"[schema_validator] 编译缓存: {_plan_file(os.path.abspath(args.schema))}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Batch validation of aceflow stage documents, shared by flow_sentinel and
+phase_validator (--batch). Every stage document of one iteration, or of all
+iterations, is checked in a single run on a thread pool against the compiled
+Front-matter schema (schema_validator), and the results are aggregated into a
+pass/fail summary plus optional JSON and JUnit-XML reports for CI.
+"""
+
+import os
+import sys
+import json
+import time
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass, field, asdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from iteration_scanner import scan_iteration, list_iterations
+from frontmatter_cache import get_cache, get_frontmatter
+from schema_validator import load_schema
+from profiling import count, span
+
+ITERATIONS_DIR = os.path.join("aceflow", "iterations")
+# 阶段文件名映射（新目录结构下每个任务目录内的文件）
+STAGE_FILES = {
+    "s1": "user_story",
+    "s2": "tasks",
+    "s3": "testcases",
+    "s4": "implementation",
+    "s5": "test_report",
+    "s6": "codereview",
+    "s7": "demo_feedback",
+    "s8": "progress_index"
+}
+
+
+def stage_document_path(iteration, task_id, stage):
+    """
+    拼接阶段产物文件路径，格式示例：
+    aceflow/iterations/iteration-01/T-001/s1_user_story.md
+    未知阶段返回 None
+    """
+    prefix = STAGE_FILES.get(stage.lower())
+    if not prefix:
+        return None
+    return os.path.join(ITERATIONS_DIR, iteration, task_id, f"s{stage[1:]}_{prefix}.md")
+
+
+@dataclass
+class ValidationResult:
+    iteration: str
+    stage: str
+    path: str
+    rel_path: str
+    task: Optional[str] = None
+    errors: List[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def passed(self):
+        return not self.errors
+
+
+def check_frontmatter(fm_data, iteration, doc):
+    """Return the rule violations of a document's parsed Front-matter (an empty list if it passes)."""
+    expected = {"stage": doc.stage, "iteration": iteration, "task_id": doc.task}
+    errors = load_schema().validate(fm_data, task=doc.task, expected=expected, require_completed=True)
+    return [str(error) for error in errors]
+
+
+def validate_document(iteration, doc):
+    """Validate one StageDocument of an iteration snapshot."""
+    started = time.perf_counter()
+    count("documents_validated")
+    result = ValidationResult(iteration, doc.stage, doc.path, doc.rel_path, doc.task)
+    try:
+        fm_data = get_frontmatter(doc.path)
+        if fm_data is None:
+            result.errors.append("Frontmatter 格式错误或缺失")
+        else:
+            result.errors.extend(check_frontmatter(fm_data, iteration, doc))
+    except (OSError, ValueError, UnicodeDecodeError) as e:
+        result.errors.append(f"读取或解析文件失败: {e}")
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def validate_iterations(iterations, workers=8, iterations_dir=ITERATIONS_DIR):
+    """Validate every stage document of the given iterations on a thread pool, in document order."""
+    jobs = []
+    for iteration in iterations:
+        iteration_dir = os.path.join(iterations_dir, iteration)
+        if not os.path.isdir(iteration_dir):
+            print(f"迭代目录不存在: {iteration_dir}", file=sys.stderr)
+            continue
+        snapshot = scan_iteration(iteration_dir, iteration, with_frontmatter=False)
+        jobs.extend((iteration, doc) for doc in snapshot.documents)
+    with span("validate_documents", cat="validate", documents=len(jobs)), \
+            ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return list(pool.map(lambda job: validate_document(*job), jobs))
+
+
+def write_json_report(results, path):
+    """Write the aggregated results as JSON ('-' for stdout)."""
+    failed = [r for r in results if not r.passed]
+    report = {
+        "passed": not failed,
+        "total": len(results),
+        "failures": len(failed),
+        "documents": [dict(asdict(r), elapsed=round(r.elapsed, 6), passed=r.passed) for r in results],
+    }
+    content = json.dumps(report, ensure_ascii=False, indent=2)
+    if path == "-":
+        print(content)
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content + "\n")
+
+
+def write_junit_report(results, path, suite_name):
+    """Write the results as JUnit XML: one testsuite per iteration, one testcase per document."""
+    root = ET.Element("testsuites", name=suite_name, tests=str(len(results)),
+                      failures=str(sum(1 for r in results if not r.passed)))
+    suites = {}
+    for r in results:
+        suite = suites.get(r.iteration)
+        if suite is None:
+            suite = suites[r.iteration] = ET.SubElement(root, "testsuite", name=r.iteration)
+        classname = f"{r.iteration}.{r.task}" if r.task else r.iteration
+        case = ET.SubElement(suite, "testcase", classname=classname, name=f"{r.stage} {r.rel_path}",
+                             time=f"{r.elapsed:.6f}")
+        if not r.passed:
+            failure = ET.SubElement(case, "failure", message=r.errors[0])
+            failure.text = "\n".join(r.errors)
+    for iteration, suite in suites.items():
+        cases = [r for r in results if r.iteration == iteration]
+        suite.set("tests", str(len(cases)))
+        suite.set("failures", str(sum(1 for r in cases if not r.passed)))
+        suite.set("time", f"{sum(r.elapsed for r in cases):.6f}")
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def add_batch_arguments(parser):
+    """The batch-mode options shared by flow_sentinel and phase_validator."""
+    parser.add_argument("--batch", action="store_true", help="批量校验迭代中的所有阶段产物")
+    parser.add_argument("--all", action="store_true", help="批量模式下校验所有迭代")
+    parser.add_argument("--workers", type=int, default=8, help="批量模式的校验线程数（默认 8）")
+    parser.add_argument("--json", dest="json_report", help="批量模式 JSON 报告路径，'-' 表示标准输出")
+    parser.add_argument("--junit", dest="junit_report", help="批量模式 JUnit XML 报告路径")
+
+
+def run_batch(args, tag, suite_name):
+    """Run batch mode for a CLI: validate, print a summary, write reports. Returns True if everything passed."""
+    # Keep stdout clean when the JSON report goes there
+    out = sys.stderr if args.json_report == "-" else sys.stdout
+    if args.all:
+        iterations = list_iterations(ITERATIONS_DIR) if os.path.isdir(ITERATIONS_DIR) else []
+        get_cache().request_prune()
+    elif args.iteration:
+        iterations = [args.iteration]
+    else:
+        print(f"[{tag}] ❌ 批量模式请通过 --iteration 指定迭代，或使用 --all", file=out)
+        return False
+
+    started = time.perf_counter()
+    results = validate_iterations(iterations, args.workers)
+    elapsed = time.perf_counter() - started
+    failed = [r for r in results if not r.passed]
+    for r in failed:
+        print(f"[{tag}] 🚫 {r.iteration}/{r.rel_path}: {'；'.join(r.errors)}", file=out)
+    mark = "✅" if not failed else "❌"
+    print(f"[{tag}] {mark} 批量校验 {len(iterations)} 个迭代、{len(results)} 个阶段产物："
+          f"{len(results) - len(failed)} 通过，{len(failed)} 未通过（{elapsed:.3f}s）", file=out)
+
+    if args.json_report:
+        write_json_report(results, args.json_report)
+    if args.junit_report:
+        write_junit_report(results, args.junit_report, suite_name)
+    return not failed
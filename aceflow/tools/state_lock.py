@@ -1,25 +1,29 @@
 import argparse
 import os
+import sys
 import json
-import yaml
-from datetime import datetime
+import time
+import uuid
+import errno
+import fcntl
+import random
+import socket
+from datetime import datetime, timedelta
 
-LOCK_FILE = "aceflow/status.lock.json"
-CONTEXT_DIR = ".context"
+from frontmatter import load_yaml_mapping
+from profiling import add_profile_argument, enable_from_args, count, traced
 
-def load_lock():
-    if os.path.exists(LOCK_FILE):
-        try:
-            with open(LOCK_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            print(f"[state_lock] ⚠️ 锁文件格式错误，已重置为空")
-    return {}
+# One lock file per task: acquiring is a single atomic create, releasing a single
+# unlink, so the cost of a lock does not depend on how many tasks are locked.
+LOCK_DIR = "aceflow/locks"
+LOCK_SUFFIX = ".lock"
+# Shared lock JSON of earlier versions; its entries are moved into LOCK_DIR on first use
+LEGACY_LOCK_FILE = "aceflow/status.lock.json"
+CONTEXT_DIR = ".context"
+DEFAULT_TTL = int(os.environ.get("ACEFLOW_LOCK_TTL", 3600))
 
-def save_lock(lock):
-    os.makedirs(os.path.dirname(LOCK_FILE), exist_ok=True)
-    with open(LOCK_FILE, "w", encoding="utf-8") as f:
-        json.dump(lock, f, indent=2, ensure_ascii=False)
+def lock_path(task_id):
+    return os.path.join(LOCK_DIR, f"{task_id}{LOCK_SUFFIX}")
 
 def load_context(task_id):
     context_path = os.path.join(CONTEXT_DIR, f"{task_id}.yaml")
@@ -27,71 +31,336 @@ def load_context(task_id):
         print(f"[state_lock] ❌ 未找到上下文文件: {context_path}")
         return None
     with open(context_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return load_yaml_mapping(f.read())
 
-def lock_task(task_id):
-    context = load_context(task_id)
-    if not context:
-        return
+def read_lock(path):
+    """Return the metadata of a lock file, {} if it is unreadable, or None if it does not exist."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        return {}
+
+def _pid_alive(meta):
+    """False only if the holder ran on this host and its process is gone."""
+    if meta.get("host") != socket.gethostname() or not meta.get("pid"):
+        return True
+    try:
+        os.kill(meta["pid"], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def is_stale(meta, now=None):
+    """A lock is stale once its lease expired, its holder process died or its file is corrupt."""
+    if meta is None:
+        return False
+    if not meta:
+        return True
+    expires_at = meta.get("expires_at")
+    now = now or datetime.now()
+    if expires_at:
+        try:
+            if datetime.fromisoformat(str(expires_at)) <= now:
+                return True
+        except ValueError:
+            return True  # an unreadable lease is treated like a corrupt file
+    return not _pid_alive(meta)
 
-    lock = load_lock()
-    if task_id in lock and lock[task_id]["status"] == "locked":
-        print(f"[state_lock] ⚠️ 任务 {task_id} 已被锁定，无需重复锁定。")
+def _same_file(fd, path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    fst = os.fstat(fd)
+    return (st.st_dev, st.st_ino) == (fst.st_dev, fst.st_ino)
+
+def _remove_if(path, predicate):
+    """
+    Compare-and-delete: unlink the lock file only if predicate(meta) holds for
+    the file currently at path. The fcntl lock keeps a live holder's file from
+    being removed, and the inode check keeps us from removing a newer lock that
+    replaced the one we opened.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError as e:
+            if e.errno in (errno.EWOULDBLOCK, errno.EAGAIN):
+                return False  # held by a running process
+            raise
+        if not _same_file(fd, path) or not predicate(read_lock(path)):
+            return False
+        os.unlink(path)
+        return True
+    finally:
+        os.close(fd)
+
+@traced(cat="lock")
+def reap_stale(task_id=None):
+    """Remove stale locks (of one task, or all). Returns the task IDs that were reaped."""
+    if task_id:
+        paths = [lock_path(task_id)]
+    elif os.path.isdir(LOCK_DIR):
+        paths = [entry.path for entry in os.scandir(LOCK_DIR) if entry.name.endswith(LOCK_SUFFIX)]
     else:
-        lock[task_id] = {
+        paths = []
+    reaped = []
+    for path in paths:
+        if _remove_if(path, is_stale):
+            reaped.append(os.path.basename(path)[:-len(LOCK_SUFFIX)])
+    return reaped
+
+class TaskLock:
+    """
+    A held task lock. While the object is alive its process also holds an fcntl
+    lock on the file, so the lock is never reaped from under a running holder,
+    even past its lease.
+    """
+
+    def __init__(self, task_id, meta, fd):
+        self.task_id = task_id
+        self.meta = meta
+        self._fd = fd
+
+    @property
+    def path(self):
+        return lock_path(self.task_id)
+
+    def renew(self, ttl=DEFAULT_TTL):
+        """Extend the lease; the file is rewritten in place so the fcntl lock stays valid."""
+        self.meta["expires_at"] = (datetime.now() + timedelta(seconds=ttl)).isoformat()
+        data = json.dumps(self.meta, indent=2, ensure_ascii=False).encode("utf-8")
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.ftruncate(self._fd, 0)
+        os.write(self._fd, data)
+
+    def detach(self, ttl=DEFAULT_TTL):
+        """Hand the lock over to its lease, for holders that exit before the task is unlocked."""
+        self.meta.pop("pid", None)
+        self.renew(ttl)
+        os.close(self._fd)
+        self._fd = None
+
+    def release(self):
+        """Remove the lock file if it is still ours (same token)."""
+        if self._fd is None:
+            return False
+        token = self.meta["token"]
+        try:
+            if not _same_file(self._fd, self.path):
+                return False
+            if (read_lock(self.path) or {}).get("token") != token:
+                return False
+            os.unlink(self.path)
+            return True
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+def _try_create(task_id, meta):
+    """Atomically create the lock file with its metadata; returns the open fd or None if it exists."""
+    os.makedirs(LOCK_DIR, exist_ok=True)
+    path = lock_path(task_id)
+    tmp_path = os.path.join(LOCK_DIR, f".{task_id}.{meta['token']}.tmp")
+    fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o644)
+    try:
+        os.write(fd, json.dumps(meta, indent=2, ensure_ascii=False).encode("utf-8"))
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        # link() fails with EEXIST if the task is already locked: an O_EXCL create
+        # that makes the lock visible only once its metadata is complete
+        os.link(tmp_path, path)
+    except FileExistsError:
+        os.close(fd)
+        return None
+    except BaseException:
+        os.close(fd)
+        raise
+    finally:
+        os.unlink(tmp_path)
+    return fd
+
+@traced(cat="lock")
+def acquire(task_id, context=None, ttl=DEFAULT_TTL, timeout=0, poll_interval=0.05):
+    """
+    Acquire the lock of a task, waiting up to timeout seconds (None waits forever).
+    Stale locks found on the way are reaped. Returns a TaskLock, or None on timeout.
+    """
+    context = context or {}
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = poll_interval
+    while True:
+        now = datetime.now()
+        meta = {
+            "task_id": task_id,
             "status": "locked",
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": now.isoformat(),
+            "expires_at": (now + timedelta(seconds=ttl)).isoformat(),
             "iteration": context.get("iteration", "unknown"),
             "stage": context.get("stage", "unknown"),
-            "doc_owner": context.get("doc_owner", "unknown")
+            "doc_owner": context.get("doc_owner", "unknown"),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "token": uuid.uuid4().hex,
         }
-        save_lock(lock)
-        print(f"[state_lock] ✅ 已锁定任务：{task_id}（阶段：{lock[task_id]['stage']}）")
+        count("lock_attempts")
+        fd = _try_create(task_id, meta)
+        if fd is not None:
+            return TaskLock(task_id, meta, fd)
+        if reap_stale(task_id):
+            print(f"[state_lock] 🧹 已清理任务 {task_id} 的过期锁")
+            continue
+        if deadline is not None and time.monotonic() >= deadline:
+            return None
+        # Back off with jitter so hundreds of waiters do not retry in lockstep
+        sleep = delay * random.uniform(0.5, 1.5)
+        if deadline is not None:
+            sleep = min(sleep, max(0.0, deadline - time.monotonic()))
+        time.sleep(sleep)
+        delay = min(delay * 2, 1.0)
+
+def migrate_legacy_locks(ttl=DEFAULT_TTL):
+    """
+    Move the locked entries of the old shared aceflow/status.lock.json into
+    per-task lock files, then remove it. Old entries had no lease, so each gets
+    ttl seconds from now. The file is first claimed by renaming it to a per-pid
+    name, so when several processes start at once exactly one migrates it.
+    Returns the migrated task IDs.
+    """
+    claimed = f"{LEGACY_LOCK_FILE}.{os.getpid()}"
+    try:
+        os.rename(LEGACY_LOCK_FILE, claimed)
+    except FileNotFoundError:
+        return []  # already migrated, possibly by a concurrent process
+    try:
+        with open(claimed, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+    except (OSError, ValueError) as e:
+        # Put it back so it can be inspected or migrated later
+        os.replace(claimed, LEGACY_LOCK_FILE)
+        print(f"[state_lock] ⚠️ 无法读取旧版锁文件 {LEGACY_LOCK_FILE}，未迁移: {e}")
+        return []
+    migrated = []
+    for task_id, entry in (legacy.items() if isinstance(legacy, dict) else []):
+        if not isinstance(entry, dict) or entry.get("status") != "locked":
+            continue
+        meta = dict(entry, task_id=task_id, token=uuid.uuid4().hex,
+                    expires_at=(datetime.now() + timedelta(seconds=ttl)).isoformat())
+        fd = _try_create(task_id, meta)
+        if fd is not None:  # an existing per-task lock wins over the legacy entry
+            os.close(fd)
+            migrated.append(task_id)
+    os.remove(claimed)
+    if migrated:
+        print(f"[state_lock] 📦 已将 {len(migrated)} 个旧版锁迁移到 {LOCK_DIR}：{', '.join(migrated)}")
+    return migrated
+
+def lock_task(task_id, ttl=DEFAULT_TTL, timeout=0):
+    context = load_context(task_id)
+    if not context:
+        return False
+
+    task_lock = acquire(task_id, context, ttl, timeout)
+    if task_lock is None:
+        meta = read_lock(lock_path(task_id)) or {}
+        owner = meta.get("doc_owner", "unknown")
+        print(f"[state_lock] ⚠️ 任务 {task_id} 已被 {owner} 锁定（至 {meta.get('expires_at', 'unknown')}），锁定失败。")
+        return False
+    # The CLI process exits right away, so the lease (not the fcntl lock) protects the task from here on
+    task_lock.detach(ttl)
+    print(f"[state_lock] ✅ 已锁定任务：{task_id}（阶段：{task_lock.meta['stage']}，租期 {ttl} 秒）")
+    return True
 
 def unlock_task(task_id):
-    lock = load_lock()
-    if task_id not in lock:
-        print(f"[state_lock] ⚠️ 任务 {task_id} 当前未锁定")
-    else:
-        lock.pop(task_id)
-        save_lock(lock)
+    path = lock_path(task_id)
+    if _remove_if(path, lambda meta: True):
         print(f"[state_lock] 🔓 已解锁任务：{task_id}")
+        return True
+    if os.path.exists(path):
+        print(f"[state_lock] ⚠️ 任务 {task_id} 正由运行中的进程持有，无法解锁")
+    else:
+        print(f"[state_lock] ⚠️ 任务 {task_id} 当前未锁定")
+    return False
+
+def list_locks():
+    """Return (task_id, meta) for every lock file."""
+    if not os.path.isdir(LOCK_DIR):
+        return []
+    locks = []
+    for entry in sorted(os.scandir(LOCK_DIR), key=lambda e: e.name):
+        if entry.name.endswith(LOCK_SUFFIX):
+            meta = read_lock(entry.path)
+            if meta is not None:
+                locks.append((entry.name[:-len(LOCK_SUFFIX)], meta))
+    return locks
 
 def print_lock_status():
-    lock = load_lock()
-    if not lock:
+    locks = list_locks()
+    if not locks:
         print("[state_lock] 🔍 当前无锁定任务")
     else:
         print("[state_lock] 🔐 当前锁定状态：")
-        for task_id, meta in lock.items():
+        now = datetime.now()
+        for task_id, meta in locks:
             ts = meta.get("timestamp", "unknown")
             stage = meta.get("stage", "unknown")
             owner = meta.get("doc_owner", "unknown")
-            print(f"  └─ {task_id} 🟩 {stage} by {owner} at {ts}")
+            expires = meta.get("expires_at", "unknown")
+            marker = "🟥 已过期" if is_stale(meta, now) else "🟩"
+            print(f"  └─ {task_id} {marker} {stage} by {owner} at {ts} (expires {expires})")
 
 def main():
     parser = argparse.ArgumentParser(description="ACEFLOW 状态锁控制")
     parser.add_argument("--lock", action="store_true", help="锁定指定任务")
     parser.add_argument("--unlock", action="store_true", help="解锁指定任务")
     parser.add_argument("--status", action="store_true", help="查看当前所有锁定状态")
+    parser.add_argument("--reap", action="store_true", help="清理所有过期的锁")
     parser.add_argument("--task", type=str, help="指定任务 ID")
+    parser.add_argument("--ttl", type=int, default=DEFAULT_TTL, help=f"锁的租期（秒，默认 {DEFAULT_TTL}）")
+    parser.add_argument("--wait", type=float, default=0, help="锁被占用时最多等待的秒数（默认不等待）")
+    parser.add_argument("--fail-if-locked", action="store_true", help="锁定失败时以退出码 1 退出（默认仅提示并返回 0）")
 
+    add_profile_argument(parser)
     args = parser.parse_args()
+    enable_from_args(args)
+    if os.path.exists(LEGACY_LOCK_FILE):
+        migrate_legacy_locks(args.ttl)
 
     if args.status:
         print_lock_status()
         return
 
+    if args.reap:
+        reaped = reap_stale()
+        print(f"[state_lock] 🧹 已清理 {len(reaped)} 个过期锁" + (f"：{', '.join(reaped)}" if reaped else ""))
+        return
+
     if not args.task:
         print("[state_lock] ❌ 请通过 --task 指定任务 ID")
         return
 
     if args.lock:
-        lock_task(args.task)
+        # A task that is already locked is a warning, as it always was; scripts opt into failing
+        if not lock_task(args.task, args.ttl, args.wait) and args.fail_if_locked:
+            sys.exit(1)
     elif args.unlock:
         unlock_task(args.task)
     else:
-        print("[state_lock] ❗ 未指定操作类型，请使用 --lock / --unlock / --status")
+        print("[state_lock] ❗ 未指定操作类型，请使用 --lock / --unlock / --status / --reap")
 
 if __name__ == "__main__":
     main()
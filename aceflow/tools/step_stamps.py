@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Input/output stamps for update_all steps, so a step whose files did not change
+since its last successful run can be skipped, the way make skips up-to-date
+targets. A stamp is a digest of (relative path, mtime_ns, size) of every file
+and directory under the given paths; missing paths are part of the stamp too.
+An output that several steps write to (index.md) is declared as a Section, and
+only the content of the step's own sections is stamped, so one step writing
+the file does not invalidate the other.
+Stamps are kept per step in aceflow/.cache/update_all_stamps.json.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import functools
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from markdown_sections import SectionDocument, content_digest
+from profiling import span
+
+STAMPS_VERSION = 1
+STAMPS_FILE = os.path.join(Path(__file__).parent.parent, ".cache", "update_all_stamps.json")
+SKIP_DIRS = {"__pycache__", ".cache", ".git"}
+
+
+def _walk(path, digest):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        digest.update(f"{path}\0missing\n".encode("utf-8"))
+        return
+    digest.update(f"{path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+    if not os.path.isdir(path):
+        return
+    for dirpath, dirnames, filenames in os.walk(path, followlinks=True):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in dirnames + sorted(filenames):
+            entry = os.path.join(dirpath, name)
+            try:
+                st = os.stat(entry)
+            except FileNotFoundError:
+                continue
+            rel_path = os.path.relpath(entry, path)
+            digest.update(f"{rel_path}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8"))
+
+
+class Section(NamedTuple):
+    """The '## ' sections of a Markdown file whose heading ends with suffix."""
+    path: str
+    suffix: str
+
+
+def section_stamp(section):
+    """Digest of the matching sections' headings and bodies (timestamps masked), or of their absence."""
+    try:
+        document = SectionDocument.load(section.path)
+    except FileNotFoundError:
+        return "missing"
+    parts = [f"{heading}\n{document.get(heading)}" for heading in document.headings()
+             if heading.endswith(section.suffix)]
+    return content_digest("\0".join(parts))
+
+
+def path_stamp(path):
+    """Stamp of a single file or directory tree."""
+    digest = hashlib.blake2b(digest_size=16)
+    _walk(os.path.abspath(path), digest)
+    return digest.hexdigest()
+
+
+class StepStamps:
+    """
+    Recorded stamps of every step, plus a per-run memo of path stamps so a tree
+    declared by several steps (the iteration directory) is walked once.
+    """
+
+    def __init__(self, stamps_file=STAMPS_FILE):
+        self.stamps_file = stamps_file
+        self._lock = threading.Lock()
+        self._memo = {}
+        self._steps = {}
+        try:
+            with open(stamps_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == STAMPS_VERSION:
+                self._steps = data.get("steps", {})
+        except (OSError, ValueError):
+            pass  # no stamps yet: every step runs
+
+    def stamp(self, paths, memo=True):
+        """Combined stamp of paths. With memo, each path is stamped at most once per run."""
+        parts = []
+        for path in paths:
+            if isinstance(path, Section):
+                key = f"{os.path.realpath(path.path)}#{path.suffix}"
+                stamp = functools.partial(section_stamp, path._replace(path=os.path.realpath(path.path)))
+            else:
+                key = os.path.realpath(path)
+                stamp = functools.partial(path_stamp, key)
+            # Held while walking, so concurrent steps declaring the same tree wait for one walk
+            with self._lock:
+                value = self._memo.get(key) if memo else None
+                if value is None:
+                    with span("stamp_inputs", cat="io", path=os.path.basename(key)):
+                        value = stamp()
+                    if memo:
+                        self._memo[key] = value
+            parts.append(f"{key}={value}")
+        return hashlib.blake2b("\n".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    def up_to_date(self, key, inputs, outputs):
+        """True if the step ran successfully before with the same input and output stamps."""
+        recorded = self._steps.get(key)
+        if not recorded or not inputs:
+            return False
+        return (recorded.get("inputs") == self.stamp(inputs)
+                and recorded.get("outputs") == self.stamp(outputs, memo=False))
+
+    def record(self, key, inputs, outputs):
+        """
+        Remember a step as up to date. Inputs use the stamps taken before the run
+        (a change made while the step ran is picked up next time); outputs are
+        stamped now, after they were written.
+        """
+        self._steps[key] = {"inputs": self.stamp(inputs), "outputs": self.stamp(outputs, memo=False)}
+
+    def forget(self, key):
+        self._steps.pop(key, None)
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.stamps_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".update_all_stamps.", dir=os.path.dirname(self.stamps_file))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": STAMPS_VERSION, "steps": self._steps}, f, indent=2)
+        os.replace(tmp_path, self.stamps_file)
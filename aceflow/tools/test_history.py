@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-class test duration history for run_test, and duration-balanced sharding.
+Durations measured from the surefire reports of every run are stored in
+aceflow/.cache/test_durations.json keyed by simple class name. plan_shards uses
+them to split the requested classes into N shards of roughly equal total time
+(longest-processing-time-first). Classes with no history get a default weight.
+"""
+
+import os
+import json
+import heapq
+import fnmatch
+import tempfile
+import statistics
+from pathlib import Path
+
+HISTORY_VERSION = 1
+HISTORY_FILE = os.path.join(Path(__file__).parent.parent, ".cache", "test_durations.json")
+FALLBACK_WEIGHT = 10.0  # seconds, used when there is no history at all
+SMOOTHING = 0.5         # weight of the newest measurement in the moving average
+
+
+def simple_name(class_name):
+    """'com.example.UserServiceTest' -> 'UserServiceTest' (also strips a '#method' suffix)."""
+    return class_name.split("#", 1)[0].rsplit(".", 1)[-1]
+
+
+class DurationHistory:
+    """Smoothed per-class durations in seconds, persisted as JSON."""
+
+    def __init__(self, history_file=HISTORY_FILE):
+        self.history_file = history_file
+        self.durations = {}
+        try:
+            with open(history_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") == HISTORY_VERSION:
+                self.durations = {k: float(v) for k, v in data.get("durations", {}).items()}
+        except (OSError, ValueError, AttributeError):
+            pass
+
+    def default_weight(self):
+        """Median of the known durations, so unknown classes are neither starved nor dominant."""
+        return statistics.median(self.durations.values()) if self.durations else FALLBACK_WEIGHT
+
+    def weight(self, pattern, default=None):
+        """Expected duration of a class or pattern; wildcard patterns sum the classes they match."""
+        default = self.default_weight() if default is None else default
+        name = simple_name(pattern)
+        if name in self.durations:
+            return self.durations[name]
+        if any(c in name for c in "*?["):
+            matched = [d for cls, d in self.durations.items() if fnmatch.fnmatchcase(cls, name)]
+            if matched:
+                return sum(matched)
+        return default
+
+    def record(self, suites):
+        """Fold the durations of finished SuiteResults into the history."""
+        for suite in suites:
+            name = simple_name(suite.name)
+            previous = self.durations.get(name)
+            self.durations[name] = suite.time if previous is None else \
+                SMOOTHING * suite.time + (1 - SMOOTHING) * previous
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".test_durations.", dir=os.path.dirname(self.history_file))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": HISTORY_VERSION, "durations": dict(sorted(self.durations.items()))},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.history_file)
+
+
+def plan_shards(patterns, shards, history, default_weight=None):
+    """
+    Split patterns into at most `shards` lists with balanced expected time.
+    Returns a list of (expected_seconds, patterns) with no empty shards.
+    """
+    weighted = sorted(((history.weight(p, default_weight), p) for p in patterns), key=lambda wp: -wp[0])
+    heap = [(0.0, i, []) for i in range(max(1, min(shards, len(patterns))))]
+    for weight, pattern in weighted:
+        total, index, members = heapq.heappop(heap)
+        members.append(pattern)
+        heapq.heappush(heap, (total + weight, index, members))
+    return [(total, members) for total, _, members in sorted(heap, key=lambda item: item[1]) if members]
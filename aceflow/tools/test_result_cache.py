@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Result cache for run_test. A passing test class is stored under a key made of
+the content hash of its own test sources and of the rest of the Maven project
+(pom.xml, main sources, resources and shared test helpers). A later run with
+the same key reports the pass from the cache instead of starting Maven.
+Entries live in aceflow/.cache/test_results/ as one JSON file each, and the
+least recently used ones are evicted once the directory exceeds its size bound.
+"""
+
+import os
+import re
+import json
+import fnmatch
+import hashlib
+import tempfile
+from pathlib import Path
+
+CACHE_VERSION = 1
+CACHE_DIR = os.path.join(Path(__file__).parent.parent, ".cache", "test_results")
+MAX_BYTES = int(os.environ.get("ACEFLOW_TEST_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+SKIP_DIRS = {"target", ".git", ".idea", ".mvn"}
+# Sources surefire picks up as test classes by default; every other file counts as shared input
+TEST_CLASS = re.compile(r"^(Test\w*|\w*(Test|Tests|IT|TestCase))\.(java|kt|groovy)$")
+
+
+def _project_files(project_dir):
+    for dirpath, dirnames, filenames in os.walk(project_dir):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            path = os.path.join(dirpath, name)
+            yield os.path.relpath(path, project_dir).replace(os.sep, "/"), path
+
+
+def _is_test_class(rel_path):
+    return rel_path.startswith("src/test/") and TEST_CLASS.match(rel_path.rsplit("/", 1)[-1]) is not None
+
+
+def _hash_files(files):
+    digest = hashlib.blake2b(digest_size=20)
+    for rel_path, path in files:
+        digest.update(rel_path.encode("utf-8") + b"\0")
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ProjectDigest:
+    """One walk over the project: the shared-input hash plus the test class sources by simple name."""
+
+    def __init__(self, project_dir):
+        shared, self.test_classes = [], {}
+        for rel_path, path in _project_files(project_dir):
+            if _is_test_class(rel_path):
+                name = rel_path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+                self.test_classes.setdefault(name, []).append((rel_path, path))
+            else:
+                shared.append((rel_path, path))
+        self.shared = _hash_files(shared)
+
+    def key(self, pattern):
+        """Cache key of a class or pattern, or None if it matches no test source."""
+        name = pattern.split("#", 1)[0].rsplit(".", 1)[-1]
+        matched = sorted(f for cls, files in self.test_classes.items() if fnmatch.fnmatchcase(cls, name)
+                         for f in files)
+        if not matched:
+            return None
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(f"{CACHE_VERSION}\0{pattern}\0{self.shared}\0{_hash_files(matched)}".encode("utf-8"))
+        return digest.hexdigest()
+
+
+class TestResultCache:
+    """Passing results on disk, one file per key, with size-bounded LRU eviction."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """The stored entry for key (its suites as dicts), or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(path)  # mark as recently used
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("version") == CACHE_VERSION else None
+
+    def put(self, key, pattern, suites):
+        """Store the passing suites of a pattern, then evict down to the size bound."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".entry.", dir=self.cache_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({"version": CACHE_VERSION, "pattern": pattern, "suites": suites}, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the directory fits in max_bytes."""
+        try:
+            names = [n for n in os.listdir(self.cache_dir) if n.endswith(".json") and not n.startswith(".")]
+        except FileNotFoundError:
+            return
+        entries = []
+        for name in names:
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -3,81 +3,215 @@
 
 """
 Script to run all update tools in aceflow framework.
-This script sequentially executes update_status.py, update_flowchart.py,
-update_task_reminders.py, and update_navigation.py to ensure all components
-are updated in the correct order.
+This script imports update_status.py, update_flowchart.py,
+update_task_reminders.py, update_navigation.py and load_attention_prompts.py
+as library functions and runs them in one process from a declared step graph.
+status.md and index.md are edited in memory by every step and written once.
+Steps without dependencies between them run concurrently on a thread pool,
+and the run ends with a per-step timing report.
+Each step declares its input and output files; a step whose inputs and outputs
+are unchanged since its last successful run is skipped (see step_stamps.py),
+unless a step it depends on ran or --force is given.
 """
 
 import os
-import subprocess
+import time
 import argparse
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
 
-def run_script(script_name, iteration=None, all_iterations=False):
-    """Run a specified Python script and return its output."""
+import update_status
+import update_flowchart
+import update_task_reminders
+import update_navigation
+import load_attention_prompts
+from iteration_scanner import SnapshotCache
+from schema_validator import SCHEMA_FILE
+from frontmatter_cache import get_cache, disable_cache
+from markdown_sections import DocumentSet
+from step_stamps import Section, StepStamps
+from profiling import add_profile_argument, enable_from_args, current_span, span
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ACEFLOW_DIR = os.path.dirname(TOOLS_DIR)
+# Read by every step (directly or through the scanner), so editing any of them invalidates all stamps
+SHARED_INPUTS = (SCHEMA_FILE,) + tuple(os.path.join(TOOLS_DIR, name) for name in (
+    "iteration_scanner.py", "frontmatter.py", "frontmatter_cache.py", "schema_validator.py",
+    "markdown_sections.py", "markdown_render.py"))
+
+@dataclass
+class Step:
+    """
+    A single update step, the steps that must finish before it starts, the files
+    and directories it reads and the files it produces. A step without inputs always runs.
+    """
+    name: str
+    action: Callable
+    depends_on: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    inputs: Tuple[str, ...] = ()
+
+@dataclass
+class StepResult:
+    name: str
+    success: bool
+    started: float
+    elapsed: float
+    error: Optional[str] = None
+    skipped: bool = False
+
+def build_steps(documents, iteration=None, all_iterations=False, jobs=1):
+    """
+    Declare the update step graph. update_status scans the configured iterationRoot;
+    the other steps scan aceflow/iterations. index.md is shared, so the flowchart and navigation steps each declare only their own sections as outputs.
+    Iterations are scanned once, across jobs worker processes, and shared between steps.
+    status.md and index.md edits go to the shared DocumentSet, which the caller commits.
+    """
+    snapshots = SnapshotCache(jobs)
+    iterations_dir = os.path.join(ACEFLOW_DIR, "iterations")
+    index_file = os.path.join(ACEFLOW_DIR, "index.md")
+    # Every step also depends on its own tool source and the shared inputs
+    steps = [
+        Step("update_status", lambda: update_status.run(iteration, all_iterations, snapshots, documents=documents),
+             inputs=(update_status.get_iterations_dir(), update_status.__file__),
+             outputs=(os.path.join(os.path.dirname(ACEFLOW_DIR), "aceflow_result", "status.md"),)),
+        Step("update_flowchart", lambda: update_flowchart.run(iteration, all_iterations, documents=documents, snapshots=snapshots),
+             inputs=(iterations_dir, update_flowchart.__file__), outputs=(Section(index_file, " 流程图"),)),
+        Step("update_task_reminders", lambda: update_task_reminders.run(iteration, all_iterations, snapshots),
+             inputs=(iterations_dir, update_task_reminders.__file__),
+             outputs=(os.path.join(ACEFLOW_DIR, "task_reminders.md"),)),
+        Step("update_navigation", lambda: update_navigation.run(iteration, all_iterations, snapshots, documents=documents),
+             inputs=(iterations_dir, update_navigation.__file__), outputs=(Section(index_file, " 文档导航"),)),
+        # Provide a default stage for attention prompts loading
+        Step("load_attention_prompts", lambda: load_attention_prompts.run("S1"),
+             inputs=(load_attention_prompts.TEMPLATE_DIR, load_attention_prompts.__file__)),
+    ]
+    for step in steps:
+        step.inputs += SHARED_INPUTS
+    return steps
+
+def stamp_key(step, iteration=None, all_iterations=False):
+    """Stamps are kept per step and per selection of iterations."""
+    return f"{step.name}:{'--all' if all_iterations else iteration or 'iteration-01'}"
+
+def run_step(step, origin, skip=None, parent=None):
+    """
+    Run one step, converting exceptions into a failed result.
+    skip(step) returning True reports the step as skipped without running it.
+    parent is the caller's profiling span; the step's span is linked to it.
+    """
+    started = time.perf_counter()
+    if skip is not None and skip(step):
+        return StepResult(step.name, True, started - origin, time.perf_counter() - started, skipped=True)
+    error = None
     try:
-        script_path = os.path.join(tools_dir, script_name)
-        if not os.path.exists(script_path):
-            print(f"Script {script_path} does not exist.")
-            return False
-        cmd = ['python', script_path]
-        if script_name == "load_attention_prompts.py":
-            # Provide a default stage for attention prompts loading
-            cmd.extend(['--stage', 'S1'])
-        if all_iterations:
-            cmd.append('--all')
-        elif iteration:
-            cmd.extend(['--iteration', iteration])
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        print(f"Running {script_name}:")
-        print(result.stdout)
-        if result.stderr:
-            print(f"Errors in {script_name}:")
-            print(result.stderr)
-        return result.returncode == 0
+        with span(step.name, cat="step", parent=parent):
+            success = bool(step.action())
     except Exception as e:
-        print(f"Error running {script_name}: {e}")
-        return False
+        success = False
+        error = f"{type(e).__name__}: {e}"
+        print(f"Error running {step.name}: {error}")
+    return StepResult(step.name, success, started - origin, time.perf_counter() - started, error)
+
+def run_steps(steps, jobs=None, skip=None):
+    """
+    Run steps as soon as all of their dependencies have finished.
+    A failed dependency does not block its dependents, matching the previous
+    "continue with other scripts" behaviour. jobs caps the number of concurrent
+    steps (one thread per step by default). skip(step) may report a step as
+    skipped; it is only asked when none of the step's dependencies ran.
+    Returns results in declaration order.
+    """
+    names = {step.name for step in steps}
+    for step in steps:
+        unknown = [dep for dep in step.depends_on if dep not in names]
+        if unknown:
+            raise ValueError(f"Step {step.name} depends on unknown steps: {unknown}")
 
-def get_all_iterations(base_dir):
-    """Get a list of all iteration directories in the iterations folder."""
-    iterations_dir = os.path.join(base_dir, "iterations")
-    if not os.path.exists(iterations_dir):
-        print(f"Iterations directory {iterations_dir} does not exist.")
-        return []
-    return [d for d in os.listdir(iterations_dir) if os.path.isdir(os.path.join(iterations_dir, d))]
+    origin = time.perf_counter()
+    parent = current_span()  # steps run on pool threads; link their spans to the caller's
+    pending = list(steps)
+    done = {}
+    running = {}
+    with ThreadPoolExecutor(max_workers=jobs or len(steps)) as pool:
+        while pending or running:
+            for step in list(pending):
+                if all(dep in done for dep in step.depends_on):
+                    pending.remove(step)
+                    dependency_ran = any(not done[dep].skipped for dep in step.depends_on)
+                    running[pool.submit(run_step, step, origin, None if dependency_ran else skip, parent)] = step
+            if not running:
+                raise ValueError(f"Dependency cycle between steps: {[step.name for step in pending]}")
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                done[step.name] = future.result()
+    return [done[step.name] for step in steps]
+
+def print_timing_report(results, total):
+    """Print a per-step timing report."""
+    print("\nStep timing report:")
+    print(f"  {'step':<24} {'result':<8} {'start':>8} {'elapsed':>8}")
+    for result in results:
+        outcome = "skipped" if result.skipped else "ok" if result.success else "FAILED"
+        print(f"  {result.name:<24} {outcome:<8} {result.started:>7.3f}s {result.elapsed:>7.3f}s")
+    print(f"  {'total':<24} {'':<8} {'':>8} {total:>7.3f}s")
 
 def main():
-    """Main function to run all update scripts in sequence."""
-    global tools_dir
-    tools_dir = Path(__file__).parent
-    
+    """Main function to run all update steps."""
     parser = argparse.ArgumentParser(description="Run all update scripts for a specific iteration or all iterations.")
     parser.add_argument("--iteration", help="Specify the iteration to update (e.g., iteration-01). If not provided, defaults to iteration-01.")
     parser.add_argument("--all", action="store_true", help="Update all iterations.")
+    parser.add_argument("--no-cache", action="store_true", help="Read every stage document instead of using the frontmatter cache.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to scan iterations with --all (default: 1).")
+    parser.add_argument("--force", action="store_true", help="Run every step even if its inputs and outputs are unchanged since the last run.")
+    add_profile_argument(parser)
     args = parser.parse_args()
-    
+    enable_from_args(args)
+    if args.no_cache:
+        disable_cache()
+    if args.all:
+        get_cache().request_prune()  # every iteration is scanned, so deleted documents can be evicted
+
     print("Starting update process for aceflow framework...\n")
-    
-    # Run scripts in sequence
-    scripts = [
-        "update_status.py",
-        "update_flowchart.py",
-        "update_task_reminders.py",
-        "update_navigation.py",
-        "load_attention_prompts.py"
-    ]
-    
-    all_successful = True
-    for script in scripts:
-        if not run_script(script, args.iteration, args.all):
-            all_successful = False
-            print(f"Warning: {script} did not complete successfully. Continuing with other scripts...\n")
-    
-    if all_successful:
-        print("All update scripts completed successfully.")
+
+    started = time.perf_counter()
+    documents = DocumentSet()
+    stamps = StepStamps()
+    steps = build_steps(documents, args.iteration, args.all, args.jobs)
+
+    def skip(step):
+        if not step.inputs:
+            return False
+        key = stamp_key(step, args.iteration, args.all)
+        stamps.stamp(step.inputs)  # taken before the step runs, also with --force
+        if not args.force and stamps.up_to_date(key, step.inputs, step.outputs):
+            print(f"Skipping {step.name}: inputs and outputs unchanged since the last run")
+            return True
+        return False
+
+    with span("update_all", cat="tool"):
+        results = run_steps(steps, skip=skip)
+        # status.md and index.md are written once, after every step has applied its sections
+        documents.commit()
+    for step, result in zip(steps, results):
+        key = stamp_key(step, args.iteration, args.all)
+        if result.success and step.inputs:
+            stamps.record(key, step.inputs, step.outputs)
+        else:
+            stamps.forget(key)
+    try:
+        stamps.save()
+    except OSError as e:
+        print(f"Error writing {stamps.stamps_file}: {e}")
+    print_timing_report(results, time.perf_counter() - started)
+
+    failed = [result.name for result in results if not result.success]
+    if not failed:
+        print("\nAll update scripts completed successfully.")
     else:
-        print("Some update scripts encountered errors. Please check the output for details.")
+        print(f"\nSome update scripts encountered errors: {', '.join(failed)}. Please check the output for details.")
 
 if __name__ == "__main__":
     main()
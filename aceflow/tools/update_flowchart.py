@@ -3,8 +3,12 @@
 
 """
 Script to automate the update of flowchart in aceflow framework.
-It reads the status from status.md and generates a Mermaid flowchart
+It takes the per-stage status from the iteration scan (the same data
+update_status renders into status.md) and generates a Mermaid flowchart
 to be embedded in index.md or other main files.
+With --by-task, new-structure iterations get one subgraph per task; above
+--collapse-threshold tasks the chart falls back to one aggregated node per
+stage with completion counts, so large iterations stay renderable.
 Supports both old and new directory structures.
 """
 
@@ -13,145 +17,242 @@ import re
 import argparse
 from pathlib import Path
 
-def read_status_from_file(status_file, iteration):
-    """Read status data for the given iteration from status.md."""
-    status_data = []
-    try:
-        with open(status_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            iteration_section = f"## 📅 {iteration} 状态"
-            start_idx = content.find(iteration_section)
-            if start_idx == -1:
-                print(f"Could not find section for {iteration}")
-                return status_data
-            
-            table_start = content.find('| 阶段 | 状态', start_idx)
-            if table_start == -1:
-                print(f"Could not find table for {iteration}")
-                return status_data
-            
-            lines = content[table_start:].splitlines()
-            for line in lines[2:]:  # Skip header and separator lines
-                if line.strip() and not line.startswith('---'):
-                    parts = line.split('|')
-                    if len(parts) >= 3:
-                        stage = parts[1].strip()
-                        status = parts[2].strip()
-                        status_data.append((stage, status))
-                    if len(status_data) == 8:  # Assuming 8 stages S1-S8
-                        break
-    except Exception as e:
-        print(f"Error reading {status_file}: {e}")
-    return status_data
+from iteration_scanner import STAGE_NAMES, get_snapshots, list_iterations
+from frontmatter_cache import disable_cache
+from markdown_sections import DocumentSet
+from markdown_render import MarkdownBuilder
+from profiling import add_profile_argument, enable_from_args, span
+from update_status import aggregate_status, scan_iteration_status
+
+STAGE_LABELS = {
+    'S1': '需求分析',
+    'S2': '任务拆解',
+    'S3': '测试用例设计',
+    'S4': '初步实现',
+    'S5': '自动化测试',
+    'S6': '代码审查',
+    'S7': '演示反馈',
+    'S8': '进度总结'
+}
+# status -> (fill, stroke, text color); anything else is drawn like "待开始"
+STATUS_STYLES = {
+    "已完成": ("#2ecc71", "#27ae60", "#fff"),
+    "进行中": ("#f1c40f", "#f39c12", "#000"),
+    "待开始": ("#95a5a6", "#7f8c8d", "#000"),
+}
+STATUS_CLASSES = {"已完成": "done", "进行中": "active", "待开始": "todo"}
+DEFAULT_COLLAPSE_THRESHOLD = 20
+
+def status_style(status):
+    return STATUS_STYLES.get(status, STATUS_STYLES["待开始"])
+
+def node_id(text, taken):
+    """A Mermaid-safe node id for text (letters, digits and underscores only), unique within taken."""
+    base = re.sub(r"\W", "_", text, flags=re.ASCII) or "node"
+    if not base[0].isalpha():
+        base = f"n_{base}"
+    candidate, n = base, 1
+    while candidate in taken:
+        n += 1
+        candidate = f"{base}_{n}"
+    taken.add(candidate)
+    return candidate
+
+def node_label(text):
+    """A quoted Mermaid label; quotes inside it are written as entities."""
+    return '"' + str(text).replace('"', "#quot;") + '"'
 
 def generate_mermaid_flowchart(status_data):
     """Generate Mermaid flowchart code based on status data."""
-    mermaid_code = "```mermaid\n"
-    mermaid_code += "graph LR\n"
-    mermaid_code += "    S1[需求分析 S1] --> S2[任务拆解 S2]\n"
-    mermaid_code += "    S2 --> S3[测试用例设计 S3]\n"
-    mermaid_code += "    S3 --> S4[初步实现 S4]\n"
-    mermaid_code += "    S4 --> S5[自动化测试 S5]\n"
-    mermaid_code += "    S5 --> S6[代码审查 S6]\n"
-    mermaid_code += "    S6 --> S7[演示反馈 S7]\n"
-    mermaid_code += "    S7 --> S8[进度总结 S8]\n"
+    graph = [
+        "S1[需求分析 S1] --> S2[任务拆解 S2]",
+        "S2 --> S3[测试用例设计 S3]",
+        "S3 --> S4[初步实现 S4]",
+        "S4 --> S5[自动化测试 S5]",
+        "S5 --> S6[代码审查 S6]",
+        "S6 --> S7[演示反馈 S7]",
+        "S7 --> S8[进度总结 S8]",
+    ]
     
     # Apply styles based on status
     for stage, status in status_data:
-        color = "#95a5a6"  # Default gray for "待开始"
-        stroke = "#7f8c8d"
-        text_color = "#000"
-        if status == "已完成":
-            color = "#2ecc71"
-            stroke = "#27ae60"
-            text_color = "#fff"
-        elif status == "进行中":
-            color = "#f1c40f"
-            stroke = "#f39c12"
-            text_color = "#000"
-        mermaid_code += f"    style {stage} fill:{color},stroke:{stroke},color:{text_color}\n"
+        color, stroke, text_color = status_style(status)
+        graph.append(f"style {stage} fill:{color},stroke:{stroke},color:{text_color}")
     
-    mermaid_code += "```\n"
-    return mermaid_code
+    return MarkdownBuilder().mermaid(graph).text()
+
+def _class_definitions():
+    return [f"classDef {name} fill:{fill},stroke:{stroke},color:{text}"
+            for status, name in STATUS_CLASSES.items()
+            for fill, stroke, text in [STATUS_STYLES[status]]]
+
+def _class_assignments(node_status):
+    """One 'class a,b,c name' line per status instead of a style line per node."""
+    groups = {}
+    for node, status in node_status:
+        groups.setdefault(STATUS_CLASSES.get(status, "todo"), []).append(node)
+    return [f"class {','.join(nodes)} {name}" for name, nodes in groups.items()]
 
-def update_index_md(index_file, iteration, flowchart_code):
-    """Update the index.md file with the latest flowchart code."""
+def generate_task_flowchart(snapshot, collapse_threshold=DEFAULT_COLLAPSE_THRESHOLD):
+    """
+    Generate a Mermaid flowchart with one subgraph per task of a new-structure
+    snapshot. Above collapse_threshold tasks (and for old-structure iterations)
+    every stage becomes one aggregated node labelled with its completion count.
+    """
+    if snapshot.layout != "new" or not snapshot.tasks or len(snapshot.tasks) > collapse_threshold:
+        return generate_aggregated_flowchart(snapshot)
+    graph = []
+    node_status = []
+    taken = set(STAGE_NAMES)
+    for task in snapshot.tasks:
+        task_node = node_id(task, taken)
+        statuses = {}
+        for doc in snapshot.task_documents(task):
+            statuses.setdefault(doc.stage, []).append(doc.status)
+        graph.append(f"subgraph {task_node}[{node_label(task)}]")
+        graph.append("    direction LR")
+        nodes = [node_id(f"{task_node}_{stage}", taken) for stage in STAGE_NAMES]
+        graph.append("    " + " --> ".join(f"{node}[{stage}]" for node, stage in zip(nodes, STAGE_NAMES)))
+        graph.append("end")
+        node_status += [(node, aggregate_status(statuses.get(stage, []))) for node, stage in zip(nodes, STAGE_NAMES)]
+    return MarkdownBuilder().mermaid(graph + _class_definitions() + _class_assignments(node_status)).text()
+
+def generate_aggregated_flowchart(snapshot):
+    """Generate a stage flowchart whose nodes show how many documents of each stage are completed."""
+    graph = []
+    node_status = []
+    for stage in STAGE_NAMES:
+        statuses = [doc.status for doc in snapshot.stage_documents(stage)]
+        done = sum(1 for status in statuses if status == "已完成")
+        graph.append(f'{stage}["{STAGE_LABELS[stage]} {stage}<br/>{done}/{len(statuses)} 已完成"]')
+        node_status.append((stage, aggregate_status(statuses)))
+    graph.append(" --> ".join(STAGE_NAMES))
+    return MarkdownBuilder().mermaid(graph + _class_definitions() + _class_assignments(node_status)).text()
+
+
+def update_index_md(index_file, iteration, flowchart_code, documents=None):
+    """
+    Update the iteration's flowchart section of index.md, creating it if needed.
+    Pass a shared DocumentSet to batch several updates into a single write.
+    """
     try:
-        with open(index_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        own_documents = documents is None
+        if own_documents:
+            documents = DocumentSet()
+        document = documents.open(index_file)
         
         # Find or create flowchart section
         flowchart_section = f"## {iteration} 流程图"
-        start_idx = content.find(flowchart_section)
-        if start_idx == -1:
+        body = document.get(flowchart_section)
+        if body is None:
             # If section doesn't exist, append it
-            content += f"\n\n{flowchart_section}\n\n{flowchart_code}"
+            body = f"\n{flowchart_code}"
         else:
             # Find the mermaid code block
-            mermaid_start = content.find("```mermaid", start_idx)
+            mermaid_start = body.find("```mermaid")
             if mermaid_start == -1:
-                # If no mermaid block, append flowchart code after section header
-                content = content[:start_idx + len(flowchart_section)] + f"\n\n{flowchart_code}" + content[start_idx + len(flowchart_section):]
+                # If no mermaid block, insert flowchart code after section header
+                body = f"\n{flowchart_code}" + body
             else:
-                mermaid_end = content.find("```", mermaid_start + 10)
+                mermaid_end = body.find("```", mermaid_start + 10)
                 if mermaid_end == -1:
                     print("Could not find end of mermaid block")
                     return
                 # Replace existing mermaid code with new one
-                content = content[:mermaid_start] + flowchart_code + content[mermaid_end + 3:]
-        
-        with open(index_file, 'w', encoding='utf-8') as f:
-            f.write(content)
-        print(f"Successfully updated {index_file} with flowchart for {iteration}")
+                rest = body[mermaid_end + 3:]
+                if rest.startswith("\n"):
+                    rest = rest[1:]  # flowchart_code already ends with a newline
+                body = body[:mermaid_start] + flowchart_code + rest
+        document.set(flowchart_section, body)
+        print(f"Updated flowchart for {iteration} in {index_file}")
+        if own_documents:
+            documents.commit()
     except Exception as e:
         print(f"Error updating {index_file}: {e}")
 
-def get_all_iterations(base_dir):
+def get_all_iterations(base_dir, iterations_dir=None):
     """Get a list of all iteration directories in the iterations folder."""
-    iterations_dir = os.path.join(base_dir, "iterations")
+    if iterations_dir is None:
+        iterations_dir = os.path.join(base_dir, "iterations")
     if not os.path.exists(iterations_dir):
         print(f"Iterations directory {iterations_dir} does not exist.")
         return []
-    return [d for d in os.listdir(iterations_dir) if os.path.isdir(os.path.join(iterations_dir, d))]
+    return list_iterations(iterations_dir)
 
-def main():
-    """Main function to update flowchart in index.md based on status.md."""
-    parser = argparse.ArgumentParser(description="Update flowchart in index.md for a specific iteration or all iterations.")
-    parser.add_argument("--iteration", help="Specify the iteration to update (e.g., iteration-01). If not provided, defaults to iteration-01.")
-    parser.add_argument("--all", action="store_true", help="Update all iterations.")
-    args = parser.parse_args()
-    
+def run(iteration=None, all_iterations=False, documents=None, snapshots=None, jobs=1, from_index=False,
+        by_task=False, collapse_threshold=DEFAULT_COLLAPSE_THRESHOLD):
+    """
+    Update the flowchart in index.md for the given iteration(s) in one pass over
+    their snapshots. Returns True on success.
+    When a shared DocumentSet is given, the caller is responsible for committing it.
+    With from_index, stage statuses come from the document index (doc_index.py)
+    instead of the filesystem.
+    """
     base_dir = Path(__file__).parent.parent
+    iterations_dir = os.path.join(base_dir, "iterations")
     iterations = []
     
-    if args.all:
-        iterations = get_all_iterations(base_dir)
+    if all_iterations:
+        iterations = get_all_iterations(base_dir, iterations_dir)
         if not iterations:
             print("No iterations found to update.")
-            return
-    elif args.iteration:
-        iterations = [args.iteration]
+            return True
+    elif iteration:
+        iterations = [iteration]
     else:
         iterations = ["iteration-01"]  # Default iteration if none specified
     
-    status_file = os.path.join(base_dir, "status.md")
     index_file = os.path.join(base_dir, "index.md")
-    
-    if not os.path.exists(status_file):
-        print(f"Status file {status_file} does not exist.")
-        return
-    
     if not os.path.exists(index_file):
         print(f"Index file {index_file} does not exist.")
-        return
+        return False
     
+    targets = []
     for iteration in iterations:
-        status_data = read_status_from_file(status_file, iteration)
-        if status_data:
-            flowchart_code = generate_mermaid_flowchart(status_data)
-            update_index_md(index_file, iteration, flowchart_code)
-        else:
-            print(f"No status data found to generate flowchart for {iteration}.")
+        iteration_dir = os.path.join(iterations_dir, iteration)
+        if not os.path.exists(iteration_dir):
+            print(f"Iteration directory {iteration_dir} does not exist.")
+            continue
+        targets.append((iteration, iteration_dir))
+    
+    own_documents = documents is None
+    if own_documents:
+        documents = DocumentSet()
+    if from_index:
+        from doc_index import load_snapshots
+        snapshots = load_snapshots(targets)
+    else:
+        snapshots = get_snapshots(targets, snapshots, jobs)
+    for snapshot in snapshots:
+        with span("render_flowchart", cat="render", iteration=snapshot.iteration):
+            if by_task:
+                flowchart_code = generate_task_flowchart(snapshot, collapse_threshold)
+            else:
+                flowchart_code = generate_mermaid_flowchart(scan_iteration_status(snapshot))
+            update_index_md(index_file, snapshot.iteration, flowchart_code, documents)
+    if own_documents:
+        documents.commit()
+    return True
+
+def main():
+    """Main function to update flowchart in index.md based on the iteration documents."""
+    parser = argparse.ArgumentParser(description="Update flowchart in index.md for a specific iteration or all iterations.")
+    parser.add_argument("--iteration", help="Specify the iteration to update (e.g., iteration-01). If not provided, defaults to iteration-01.")
+    parser.add_argument("--all", action="store_true", help="Update all iterations.")
+    parser.add_argument("--no-cache", action="store_true", help="Read every stage document instead of using the frontmatter cache.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to scan iterations with --all (default: 1).")
+    parser.add_argument("--from-index", action="store_true", help="Render from the document index (doc_index.py refresh) instead of scanning the filesystem.")
+    parser.add_argument("--by-task", action="store_true", help="Draw one subgraph per task for new-structure iterations.")
+    parser.add_argument("--collapse-threshold", type=int, default=DEFAULT_COLLAPSE_THRESHOLD,
+                        help=f"With --by-task, collapse iterations with more tasks than this into aggregated stage nodes (default: {DEFAULT_COLLAPSE_THRESHOLD}).")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.no_cache:
+        disable_cache()
+    with span("update_flowchart", cat="tool"):
+        run(args.iteration, args.all, jobs=args.jobs, from_index=args.from_index,
+            by_task=args.by_task, collapse_threshold=args.collapse_threshold)
 
 if __name__ == "__main__":
     main()
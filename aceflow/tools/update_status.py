@@ -9,132 +9,100 @@ Supports both old and new directory structures.
 """
 
 import os
-import re
 import datetime
 import argparse
 from pathlib import Path
 
-def extract_status_from_file(file_path):
-    """Extract status from the Front-matter of a given file."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-            status_match = re.search(r'status:\s*([^\n\r]+)', content)
-            if status_match:
-                return status_match.group(1).strip()
-    except Exception as e:
-        print(f"Error reading {file_path}: {e}")
-    return "未知"
+from iteration_scanner import STAGE_NAMES, get_snapshots, list_iterations
+from frontmatter_cache import disable_cache
+from markdown_sections import DocumentSet
+from markdown_render import MarkdownBuilder
+from profiling import add_profile_argument, enable_from_args, span
+
+def aggregate_status(statuses):
+    """Simplify the status of a stage based on its individual document statuses."""
+    if not statuses:
+        return "待开始"
+    if all(s == "已完成" for s in statuses):
+        return "已完成"
+    if any(s == "进行中" for s in statuses):
+        return "进行中"
+    return "待开始"
 
-def scan_iteration_status_old_structure(iteration_dir):
-    """Scan the status of all stages and tasks in the given iteration directory (old structure)."""
+def scan_iteration_status_old_structure(snapshot):
+    """Compute the status of all stages from an old-structure iteration snapshot."""
     status_data = []
-    stages = ['s1_user_story.md', 's2_tasks.md', 's3_testcases', 's4_implementation', 's5_test_report.md', 's6_codereview.md', 's7_demo_feedback.md', 's8_progress_index.md']
-    for stage in stages:
-        stage_path = os.path.join(iteration_dir, stage)
-        if os.path.isdir(stage_path):
-            # For directories like s3_testcases, check status of individual test cases
-            stage_status = []
-            for item in os.listdir(stage_path):
-                if item.endswith('.md'):
-                    item_path = os.path.join(stage_path, item)
-                    status = extract_status_from_file(item_path)
-                    stage_status.append(status)
-            if stage_status:
-                # Simplify status for the stage based on individual statuses
-                if all(s == "已完成" for s in stage_status):
-                    overall_status = "已完成"
-                elif any(s == "进行中" for s in stage_status):
-                    overall_status = "进行中"
-                else:
-                    overall_status = "待开始"
-            else:
-                overall_status = "待开始"
-        elif os.path.isfile(stage_path):
-            overall_status = extract_status_from_file(stage_path)
+    for stage in STAGE_NAMES:
+        documents = snapshot.stage_documents(stage)
+        if len(documents) == 1 and not documents[0].grouped:
+            overall_status = documents[0].status
         else:
-            overall_status = "待开始"
-        status_data.append((stage.split('_')[0].upper(), overall_status))
+            # For directories like s3_testcases, aggregate the status of individual test cases
+            overall_status = aggregate_status([doc.status for doc in documents])
+        status_data.append((stage, overall_status))
     return status_data
 
-def scan_iteration_status_new_structure(iteration_dir):
-    """Scan the status of all stages and tasks in the given iteration directory (new structure with task subdirectories)."""
-    status_data = []
-    stages = ['s1_user_story.md', 's2_tasks.md', 's3_testcases.md', 's4_implementation.md', 's5_test_report.md', 's6_codereview.md', 's7_demo_feedback.md', 's8_progress_index.md']
-    task_dirs = [d for d in os.listdir(iteration_dir) if os.path.isdir(os.path.join(iteration_dir, d))]
-    
-    if not task_dirs:
-        return [("S" + str(i+1), "待开始") for i in range(8)]
-    
+def scan_iteration_status_new_structure(snapshot):
+    """Compute the status of all stages from a new-structure iteration snapshot (task subdirectories)."""
+    if not snapshot.tasks:
+        return [(stage, "待开始") for stage in STAGE_NAMES]
     # Aggregate status across all tasks for each stage
-    for i, stage in enumerate(stages):
-        stage_status = []
-        for task_dir in task_dirs:
-            stage_path = os.path.join(iteration_dir, task_dir, stage)
-            if os.path.isfile(stage_path):
-                status = extract_status_from_file(stage_path)
-                stage_status.append(status)
-        
-        if stage_status:
-            if all(s == "已完成" for s in stage_status):
-                overall_status = "已完成"
-            elif any(s == "进行中" for s in stage_status):
-                overall_status = "进行中"
-            else:
-                overall_status = "待开始"
-        else:
-            overall_status = "待开始"
-        status_data.append(("S" + str(i+1), overall_status))
-    return status_data
+    return [(stage, aggregate_status([doc.status for doc in snapshot.stage_documents(stage)]))
+            for stage in STAGE_NAMES]
 
-def scan_iteration_status(iteration_dir):
-    """Determine the structure (old or new) and scan accordingly."""
-    # Check if the directory contains task subdirectories (new structure)
-    task_dirs = [d for d in os.listdir(iteration_dir) if os.path.isdir(os.path.join(iteration_dir, d)) and d.startswith('T-')]
-    if task_dirs:
-        print(f"Detected new structure for {iteration_dir}")
-        return scan_iteration_status_new_structure(iteration_dir)
-    else:
-        print(f"Detected old structure for {iteration_dir}")
-        return scan_iteration_status_old_structure(iteration_dir)
+def scan_iteration_status(snapshot):
+    """Compute the stage status table for an iteration snapshot of either structure."""
+    print(f"Detected {snapshot.layout} structure for {snapshot.iteration_dir}")
+    if snapshot.layout == "new":
+        return scan_iteration_status_new_structure(snapshot)
+    return scan_iteration_status_old_structure(snapshot)
 
-def update_status_md(status_file, iteration, status_data):
-    """Update the status.md file with the latest status data."""
+def find_table_end(text, table_start):
+    """Return the offset just past the last row of the Markdown table starting at table_start."""
+    pos = table_start
+    while pos < len(text) and text.startswith('|', pos):
+        line_end = text.find('\n', pos)
+        pos = len(text) if line_end == -1 else line_end + 1
+    return pos
+
+def update_status_md(status_file, iteration, status_data, documents=None):
+    """
+    Update the iteration's section of status.md with the latest status data.
+    Pass a shared DocumentSet to batch several updates into a single write.
+    """
     try:
-        with open(status_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        own_documents = documents is None
+        if own_documents:
+            documents = DocumentSet()
+        document = documents.open(status_file)
         
         # Find the section for the given iteration
         iteration_section = f"## 📅 {iteration} 状态"
-        start_idx = content.find(iteration_section)
-        if start_idx == -1:
+        body = document.get(iteration_section)
+        if body is None:
             print(f"Could not find section for {iteration}")
             return
         
         # Find the table start and end
-        table_start = content.find('| 阶段 | 状态', start_idx)
+        table_start = body.find('| 阶段 | 状态')
         if table_start == -1:
             print(f"Could not find table for {iteration}")
             return
-        
-        table_end = content.find('---', table_start)
-        if table_end == -1:
-            print(f"Could not find table end for {iteration}")
-            return
+        table_end = find_table_end(body, table_start)
         
         # Generate new table content
         current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-        new_table_content = "| 阶段 | 状态       | 更新时间           | 责任人    | 备注                     |\n"
-        new_table_content += "|------|------------|--------------------|-----------|--------------------------|\n"
-        for stage, status in status_data:
-            new_table_content += f"| {stage}   | {status}     | {current_time}   | AI Assistant | 自动更新状态          |\n"
+        new_table_content = MarkdownBuilder().table(
+            "| 阶段 | 状态       | 更新时间           | 责任人    | 备注                     |",
+            [f"| {stage}   | {status}     | {current_time}   | AI Assistant | 自动更新状态          |"
+             for stage, status in status_data],
+            separator="|------|------------|--------------------|-----------|--------------------------|").text()
         
-        # Replace old table content with new
-        updated_content = content[:table_start] + new_table_content + content[table_end:]
-        
-        with open(status_file, 'w', encoding='utf-8') as f:
-            f.write(updated_content)
-        print(f"Successfully updated {status_file} for {iteration}")
+        # Replace old table content with new; an unchanged table is not written back (see SectionDocument.save)
+        document.set(iteration_section, body[:table_start] + new_table_content + body[table_end:])
+        print(f"Updated {iteration} section of {status_file}")
+        if own_documents:
+            documents.commit()
     except Exception as e:
         print(f"Error updating {status_file}: {e}")
 
@@ -147,55 +115,89 @@ def load_config():
             return json.load(f)
     return {}
 
-def get_all_iterations(base_dir):
-    """Get a list of all iteration directories in the iterations folder."""
-    config = load_config()
+def get_iterations_dir(config=None):
+    """Resolve the configured iterationRoot against the project root."""
+    if config is None:
+        config = load_config()
     iteration_root = config.get('iterationRoot', './aceflow_result/iterations')
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-    iterations_dir = os.path.abspath(os.path.join(project_root, iteration_root.lstrip('./')))
+    return os.path.abspath(os.path.join(project_root, iteration_root.lstrip('./')))
+
+def get_all_iterations(base_dir, iterations_dir=None):
+    """Get a list of all iteration directories in the iterations folder."""
+    if iterations_dir is None:
+        iterations_dir = get_iterations_dir()
     if not os.path.exists(iterations_dir):
         print(f"Iterations directory {iterations_dir} does not exist.")
         return []
-    return [d for d in os.listdir(iterations_dir) if os.path.isdir(os.path.join(iterations_dir, d))]
+    return list_iterations(iterations_dir)
 
-def main():
-    """Main function to update status.md based on iteration documents."""
-    parser = argparse.ArgumentParser(description="Update status.md for a specific iteration or all iterations.")
-    parser.add_argument("--iteration", help="Specify the iteration to update (e.g., iteration-01). If not provided, defaults to iteration-01.")
-    parser.add_argument("--all", action="store_true", help="Update all iterations.")
-    args = parser.parse_args()
-    
+def run(iteration=None, all_iterations=False, snapshots=None, jobs=1, documents=None, from_index=False):
+    """
+    Update status.md for the given iteration(s). Returns True on success.
+    When a shared DocumentSet is given, the caller is responsible for committing it.
+    With from_index, stage statuses come from the document index (doc_index.py)
+    instead of the filesystem.
+    """
     base_dir = Path(__file__).parent.parent
+    iterations_dir = get_iterations_dir()
     iterations = []
     
-    if args.all:
-        iterations = get_all_iterations(base_dir)
+    if all_iterations:
+        iterations = get_all_iterations(base_dir, iterations_dir)
         if not iterations:
             print("No iterations found to update.")
-            return
-    elif args.iteration:
-        iterations = [args.iteration]
+            return True
+    elif iteration:
+        iterations = [iteration]
     else:
         iterations = ["iteration-01"]  # Default iteration if none specified
     
-    config = load_config()
     project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
     status_file = os.path.abspath(os.path.join(project_root, "aceflow_result", "status.md"))
     if not os.path.exists(status_file):
         print(f"Status file {status_file} does not exist.")
-        return
+        return False
     
+    targets = []
     for iteration in iterations:
-        config = load_config()
-        iteration_root = config.get('iterationRoot', './aceflow_result/iterations')
-        project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
-        iteration_dir = os.path.abspath(os.path.join(project_root, iteration_root.lstrip('./'), iteration))
+        iteration_dir = os.path.join(iterations_dir, iteration)
         if not os.path.exists(iteration_dir):
             print(f"Iteration directory {iteration_dir} does not exist.")
             continue
-        
-        status_data = scan_iteration_status(iteration_dir)
-        update_status_md(status_file, iteration, status_data)
+        targets.append((iteration, iteration_dir))
+    
+    own_documents = documents is None
+    if own_documents:
+        documents = DocumentSet()
+    if from_index:
+        from doc_index import load_snapshots
+        snapshots = load_snapshots(targets)
+    else:
+        snapshots = get_snapshots(targets, snapshots, jobs)
+    for snapshot in snapshots:
+        with span("render_status", cat="render", iteration=snapshot.iteration):
+            status_data = scan_iteration_status(snapshot)
+            update_status_md(status_file, snapshot.iteration, status_data, documents)
+    if own_documents:
+        documents.commit()
+    return True
+
+def main():
+    """Main function to update status.md based on iteration documents."""
+    parser = argparse.ArgumentParser(description="Update status.md for a specific iteration or all iterations.")
+    parser.add_argument("--iteration", help="Specify the iteration to update (e.g., iteration-01). If not provided, defaults to iteration-01.")
+    parser.add_argument("--all", action="store_true", help="Update all iterations.")
+    parser.add_argument("--no-cache", action="store_true", help="Read every stage document instead of using the frontmatter cache.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to scan iterations with --all (default: 1).")
+    parser.add_argument("--from-index", action="store_true", help="Render from the document index (doc_index.py refresh) instead of scanning the filesystem.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.no_cache:
+        disable_cache()
+    with span("update_status", cat="tool"):
+        run(args.iteration, args.all, jobs=args.jobs, from_index=args.from_index)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watch mode for the aceflow update tools.
+This long-running script monitors the iteration directories, using inotify
+where available and falling back to stat polling. At startup every output is
+rendered once, so edits made while the watcher was down are picked up (files
+whose content is unchanged are not rewritten). Bursts of edits are debounced;
+only the affected stage documents are re-evaluated, and only the status.md,
+index.md and task_reminders.md sections whose content actually changed are
+re-rendered.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import argparse
+from pathlib import Path
+
+import update_status
+import update_flowchart
+import update_task_reminders
+import update_navigation
+from iteration_scanner import scan_iteration, refresh_paths, list_iterations
+from frontmatter_cache import get_cache, disable_cache
+from markdown_sections import DocumentSet
+from profiling import add_profile_argument, enable_from_args, traced
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct("iIII")
+
+# Returned by a watcher when it lost track of events and everything must be rescanned
+RESCAN = object()
+
+
+class InotifyWatcher:
+    """Recursive directory watcher on top of Linux inotify, loaded through ctypes."""
+
+    def __init__(self, roots):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._paths = {}
+        for root in roots:
+            self._add_tree(root)
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self._paths[wd] = path
+
+    def _add_tree(self, root, changed=None):
+        """Watch a directory tree; files found in it are reported through changed."""
+        for dirpath, _, filenames in os.walk(root):
+            self._add_watch(dirpath)
+            if changed is not None:
+                changed.update(os.path.join(dirpath, name) for name in filenames)
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds and return the set of changed paths (or RESCAN)."""
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & IN_Q_OVERFLOW:
+                    return RESCAN
+                if mask & IN_IGNORED:
+                    self._paths.pop(wd, None)
+                    continue
+                directory = self._paths.get(wd)
+                if directory is None:
+                    continue
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                changed.add(path)
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new directory before its watch exists
+                    self._add_tree(path, changed)
+        return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher:
+    """Fallback watcher that compares (mtime_ns, size) of every file on each poll."""
+
+    def __init__(self, roots, interval=1.0):
+        self.roots = roots
+        self.interval = interval
+        self._state = self._stat_tree()
+
+    def _stat_tree(self):
+        state = {}
+        stack = list(self.roots)
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append(entry.path)
+                                state[entry.path] = None
+                            else:
+                                st = entry.stat()
+                                state[entry.path] = (st.st_mtime_ns, st.st_size)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+        return state
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval) if timeout is not None else self.interval)
+        state = self._stat_tree()
+        previous, self._state = self._state, state
+        changed = {path for path, stamp in state.items() if previous.get(path, ()) != stamp}
+        changed.update(path for path in previous if path not in state)
+        return changed
+
+    def close(self):
+        pass
+
+
+def create_watcher(roots, use_polling=False, interval=1.0):
+    """Use inotify where available, otherwise stat polling."""
+    if not use_polling and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError) as e:
+            print(f"[watch] inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(roots, interval)
+
+
+class IncrementalRefresher:
+    """
+    Keeps the snapshot and last rendered data of every iteration in memory and
+    re-renders only the outputs whose data changed after a batch of edits.
+    Status follows the configured iterationRoot (as update_status does); the
+    flowchart, reminders and navigation follow aceflow/iterations (as
+    update_flowchart, update_task_reminders and update_navigation do).
+    """
+
+    def __init__(self):
+        base_dir = Path(__file__).parent.parent
+        project_root = os.path.abspath(os.path.join(base_dir, ".."))
+        self.status_file = os.path.join(project_root, "aceflow_result", "status.md")
+        self.index_file = os.path.join(base_dir, "index.md")
+        self.reminders_file = os.path.join(base_dir, "task_reminders.md")
+        self.consumers = {}
+        for root, kind in ((update_status.get_iterations_dir(), "status"),
+                           (os.path.join(base_dir, "iterations"), "documents")):
+            # Real paths, so that a symlinked iterationRoot is tracked (and watched) once
+            self.consumers.setdefault(os.path.realpath(root), set()).add(kind)
+        self.snapshots = {}
+        self.rendered = {}
+
+    @property
+    def roots(self):
+        return [root for root in self.consumers if os.path.isdir(root)]
+
+    @traced("watch_prime", cat="tool")
+    def prime(self):
+        """
+        Scan every iteration once and render all outputs from it, so changes made
+        while the watcher was not running are not left stale. Unchanged files are
+        not rewritten. task_reminders.md holds one iteration: the last one is rendered.
+        """
+        documents = DocumentSet()
+        latest_reminders = None
+        for root in self.roots:
+            for iteration in list_iterations(root):
+                snapshot = scan_iteration(os.path.join(root, iteration), iteration)
+                self.snapshots[(root, iteration)] = snapshot
+                for kind, data in self._render_data(root, snapshot).items():
+                    self.rendered[(kind, root, iteration)] = data
+                    if kind == "reminders":
+                        latest_reminders = (iteration, data)
+                    else:
+                        self._render(kind, iteration, data, documents)
+        if latest_reminders:
+            self._render("reminders", *latest_reminders, documents)
+        documents.commit()
+        cache = get_cache()
+        cache.request_prune()
+        cache.save()
+        print(f"[watch] tracking {len(self.snapshots)} iterations under {', '.join(self.roots)}")
+
+    def _render_data(self, root, snapshot):
+        data = {}
+        if "status" in self.consumers[root]:
+            data["status"] = update_status.scan_iteration_status(snapshot)
+        if "documents" in self.consumers[root]:
+            data["flowchart"] = update_flowchart.scan_iteration_status(snapshot)
+            data["reminders"] = update_task_reminders.scan_iteration_tasks(snapshot)
+            data["navigation"] = update_navigation.scan_iteration_documents(snapshot)
+        return data
+
+    def _group(self, paths):
+        """Group changed paths by the (root, iteration) they belong to."""
+        groups = {}
+        for path in paths:
+            for root in self.consumers:
+                if path.startswith(root + os.sep):
+                    iteration = os.path.relpath(path, root).split(os.sep)[0]
+                    groups.setdefault((root, iteration), set()).add(path)
+        return groups
+
+    @traced("watch_refresh", cat="tool")
+    def apply(self, paths):
+        """Re-evaluate the iterations touched by paths (or all of them for RESCAN) and re-render changed sections."""
+        if paths is RESCAN:
+            self.snapshots.clear()
+            groups = {(root, iteration): None for root in self.roots for iteration in list_iterations(root)}
+        else:
+            groups = self._group(paths)
+        documents = DocumentSet()
+        for (root, iteration), changed in sorted(groups.items()):
+            iteration_dir = os.path.join(root, iteration)
+            snapshot = self.snapshots.get((root, iteration))
+            if not os.path.isdir(iteration_dir):
+                self.snapshots.pop((root, iteration), None)
+                continue
+            if snapshot is None or changed is None or iteration_dir in changed:
+                snapshot = scan_iteration(iteration_dir, iteration)
+            else:
+                snapshot = refresh_paths(snapshot, changed)
+            self.snapshots[(root, iteration)] = snapshot
+            for kind, data in self._render_data(root, snapshot).items():
+                if self.rendered.get((kind, root, iteration)) == data:
+                    continue
+                self.rendered[(kind, root, iteration)] = data
+                self._render(kind, iteration, data, documents)
+        documents.commit()
+        get_cache().save()
+
+    def _render(self, kind, iteration, data, documents):
+        if kind == "status":
+            if os.path.exists(self.status_file):
+                update_status.update_status_md(self.status_file, iteration, data, documents)
+        elif kind == "flowchart":
+            if os.path.exists(self.index_file):
+                flowchart_code = update_flowchart.generate_mermaid_flowchart(data)
+                update_flowchart.update_index_md(self.index_file, iteration, flowchart_code, documents)
+        elif kind == "navigation":
+            if os.path.exists(self.index_file):
+                update_navigation.update_navigation_index(self.index_file, iteration, data, documents)
+        elif kind == "reminders":
+            update_task_reminders.update_task_reminders_md(self.reminders_file, iteration, data)
+
+
+def watch(refresher, watcher, debounce=0.5):
+    """Collect change events until debounce seconds pass without new ones, then refresh."""
+    pending = set()
+    last_event = None
+    while True:
+        changed = watcher.poll(debounce if pending else None)
+        if changed is RESCAN:
+            pending = RESCAN
+            last_event = time.monotonic()
+        elif changed:
+            if pending is not RESCAN:
+                pending |= changed
+            last_event = time.monotonic()
+        if pending and time.monotonic() - last_event >= debounce:
+            batch, pending = pending, set()
+            count = "all" if batch is RESCAN else len(batch)
+            print(f"[watch] refreshing after {count} changed paths")
+            refresher.apply(batch)
+
+
+def main():
+    """Main function to watch iteration documents and refresh outputs incrementally."""
+    parser = argparse.ArgumentParser(description="Watch iteration documents and incrementally refresh status.md, index.md and task_reminders.md.")
+    parser.add_argument("--debounce", type=float, default=0.5, help="Seconds without new changes before refreshing (default: 0.5).")
+    parser.add_argument("--poll", action="store_true", help="Use stat polling instead of inotify.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Polling interval in seconds (default: 1.0).")
+    parser.add_argument("--no-cache", action="store_true", help="Read every stage document instead of using the frontmatter cache.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    enable_from_args(args)
+    if args.no_cache:
+        disable_cache()
+
+    refresher = IncrementalRefresher()
+    refresher.prime()
+    roots = refresher.roots
+    if not roots:
+        print("[watch] nothing to watch: no iteration directories found.")
+        return
+
+    watcher = create_watcher(roots, args.poll, args.interval)
+    print(f"[watch] watching with {type(watcher).__name__}, press Ctrl+C to stop")
+    try:
+        watch(refresher, watcher, args.debounce)
+    except KeyboardInterrupt:
+        print("\n[watch] stopped")
+    finally:
+        watcher.close()
+
+if __name__ == "__main__":
+    main()